@@ -0,0 +1,55 @@
+# File: benchmarks/_setup.py
+
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against a throw-away local SQLite file, so DATABASE_URL must be
+set before the first `database.get_engine()` call, which reads it and creates
+the engine lazily. Setting it before importing anything under `inventrack`
+keeps that simple (load_dotenv() does not override an existing value).
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+
+def use_temp_sqlite(name: str = "bench.db") -> Path:
+    """Points DATABASE_URL at a fresh SQLite file and returns its path."""
+    workdir = Path(tempfile.mkdtemp(prefix="inventrack-bench-"))
+    db_path = workdir / name
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ.pop("SQLALCHEMY_CONNECT_ARGS", None)
+    return db_path
+
+
+def seed_store(db, store_id: str = "BENCH01", n_products: int = 50, stock: int = 10_000_000):
+    """Creates one owner, one shop and `n_products` products stocked in it."""
+    from inventrack import models
+
+    owner = models.User(
+        full_name="Bench Owner", email=f"{store_id.lower()}@bench.local",
+        phone=store_id[-10:], password="x", role="Shopkeeper",
+    )
+    db.add(owner)
+    db.flush()
+    db.add(models.Shop(
+        store_id=store_id, shop_name="Bench Shop", address="1 Bench Rd",
+        city="Pune", owner_id=owner.id,
+    ))
+    product_ids = []
+    for i in range(n_products):
+        pid = f"P{i:05d}"
+        product_ids.append(pid)
+        db.add(models.Product(
+            id=pid, product_name=f"Bench Product {i}", category=f"Cat{i % 5}",
+            subcategory=f"Sub{i % 11}", mrp=100 + i, msp=90 + i,
+        ))
+        db.add(models.Inventory(store_id=store_id, product_id=pid, stock_quantity=stock))
+    db.commit()
+    return product_ids
@@ -0,0 +1,127 @@
+# File: benchmarks/bench_admission.py
+
+"""
+Billing latency during an analytics burst, with and without admission
+control. Each mode runs in a fresh interpreter (the middleware is configured
+from the environment at import time) against a small connection pool.
+
+    python -m benchmarks.bench_admission --bills 60 --analytics 300 --rate 100
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+
+from benchmarks._setup import REPO_ROOT
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def _burst(client, bills: int, analytics: int, rate: float, product_ids):
+    rng = random.Random(5)
+    results = {"bill": [], "analytics": []}
+
+    async def one(delay, kind, method, url, payload=None):
+        await asyncio.sleep(delay)  # Poisson-ish arrivals at `rate` requests/sec
+        start = time.perf_counter()
+        response = await client.request(method, url, json=payload)
+        results[kind].append((response.status_code, (time.perf_counter() - start) * 1000))
+
+    requests = [("analytics", "GET", "/analytics/BENCH01", None)] * analytics
+    for _ in range(bills):
+        items = [{"product_id": pid, "product_name": pid, "quantity_sold": 1} for pid in rng.sample(product_ids, 3)]
+        payload = {"store_id": "BENCH01", "user_id": 1, "total_amount": 0.0, "items": items}
+        requests.append(("bill", "POST", "/sales/process_bill", payload))
+    rng.shuffle(requests)
+
+    tasks, at = [], 0.0
+    for request in requests:
+        at += rng.expovariate(rate)
+        tasks.append(one(at, *request))
+    await asyncio.gather(*tasks)
+    return results
+
+
+def worker(bills: int, analytics: int, rate: float) -> None:
+    from benchmarks._setup import use_temp_sqlite, seed_store
+    use_temp_sqlite()
+
+    import httpx
+    from datetime import date, timedelta
+    from inventrack import sales_partitions
+    from inventrack.database import SessionLocal, create_schema
+    from inventrack.main import app
+
+    create_schema()
+    db = SessionLocal()
+    product_ids = seed_store(db, n_products=50)
+    rng = random.Random(3)
+    sales_partitions.insert_sales_rows(db, [
+        {"date": date.today() - timedelta(days=rng.randint(0, 400)), "store_id": "BENCH01",
+         "product_id": rng.choice(product_ids), "units_sold": 1, "price": 10, "discount": 0}
+        for _ in range(30_000)
+    ])
+    db.commit()
+    db.close()
+
+    async def run():
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            started = time.perf_counter()
+            results = await _burst(client, bills, analytics, rate, product_ids)
+            results["wall_seconds"] = time.perf_counter() - started
+            results["stats"] = (await client.get("/internal/admission")).json()
+            return results
+
+    print(json.dumps(asyncio.run(run())))
+
+
+def summarize(mode: str, results) -> None:
+    print(f"--- admission control {mode} (wall {results['wall_seconds']:.1f} s) ---")
+    for kind in ("bill", "analytics"):
+        samples = results[kind]
+        ok = [ms for code, ms in samples if code == 200]
+        shed = sum(1 for code, _ in samples if code == 503)
+        errors = len(samples) - len(ok) - shed
+        print(f"{kind:9s} ok={len(ok):4d} shed={shed:4d} errors={errors:3d} "
+              f"p50={statistics.median(ok) if ok else 0:8.1f} ms  p99={_percentile(ok, 0.99):8.1f} ms")
+    if mode == "on":
+        print("counters:", json.dumps(results["stats"]["by_class"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bills", type=int, default=60)
+    parser.add_argument("--analytics", type=int, default=300)
+    parser.add_argument("--rate", type=float, default=100.0, help="Arrivals per second.")
+    parser.add_argument("--pool-size", type=int, default=3)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.bills, args.analytics, args.rate)
+        return
+
+    for mode in ("off", "on"):
+        env = dict(os.environ, DB_POOL_SIZE=str(args.pool_size), DB_MAX_OVERFLOW="0",
+                   ADMISSION_CONTROL="1" if mode == "on" else "0",
+                   ADMISSION_PER_STORE_LIMIT=str(args.pool_size), ADMISSION_QUEUE_TIMEOUT_SECONDS="5")
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_admission", "--worker",
+             "--bills", str(args.bills), "--analytics", str(args.analytics), "--rate", str(args.rate)],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+        )
+        summarize(mode, json.loads(out.stdout.strip().splitlines()[-1]))
+
+
+if __name__ == "__main__":
+    main()
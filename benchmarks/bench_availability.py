@@ -0,0 +1,78 @@
+# File: benchmarks/bench_availability.py
+
+"""
+Consumer availability index: build time from Inventory/shops, lookup
+latency, and the cost of the stock-change hook on the billing path.
+
+    python -m benchmarks.bench_availability --stores 2000 --products 500
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from benchmarks._setup import use_temp_sqlite, seed_store
+
+use_temp_sqlite()
+
+from sqlalchemy import insert  # noqa: E402
+
+from inventrack import models  # noqa: E402
+from inventrack.availability_index import AvailabilityIndex  # noqa: E402
+from inventrack.database import SessionLocal, create_schema  # noqa: E402
+
+CITIES = ["Pune", "Mumbai", "Nagpur", "Nashik", "Delhi", "Bengaluru", "Chennai", "Kolkata", "Jaipur", "Indore"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stores", type=int, default=2000)
+    parser.add_argument("--products", type=int, default=500, help="Products stocked per store (of 5000).")
+    parser.add_argument("--lookups", type=int, default=20_000)
+    args = parser.parse_args()
+
+    rng = random.Random(3)
+    create_schema()
+    db = SessionLocal()
+    catalog = seed_store(db, "BENCH0000", n_products=5000, stock=10)
+    shops, rows = [], []
+    for i in range(1, args.stores):
+        store_id = f"BENCH{i:04d}"
+        shops.append({"store_id": store_id, "shop_name": f"Shop {i}", "address": "1 Bench Rd",
+                      "city": rng.choice(CITIES), "owner_id": 1})
+        rows.extend({"store_id": store_id, "product_id": pid, "stock_quantity": rng.randint(0, 50)}
+                    for pid in rng.sample(catalog, args.products))
+    db.execute(insert(models.Shop), shops)
+    db.execute(insert(models.Inventory), rows)
+    db.commit()
+    print(f"seeded {args.stores:,} stores, {len(rows) + 5000:,} inventory rows")
+
+    index = AvailabilityIndex(refresh_seconds=3600)
+    index.rebuild(db)
+    print(f"build: {index.build_seconds:.2f} s, {index.stats()}")
+
+    samples = []
+    for _ in range(args.lookups):
+        pid, city = rng.choice(catalog), rng.choice(CITIES).upper()
+        t = time.perf_counter()
+        index.lookup(SessionLocal, pid, city, 50)
+        samples.append((time.perf_counter() - t) * 1_000_000)
+    samples.sort()
+    print(f"lookup: p50={statistics.median(samples):.1f} us p99={samples[int(0.99 * len(samples))]:.1f} us")
+
+    samples = []
+    for _ in range(args.lookups):
+        store_id = f"BENCH{rng.randrange(1, args.stores):04d}"
+        quantities = {pid: rng.randint(0, 50) for pid in rng.sample(catalog, rng.randint(1, 8))}
+        t = time.perf_counter()
+        index.update_stock(store_id, quantities)
+        samples.append((time.perf_counter() - t) * 1_000_000)
+    samples.sort()
+    print(f"update_stock (billing hook): p50={statistics.median(samples):.1f} us "
+          f"p99={samples[int(0.99 * len(samples))]:.1f} us")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# File: benchmarks/bench_backtest.py
+
+"""
+Backtest throughput (series/sec) single-process vs a process pool over
+synthetic daily sales with weekly seasonality, trend and noise.
+
+    python -m benchmarks.bench_backtest --stores 4 --products 500 --days 365 --workers 4
+"""
+
+import argparse
+import math
+import os
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks._setup import use_temp_sqlite, seed_store
+
+use_temp_sqlite()
+
+from inventrack import models  # noqa: E402
+from inventrack.backtest import MODELS, format_report, load_series, run_backtest  # noqa: E402
+from inventrack.database import SessionLocal, create_schema  # noqa: E402
+from inventrack.sales_partitions import insert_sales_rows  # noqa: E402
+
+
+def seed_sales(db, stores, product_ids, days: int, end: date, rng: random.Random) -> int:
+    rows, total = [], 0
+    for store_id in stores:
+        for pid in product_ids:
+            base = rng.uniform(0.5, 40)
+            weekly = [1 + rng.uniform(-0.4, 0.6) * (d >= 5) for d in range(7)]
+            trend = rng.uniform(-0.001, 0.002)
+            for offset in range(days):
+                day = end - timedelta(days=days - 1 - offset)
+                mean = base * weekly[day.weekday()] * (1 + trend * offset)
+                units = max(0, int(round(rng.gauss(mean, math.sqrt(mean)))))
+                if units:
+                    rows.append({"date": day, "store_id": store_id, "product_id": pid, "units_sold": units, "price": 100})
+            if len(rows) >= 50_000:
+                insert_sales_rows(db, rows)
+                total += len(rows)
+                rows = []
+    if rows:
+        insert_sales_rows(db, rows)
+        total += len(rows)
+    db.commit()
+    return total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stores", type=int, default=4)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--models", default=",".join(MODELS))
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    create_schema()
+    db = SessionLocal()
+    stores = [f"BENCH{i + 1:02d}" for i in range(args.stores)]
+    product_ids = seed_store(db, stores[0], n_products=args.products)
+    for store_id in stores[1:]:
+        db.add(models.Shop(store_id=store_id, shop_name="Bench Shop", address="1 Bench Rd", city="Pune", owner_id=1))
+    db.commit()
+
+    end = date.today() - timedelta(days=1)
+    started = time.perf_counter()
+    rows = seed_sales(db, stores, product_ids, args.days, end, rng)
+    print(f"seeded {rows:,} sales rows in {time.perf_counter() - started:.1f} s")
+
+    started = time.perf_counter()
+    series = load_series(db, end - timedelta(days=args.days - 1), end)
+    db.close()
+    print(f"loaded {len(series):,} series in {time.perf_counter() - started:.1f} s")
+
+    model_names = args.models.split(",")
+    for workers in sorted({1, args.workers}):
+        report = run_backtest(series, model_names, workers=workers)
+        print()
+        print(format_report(report) if workers == args.workers else
+              f"{workers} worker: {report['wall_seconds']:.2f} s wall, {report['series_per_second']} series/s")
+
+
+if __name__ == "__main__":
+    main()
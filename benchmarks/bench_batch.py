@@ -0,0 +1,71 @@
+# File: benchmarks/bench_batch.py
+
+"""
+App-launch fetch (listing, analytics, restock status, recommendations) as
+four sequential calls vs one POST /batch. Server time is measured through
+the ASGI app; launch time over a mobile link adds --rtt-ms per round trip.
+
+    python -m benchmarks.bench_batch --rtt-ms 300 --runs 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks._setup import use_temp_sqlite, seed_store
+
+use_temp_sqlite()
+
+import httpx  # noqa: E402
+
+from inventrack.database import SessionLocal, create_schema  # noqa: E402
+from inventrack.main import app  # noqa: E402
+
+STORE = "BENCH01"
+LAUNCH = [
+    f"/inventory/{STORE}/products",
+    f"/analytics/{STORE}",
+    f"/ml-data/restock-status?store_id={STORE}",
+    "/ml-data/recommendations",
+]
+
+
+async def run(runs: int):
+    sequential, batched = [], []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+        for _ in range(runs):
+            started = time.perf_counter()
+            for path in LAUNCH:
+                (await client.get(path)).raise_for_status()
+            sequential.append((time.perf_counter() - started) * 1000)
+
+            started = time.perf_counter()
+            response = await client.post("/batch", json={"requests": [{"path": path} for path in LAUNCH]})
+            assert all(item["status"] == 200 for item in response.json()["responses"])
+            batched.append((time.perf_counter() - started) * 1000)
+    return sequential, batched
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=50)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--rtt-ms", type=float, default=300.0, help="Mobile round-trip time added per HTTP call.")
+    args = parser.parse_args()
+
+    create_schema()
+    db = SessionLocal()
+    seed_store(db, STORE, n_products=args.products)
+    db.close()
+
+    sequential, batched = asyncio.run(run(args.runs))
+    seq_ms, batch_ms = statistics.median(sequential), statistics.median(batched)
+    print(f"server time (p50): 4 sequential calls {seq_ms:7.1f} ms, one batch {batch_ms:7.1f} ms")
+    print(f"launch at {args.rtt_ms:.0f} ms RTT: sequential {seq_ms + len(LAUNCH) * args.rtt_ms:7.1f} ms, "
+          f"batch {batch_ms + args.rtt_ms:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
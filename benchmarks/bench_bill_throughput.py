@@ -0,0 +1,73 @@
+# File: benchmarks/bench_bill_throughput.py
+
+"""
+Bills/sec through process_sale_transaction with and without the SalesData
+write-behind buffer.
+
+    python -m benchmarks.bench_bill_throughput --bills 2000 --lines 5
+"""
+
+import argparse
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks._setup import use_temp_sqlite, seed_store
+
+use_temp_sqlite()
+
+from inventrack import models, schemas, sales_buffer  # noqa: E402
+from inventrack.database import SessionLocal, create_schema  # noqa: E402
+from inventrack.routes.sales import process_sale_transaction  # noqa: E402
+from inventrack.shop_registry import shop_registry  # noqa: E402
+
+
+def run(bills: int, lines: int, product_ids, store_id: str) -> float:
+    rng = random.Random(42)
+    start = time.perf_counter()
+    for _ in range(bills):
+        items = [
+            schemas.SaleItem(product_id=pid, product_name=pid, quantity_sold=rng.randint(1, 3))
+            for pid in rng.sample(product_ids, lines)
+        ]
+        request = schemas.ProcessSale(store_id=store_id, user_id=1, total_amount=0.0, items=items)
+        db = SessionLocal()
+        try:
+            process_sale_transaction(request, db, shop_registry.get(db, store_id))
+        finally:
+            db.close()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bills", type=int, default=2000)
+    parser.add_argument("--lines", type=int, default=5)
+    args = parser.parse_args()
+
+    create_schema()
+    db = SessionLocal()
+    product_ids = seed_store(db)
+    db.close()
+
+    direct = run(args.bills, args.lines, product_ids, "BENCH01")
+
+    buffer_dir = Path(tempfile.mkdtemp(prefix="inventrack-sales-buffer-"))
+    sales_buffer.start(buffer_dir)
+    buffered = run(args.bills, args.lines, product_ids, "BENCH01")
+    drain_start = time.perf_counter()
+    sales_buffer.stop()
+    drain = time.perf_counter() - drain_start
+
+    db = SessionLocal()
+    rows = db.query(models.SalesData).count()
+    db.close()
+
+    print(f"bills={args.bills} lines/bill={args.lines} history rows={rows}")
+    print(f"direct insert : {args.bills / direct:10.1f} bills/sec")
+    print(f"write-behind  : {args.bills / buffered:10.1f} bills/sec (shutdown drain {drain * 1000:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+# File: benchmarks/bench_billing_contention.py
+
+"""
+Concurrent billing contention: many terminals POST /sales/process_bill for
+one store at once, picking products with Zipf skew so a few hot products
+take most of the lines. Reports
+
+- throughput (bills/sec) and latency percentiles of successful bills;
+- lock wait per bill: time spent in SELECT ... FOR UPDATE, in writes
+  (row locks on MySQL / TiDB, the database write lock on SQLite) and in
+  COMMIT;
+- outcome counts: ok, sold out (400), deadlock, lock timeout, other errors;
+- correctness: final stock of every product against initial stock minus the
+  units of the bills that succeeded (no overselling, no lost decrements),
+  and SalesData units against the same total.
+
+Runs against a throw-away SQLite file by default; pass --database-url for an
+empty local MySQL / TiDB scratch database (the schema is created and a store
+with products P00000... is seeded). On SQLite FOR UPDATE is not emitted, so
+lost decrements there show what the row locks are protecting against.
+
+    python -m benchmarks.bench_billing_contention --terminals 16 --bills 2000 --zipf 1.2
+"""
+
+import argparse
+import asyncio
+import contextvars
+import os
+import random
+import statistics
+import time
+import uuid
+from collections import Counter
+from itertools import accumulate
+
+from benchmarks._setup import use_temp_sqlite, seed_store
+
+# Per-bill accumulators, set by the terminal task before each request. The
+# ASGI transport runs the app in that task and the threadpool copies the
+# context, so the engine event handlers below see the same dict.
+_bill: "contextvars.ContextVar[dict]" = contextvars.ContextVar("bill", default=None)
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def _instrument(engine) -> None:
+    """Times locking reads, writes and commits into the current bill's accumulator."""
+    from sqlalchemy import event
+    from sqlalchemy.orm import Session
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before(conn, cursor, statement, parameters, context, executemany):
+        context._contention_started = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after(conn, cursor, statement, parameters, context, executemany):
+        acc = _bill.get()
+        if acc is None:
+            return
+        head = statement.lstrip()[:6].upper()
+        if head in ("INSERT", "UPDATE", "DELETE") or (head == "SELECT" and "FOR UPDATE" in statement.upper()):
+            acc["lock"] += time.perf_counter() - context._contention_started
+
+    @event.listens_for(engine, "commit")
+    def before_commit(conn):
+        acc = _bill.get()
+        if acc is not None:
+            acc["commit_started"] = time.perf_counter()
+
+    @event.listens_for(Session, "after_commit")
+    def after_commit(session):
+        acc = _bill.get()
+        if acc is not None and "commit_started" in acc:
+            acc["lock"] += time.perf_counter() - acc.pop("commit_started")
+
+
+def _outcome(status_code: int, body) -> str:
+    if status_code == 200:
+        return "ok"
+    detail = str(body.get("detail", "")) if isinstance(body, dict) else str(body)
+    lowered = detail.lower()
+    if status_code == 400 and "insufficient stock" in lowered:
+        return "sold_out"
+    if "deadlock" in lowered:
+        return "deadlock"
+    if "lock wait timeout" in lowered or "database is locked" in lowered or "busy" in lowered:
+        return "lock_timeout"
+    return "error"
+
+
+class ZipfProducts:
+    """Product IDs drawn with P(rank r) proportional to 1 / r**s (s=0: uniform)."""
+
+    def __init__(self, product_ids, s: float, rng: random.Random):
+        self.product_ids = product_ids
+        self.cum_weights = list(accumulate(1.0 / (rank ** s) for rank in range(1, len(product_ids) + 1)))
+        self.rng = rng
+
+    def bill(self, lines: int):
+        chosen = {}
+        while len(chosen) < min(lines, len(self.product_ids)):
+            pid = self.rng.choices(self.product_ids, cum_weights=self.cum_weights)[0]
+            chosen.setdefault(pid, None)
+        return list(chosen)
+
+
+async def _terminal(client, store_id: str, bills: int, products: ZipfProducts, args, rng, results, sold: Counter):
+    for _ in range(bills):
+        lines = [(pid, rng.randint(1, args.max_qty)) for pid in products.bill(rng.randint(args.min_lines, args.max_lines))]
+        payload = {
+            "store_id": store_id, "user_id": 1, "total_amount": 0.0,
+            "items": [{"product_id": pid, "product_name": pid, "quantity_sold": qty} for pid, qty in lines],
+        }
+        acc = {"lock": 0.0}
+        token = _bill.set(acc)
+        started = time.perf_counter()
+        try:
+            response = await client.post("/sales/process_bill", json=payload)
+        finally:
+            _bill.reset(token)
+        elapsed = time.perf_counter() - started
+        try:
+            body = response.json()
+        except ValueError:
+            body = response.text
+        outcome = _outcome(response.status_code, body)
+        results.append((outcome, elapsed, acc["lock"]))
+        if outcome == "ok":
+            for pid, qty in lines:
+                sold[pid] += qty
+
+
+async def _drive(app, store_id: str, products: ZipfProducts, args):
+    import httpx
+
+    results, sold = [], Counter()
+    per_terminal = [args.bills // args.terminals + (1 if i < args.bills % args.terminals else 0)
+                    for i in range(args.terminals)]
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            _terminal(client, store_id, n, products, args, random.Random(args.seed + i), results, sold)
+            for i, n in enumerate(per_terminal)
+        ])
+        wall = time.perf_counter() - started
+    return results, sold, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--terminals", type=int, default=16, help="Concurrent billing terminals.")
+    parser.add_argument("--bills", type=int, default=2000, help="Bills in total, split across terminals.")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--zipf", type=float, default=1.2, help="Product skew exponent (0 = uniform).")
+    parser.add_argument("--min-lines", type=int, default=1)
+    parser.add_argument("--max-lines", type=int, default=6)
+    parser.add_argument("--max-qty", type=int, default=3, help="Units per line, uniform in 1..max-qty.")
+    parser.add_argument("--stock", type=int, default=1_000_000, help="Initial stock per product.")
+    parser.add_argument("--pool-size", type=int, default=None, help="Default: one connection per terminal.")
+    parser.add_argument("--database-url", default=None, help="Local MySQL / TiDB scratch DB (default: temp SQLite).")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    else:
+        use_temp_sqlite()
+    if args.pool_size:
+        os.environ["DB_POOL_SIZE"] = str(args.pool_size)
+    os.environ.setdefault("DB_POOL_SIZE", str(args.terminals))
+    os.environ.setdefault("DB_MAX_OVERFLOW", "0")
+
+    from sqlalchemy import func, select
+
+    from inventrack import models
+    from inventrack.database import SessionLocal, create_schema, get_engine
+    from inventrack.main import app
+
+    create_schema()
+    store_id = f"CT{uuid.uuid4().hex[:8].upper()}"
+    db = SessionLocal()
+    product_ids = seed_store(db, store_id, n_products=args.products, stock=args.stock)
+    db.close()
+    _instrument(get_engine())
+
+    products = ZipfProducts(product_ids, args.zipf, random.Random(args.seed))
+    results, sold, wall = asyncio.run(_drive(app, store_id, products, args))
+
+    # --- Outcomes, throughput, latency, lock wait ---
+    outcomes = Counter(outcome for outcome, _, _ in results)
+    ok = [(elapsed, lock) for outcome, elapsed, lock in results if outcome == "ok"]
+    latencies = [elapsed * 1000 for elapsed, _ in ok]
+    locks = [lock * 1000 for _, lock in ok]
+    hot_share = sum(sold[pid] for pid in product_ids[:5]) / max(1, sum(sold.values()))
+    print(f"terminals={args.terminals} bills={len(results)} products={args.products} zipf={args.zipf} "
+          f"lines={args.min_lines}-{args.max_lines} (top-5 products: {hot_share:.0%} of units sold)")
+    print(f"throughput : {outcomes['ok'] / wall:8.1f} ok bills/sec ({len(results) / wall:.1f} attempted/sec, "
+          f"wall {wall:.1f} s)")
+    if ok:
+        print(f"latency    : p50={statistics.median(latencies):7.1f} ms  p95={_percentile(latencies, 0.95):7.1f} ms"
+              f"  p99={_percentile(latencies, 0.99):7.1f} ms")
+        print(f"lock wait  : p50={statistics.median(locks):7.1f} ms  p95={_percentile(locks, 0.95):7.1f} ms"
+              f"  p99={_percentile(locks, 0.99):7.1f} ms  ({sum(locks) / max(1e-9, sum(latencies)):.0%} of latency)")
+    failed = len(results) - outcomes["ok"]
+    print("outcomes   : " + "  ".join(f"{name}={outcomes[name]}" for name in
+                                      ("ok", "sold_out", "deadlock", "lock_timeout", "error"))
+          + f"  (failure rate {failed / max(1, len(results)):.1%}, "
+            f"deadlock+timeout {(outcomes['deadlock'] + outcomes['lock_timeout']) / max(1, len(results)):.1%})")
+
+    # --- Correctness ---
+    db = SessionLocal()
+    final = dict(db.execute(
+        select(models.Inventory.product_id, models.Inventory.stock_quantity).where(models.Inventory.store_id == store_id)
+    ).all())
+    history_units = db.execute(
+        select(func.coalesce(func.sum(models.SalesData.units_sold), 0)).where(models.SalesData.store_id == store_id)
+    ).scalar()
+    db.close()
+
+    oversold = [pid for pid, qty in final.items() if qty < 0]
+    lost = {pid: final[pid] - (args.stock - sold[pid]) for pid in product_ids if final[pid] > args.stock - sold[pid]}
+    extra = {pid: (args.stock - sold[pid]) - final[pid] for pid in product_ids if final[pid] < args.stock - sold[pid]}
+    print(f"correctness: oversold products={len(oversold)}  lost decrements={sum(lost.values())} units "
+          f"in {len(lost)} products  extra decrements={sum(extra.values())} units in {len(extra)} products  "
+          f"SalesData units={history_units} (expected {sum(sold.values())})")
+    if oversold or lost or extra or history_units != sum(sold.values()):
+        print("CORRECTNESS FAILURE")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# File: benchmarks/bench_cooccurrence.py
+
+"""
+Co-occurrence model: full rebuild from stored baskets, incremental
+add_basket cost and "frequently bought together" lookup latency.
+
+    python -m benchmarks.bench_cooccurrence --baskets 1000000
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from benchmarks._setup import use_temp_sqlite, seed_store
+
+use_temp_sqlite()
+
+from sqlalchemy import insert  # noqa: E402
+
+from inventrack import models  # noqa: E402
+from inventrack.database import SessionLocal, create_schema  # noqa: E402
+from inventrack.recommendations import CooccurrenceModel, rebuild_from_db  # noqa: E402
+
+STORES = ["BENCH01", "BENCH02", "BENCH03", "BENCH04"]
+
+
+def seed_baskets(db, baskets: int, product_ids, rng: random.Random) -> None:
+    # Skewed popularity so some pairs are genuinely frequent
+    weights = [1.0 / (rank + 1) for rank in range(len(product_ids))]
+    today = date.today()
+    headers, items = [], []
+    for i in range(baskets):
+        bill_id = f"B{i:012d}"
+        basket = set(rng.choices(product_ids, weights, k=rng.randint(1, 8)))
+        headers.append({"bill_id": bill_id, "store_id": rng.choice(STORES), "bill_date": today - timedelta(days=i % 365),
+                        "item_count": len(basket)})
+        items.extend({"bill_id": bill_id, "product_id": pid, "quantity": 1} for pid in basket)
+        if len(headers) == 50_000:
+            db.execute(insert(models.Bill), headers)
+            db.execute(insert(models.BillItem), items)
+            headers, items = [], []
+    if headers:
+        db.execute(insert(models.Bill), headers)
+        db.execute(insert(models.BillItem), items)
+    db.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--baskets", type=int, default=200_000)
+    parser.add_argument("--products", type=int, default=2000)
+    args = parser.parse_args()
+
+    rng = random.Random(9)
+    create_schema()
+    db = SessionLocal()
+    product_ids = seed_store(db, STORES[0], n_products=args.products)
+    for i, store_id in enumerate(STORES[1:], start=2):
+        db.add(models.Shop(store_id=store_id, shop_name="Bench Shop", address="1 Bench Rd", city="Pune", owner_id=1))
+    db.commit()
+
+    started = time.perf_counter()
+    seed_baskets(db, args.baskets, product_ids, rng)
+    print(f"seeded {args.baskets:,} baskets in {time.perf_counter() - started:.1f} s")
+
+    started = time.perf_counter()
+    model, counted = rebuild_from_db(db)
+    print(f"rebuild: {counted:,} baskets in {time.perf_counter() - started:.1f} s")
+    db.close()
+
+    samples = []
+    for _ in range(5000):
+        pid, store = rng.choice(product_ids[:200]), rng.choice(STORES + [None])
+        t = time.perf_counter()
+        model.top(pid, store, 10)
+        samples.append((time.perf_counter() - t) * 1_000_000)
+    print(f"top-10 lookup: p50={statistics.median(samples):.1f} us p99={sorted(samples)[int(0.99 * len(samples))]:.1f} us")
+
+    live = CooccurrenceModel(compact_every=500)
+    samples = []
+    for _ in range(20_000):
+        basket = rng.sample(product_ids, rng.randint(1, 8))
+        t = time.perf_counter()
+        live.add_basket(rng.choice(STORES), basket)
+        samples.append((time.perf_counter() - t) * 1_000_000)
+    live.compact()
+    print(f"add_basket (billing path): p50={statistics.median(samples):.1f} us "
+          f"p99={sorted(samples)[int(0.99 * len(samples))]:.1f} us, {live.compactions} compactions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# File: benchmarks/bench_inventory_cache.py
+
+"""
+Inventory listing cache: read latency, hit rate, and a consistency check that
+interleaves bills / product edits with concurrent listing reads.
+
+    python -m benchmarks.bench_inventory_cache --reads 5000 --writes 300
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+
+from benchmarks._setup import use_temp_sqlite, seed_store
+
+use_temp_sqlite()
+
+from inventrack import models, schemas  # noqa: E402
+from inventrack.database import SessionLocal, create_schema  # noqa: E402
+from inventrack.inventory_cache import inventory_cache  # noqa: E402
+from inventrack.routes.inventory import get_products_by_shop, update_product_details, _load_store_listing  # noqa: E402
+from inventrack.routes.sales import process_sale_transaction  # noqa: E402
+from inventrack.shop_registry import shop_registry  # noqa: E402
+
+STORE = "BENCH01"
+
+
+def read_listing():
+    db = SessionLocal()
+    try:
+        return json.loads(get_products_by_shop(STORE, db).body)
+    finally:
+        db.close()
+
+
+def fresh_listing():
+    db = SessionLocal()
+    try:
+        return _load_store_listing(db, STORE)
+    finally:
+        db.close()
+
+
+def time_reads(n: int) -> float:
+    start = time.perf_counter()
+    for _ in range(n):
+        read_listing()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=500)
+    parser.add_argument("--reads", type=int, default=5000)
+    parser.add_argument("--writes", type=int, default=300)
+    parser.add_argument("--readers", type=int, default=4)
+    args = parser.parse_args()
+
+    create_schema()
+    db = SessionLocal()
+    product_ids = seed_store(db, STORE, n_products=args.products, stock=1_000_000)
+    db.close()
+
+    # 1. Latency: cache disabled vs enabled
+    max_bytes = inventory_cache.max_bytes
+    inventory_cache.max_bytes = 0
+    uncached_us = time_reads(max(args.reads // 10, 50))
+    inventory_cache.max_bytes = max_bytes
+    cached_us = time_reads(args.reads)
+    print(f"listing of {args.products} products: uncached {uncached_us:9.1f} us/read, cached {cached_us:9.1f} us/read")
+
+    # 2. Interleaved writes and concurrent reads
+    stop = threading.Event()
+
+    def reader():
+        while not stop.is_set():
+            read_listing()
+
+    readers = [threading.Thread(target=reader) for _ in range(args.readers)]
+    for t in readers:
+        t.start()
+
+    rng = random.Random(7)
+    mismatches = 0
+    for i in range(args.writes):
+        db = SessionLocal()
+        try:
+            if i % 10 == 0:
+                pid = rng.choice(product_ids)
+                update_product_details(STORE, pid, schemas.ProductUpdate(msp=rng.randint(50, 90)), db)
+            elif i % 7 == 0:
+                pid = rng.choice(product_ids)
+                update_product_details(STORE, pid, schemas.ProductUpdate(stock_quantity=rng.randint(1000, 5000)), db)
+            else:
+                items = [
+                    schemas.SaleItem(product_id=pid, product_name=pid, quantity_sold=rng.randint(1, 3))
+                    for pid in rng.sample(product_ids, 3)
+                ]
+                process_sale_transaction(
+                    schemas.ProcessSale(store_id=STORE, user_id=1, total_amount=0.0, items=items), db,
+                    shop_registry.get(db, STORE),
+                )
+        finally:
+            db.close()
+        if read_listing() != fresh_listing():
+            mismatches += 1
+
+    stop.set()
+    for t in readers:
+        t.join()
+    if read_listing() != fresh_listing():
+        mismatches += 1
+
+    print(f"interleaved writes={args.writes} readers={args.readers} stale listings observed={mismatches}")
+    print("cache stats:", inventory_cache.stats())
+    if mismatches:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
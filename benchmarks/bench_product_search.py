@@ -0,0 +1,101 @@
+# File: benchmarks/bench_product_search.py
+
+"""
+Build time and per-query latency of the product search index over a
+synthetic catalog (prefix, full-word, multi-word and misspelled queries).
+
+    python -m benchmarks.bench_product_search --products 100000
+"""
+
+import argparse
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from benchmarks._setup import use_temp_sqlite
+
+use_temp_sqlite()
+
+from inventrack.product_catalog import CatalogProduct  # noqa: E402
+from inventrack.product_search import ProductSearchIndex  # noqa: E402
+
+SYLLABLES = ["ka", "ra", "mi", "su", "to", "ve", "na", "li", "po", "de", "sha", "gu", "ban", "tri", "mo",
+             "ja", "hal", "pa", "ri", "dam", "ne", "ya", "zo", "chi", "ku", "la", "vi", "ho", "ma", "sa"]
+VARIANTS = ["Classic", "Gold", "Lite", "Premium", "Family Pack", "Masala", "Elaichi", "Herbal"]
+SIZES = ["50g", "100g", "200g", "500g", "1kg", "250ml", "500ml", "1L", "5L"]
+CATEGORIES = {"Dairy": ["Milk", "Cheese"], "Snacks": ["Namkeen", "Biscuits"], "Staples": ["Flour", "Oil"],
+              "Home Care": ["Detergent", "Cleaner"], "Personal Care": ["Oral", "Bath"]}
+
+
+def _words(rng: random.Random, count: int, syllables: int):
+    words = set()
+    while len(words) < count:
+        words.add("".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, syllables))).capitalize())
+    return sorted(words)
+
+
+def synthetic_catalog(n: int, rng: random.Random):
+    """Kirana-like names: ~n/30 brands, a few hundred item words, variants and pack sizes."""
+    global BRANDS, ITEMS
+    BRANDS = _words(rng, max(16, n // 30), 4)
+    ITEMS = _words(rng, 400, 3)
+    products = []
+    categories = list(CATEGORIES)
+    for i in range(n):
+        category = rng.choice(categories)
+        name = f"{rng.choice(BRANDS)} {rng.choice(ITEMS)} {rng.choice(VARIANTS)} {rng.choice(SIZES)}"
+        products.append(CatalogProduct(
+            id=f"P{i:07d}", product_name=name, category=category,
+            subcategory=rng.choice(CATEGORIES[category]), mrp=Decimal("100"), msp=Decimal("90"),
+        ))
+    return products
+
+
+def queries(rng: random.Random, count: int):
+    out = []
+    for _ in range(count):
+        kind = rng.randrange(4)
+        brand, item = rng.choice(BRANDS), rng.choice(ITEMS)
+        if kind == 0:
+            out.append(brand[:3])                                  # prefix while typing
+        elif kind == 1:
+            out.append(f"{brand} {item}")                          # full words
+        elif kind == 2:
+            out.append(f"{brand.lower()} {item[:3]} {rng.choice(SIZES)}")
+        else:
+            i = rng.randrange(1, len(item) - 1)
+            out.append(f"{brand} {item[:i] + item[i + 1:]}")       # one letter dropped
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    catalog = synthetic_catalog(args.products, rng)
+    index = ProductSearchIndex()
+    index.rebuild(catalog)
+    print(f"built index for {args.products:,} products in {index.build_seconds:.2f} s: {index.stats()}")
+
+    samples = []
+    for q in queries(rng, args.queries):
+        start = time.perf_counter()
+        index.search(q, args.limit)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    print(f"{args.queries} queries, top-{args.limit}: p50={statistics.median(samples):.3f} ms "
+          f"p95={samples[int(0.95 * len(samples))]:.3f} ms p99={samples[int(0.99 * len(samples))]:.3f} ms")
+
+    start = time.perf_counter()
+    for product in catalog[:1000]:
+        index.on_catalog_change(product._replace(product_name=product.product_name + " New"), product)
+    print(f"incremental update: {(time.perf_counter() - start) * 1000 / 1000:.3f} ms per product")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# File: benchmarks/bench_range_analytics.py
+
+"""
+Latency of GET /analytics/{store_id}/range for a one-year, top-50 request
+on a store with `--rows` SalesData rows, from raw rows and from the rollup.
+
+    python -m benchmarks.bench_range_analytics --rows 1000000
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from benchmarks._setup import use_temp_sqlite, seed_store
+
+use_temp_sqlite()
+
+from inventrack import models, sales_partitions  # noqa: E402
+from inventrack.database import SessionLocal, create_schema  # noqa: E402
+from inventrack.range_analytics import get_range_analytics, refresh_daily_rollup  # noqa: E402
+
+STORE = "BENCH01"
+
+
+def seed(rows: int, product_ids) -> None:
+    rng = random.Random(11)
+    today = date.today()
+    db = SessionLocal()
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "date": today - timedelta(days=rng.randint(0, 364)), "store_id": STORE,
+            "product_id": rng.choice(product_ids), "units_sold": rng.randint(1, 6),
+            "price": rng.randint(10, 900), "discount": 0,
+        })
+        if len(batch) == 100_000:
+            sales_partitions.insert_sales_rows(db, batch)
+            batch = []
+    sales_partitions.insert_sales_rows(db, batch)
+    db.commit()
+    db.close()
+
+
+def latency_ms(granularity: str, repeats: int):
+    db = SessionLocal()
+    start, end = date.today() - timedelta(days=364), date.today()
+    samples = []
+    for _ in range(repeats):
+        t = time.perf_counter()
+        result = get_range_analytics(db, STORE, start, end, granularity, 50)
+        samples.append((time.perf_counter() - t) * 1000)
+    db.close()
+    return statistics.median(samples), result["plan"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    create_schema()
+    db = SessionLocal()
+    product_ids = seed_store(db, STORE, n_products=args.products)
+    db.close()
+    seed(args.rows, product_ids)
+
+    for granularity in ("day", "week", "month"):
+        ms, plan = latency_ms(granularity, args.repeats)
+        print(f"{granularity:5s} plan={plan:10s} {ms:8.1f} ms")
+
+    db = SessionLocal()
+    t = time.perf_counter()
+    refresh_daily_rollup(db)
+    print(f"rollup refresh: {(time.perf_counter() - t):.1f} s, "
+          f"{db.query(models.SalesDailyRollup).count():,} rollup rows")
+    db.close()
+
+    for granularity in ("day", "week", "month"):
+        ms, plan = latency_ms(granularity, args.repeats)
+        print(f"{granularity:5s} plan={plan:10s} {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
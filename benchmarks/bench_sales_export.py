@@ -0,0 +1,78 @@
+# File: benchmarks/bench_sales_export.py
+
+"""
+GET /export/sales throughput (rows/sec) and peak Python memory (MB) per format.
+
+    python -m benchmarks.bench_sales_export --rows 500000
+"""
+
+import argparse
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from benchmarks._setup import use_temp_sqlite
+
+use_temp_sqlite()
+
+from inventrack import sales_partitions  # noqa: E402
+from inventrack.database import SessionLocal, create_schema  # noqa: E402
+from inventrack.routes.export import pa, stream_sales_export  # noqa: E402
+
+
+def seed(rows: int) -> date:
+    rng = random.Random(3)
+    start = date.today() - timedelta(days=rows // 500)
+    db = SessionLocal()
+    batch = []
+    for i in range(rows):
+        batch.append({
+            "date": start + timedelta(days=i // 500), "store_id": "S001",
+            "product_id": f"P{rng.randint(0, 999):05d}", "units_sold": rng.randint(1, 9),
+            "price": rng.randint(10, 900), "discount": 0,
+        })
+        if len(batch) == 50_000:
+            sales_partitions.insert_sales_rows(db, batch)
+            batch = []
+    sales_partitions.insert_sales_rows(db, batch)
+    db.commit()
+    db.close()
+    return start
+
+
+def _consume(fmt: str, start: date, batch_size: int) -> int:
+    size = 0
+    for chunk in stream_sales_export(fmt, "S001", start, date.today(), batch_size):
+        size += len(chunk)
+    return size
+
+
+def measure(fmt: str, start: date, rows: int, batch_size: int) -> None:
+    # Timing and memory are separate passes: tracemalloc slows allocation-heavy code
+    t = time.perf_counter()
+    size = _consume(fmt, start, batch_size)
+    elapsed = time.perf_counter() - t
+
+    tracemalloc.start()
+    _consume(fmt, start, batch_size)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{fmt:8s} {rows / elapsed:12,.0f} rows/sec  peak {peak / 1e6:7.1f} MB  output {size / 1e6:7.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=500_000)
+    parser.add_argument("--batch-size", type=int, default=50_000)
+    args = parser.parse_args()
+
+    create_schema()
+    start = seed(args.rows)
+    formats = ["csv"] + (["arrow", "parquet"] if pa is not None else [])
+    for fmt in formats:
+        measure(fmt, start, args.rows, args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# File: benchmarks/bench_sales_import.py
+
+"""
+Historical SalesData import throughput (rows/sec) from a generated CSV
+export, plus the cost of resuming a job that was interrupted half-way.
+
+    python -m benchmarks.bench_sales_import --rows 1000000
+"""
+
+import argparse
+import csv
+import random
+import time
+from datetime import date, timedelta
+
+from benchmarks._setup import use_temp_sqlite, seed_store
+
+db_path = use_temp_sqlite()
+
+from sqlalchemy import func, select  # noqa: E402
+
+from inventrack import models  # noqa: E402
+from inventrack.database import SessionLocal, create_schema  # noqa: E402
+from inventrack.sales_import import import_file  # noqa: E402
+
+STORES = ["BENCH01", "BENCH02", "BENCH03", "BENCH04"]
+
+
+def write_export(path, rows: int, product_ids, rng: random.Random, bad_every: int) -> None:
+    start = date.today() - timedelta(days=3 * 365)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Date", "Store_ID", "Product_ID", "Units_Sold", "Price", "Discount"])
+        for i in range(rows):
+            day = (start + timedelta(days=i * 3 * 365 // rows)).isoformat()
+            units = str(rng.randint(1, 9)) if not bad_every or i % bad_every else "n/a"
+            writer.writerow([day, rng.choice(STORES), rng.choice(product_ids), units, f"{rng.randint(10, 500)}.00", "0"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--batch-rows", type=int, default=100_000)
+    parser.add_argument("--bad-every", type=int, default=1000, help="Every Nth record has a bad Units_Sold (0: none).")
+    args = parser.parse_args()
+
+    rng = random.Random(5)
+    create_schema()
+    db = SessionLocal()
+    product_ids = seed_store(db, STORES[0], n_products=args.products)
+    for store_id in STORES[1:]:
+        db.add(models.Shop(store_id=store_id, shop_name="Bench Shop", address="1 Bench Rd", city="Pune", owner_id=1))
+    db.commit()
+
+    export = db_path.parent / "history.csv"
+    started = time.perf_counter()
+    write_export(export, args.rows, product_ids, rng, args.bad_every)
+    print(f"wrote {args.rows:,} records ({export.stat().st_size / 1e6:.0f} MB) in {time.perf_counter() - started:.1f} s")
+
+    started = time.perf_counter()
+    job = import_file(db, export, job_id="bench", batch_rows=args.batch_rows)
+    elapsed = time.perf_counter() - started
+    print(f"import: {job.rows_imported:,} rows, {job.rows_rejected:,} rejected in {elapsed:.2f} s "
+          f"= {job.rows_read / elapsed:,.0f} rows/s")
+
+    # Interrupt a second job half-way (as if the process died), then resume it
+    half = args.rows // 2 // args.batch_rows
+    calls = {"n": 0}
+
+    def crash_after_half(_job):
+        calls["n"] += 1
+        if calls["n"] == half:
+            raise KeyboardInterrupt
+
+    try:
+        import_file(db, export, job_id="resume", batch_rows=args.batch_rows, progress=crash_after_half)
+    except KeyboardInterrupt:
+        db.rollback()
+    db.close()
+    db = SessionLocal()
+    started = time.perf_counter()
+    job = import_file(db, export, job_id="resume", batch_rows=args.batch_rows)
+    print(f"resume after {half} committed batches: finished in {time.perf_counter() - started:.2f} s")
+
+    total = db.execute(select(func.count()).select_from(models.SalesData)).scalar()
+    print(f"SalesData rows: {total:,} (expected {2 * (args.rows - job.rows_rejected):,})")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# File: benchmarks/bench_sales_partitions.py
+
+"""
+Daily / weekly KPI latency as SalesData history grows from 1 to 5 years,
+for the single-table layout and the monthly-partitioned layout.
+
+    python -m benchmarks.bench_sales_partitions --rows-per-day 50 --stores 5
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import date, timedelta
+
+from benchmarks._setup import use_temp_sqlite
+
+use_temp_sqlite()
+
+from sqlalchemy import func  # noqa: E402
+
+from inventrack import models, sales_partitions  # noqa: E402
+from inventrack.analytics_service import _get_current_period_start  # noqa: E402
+from inventrack.database import SessionLocal, create_schema  # noqa: E402
+from inventrack.sales_partitions import sales_rows  # noqa: E402
+
+
+def load_year(db, year_index: int, stores, rows_per_day: int, rng) -> int:
+    """Adds one more year of history, going backwards from today."""
+    end = date.today() - timedelta(days=365 * year_index)
+    rows = []
+    for offset in range(365):
+        day = end - timedelta(days=offset)
+        for store in stores:
+            for _ in range(rows_per_day):
+                rows.append({
+                    "date": day, "store_id": store, "product_id": f"P{rng.randint(0, 199):05d}",
+                    "units_sold": rng.randint(1, 5), "price": rng.randint(10, 500), "discount": 0,
+                })
+    for start in range(0, len(rows), 50_000):
+        sales_partitions.insert_sales_rows(db, rows[start:start + 50_000])
+    db.commit()
+    return len(rows)
+
+
+def kpi_latency_ms(db, store: str, period: str, repeats: int) -> float:
+    samples = []
+    for _ in range(repeats):
+        t = time.perf_counter()
+        sales = sales_rows(db, _get_current_period_start(period), date.today(), [store])
+        db.query(
+            func.count(sales.c.RecordID), func.sum(sales.c.Units_Sold),
+            func.sum(sales.c.Units_Sold * sales.c.Price),
+        ).one()
+        samples.append((time.perf_counter() - t) * 1000)
+    return statistics.median(samples)
+
+
+def run_layout(mode: str, args) -> None:
+    sales_partitions.PARTITIONING = mode
+    db = SessionLocal()
+    db.query(models.SalesData).delete()
+    db.commit()
+    stores = [f"S{i:03d}" for i in range(args.stores)]
+    rng = random.Random(1)
+    total = 0
+    print(f"\nlayout: {'monthly partitions' if mode == 'monthly' else 'single table'}")
+    for years in range(1, args.years + 1):
+        total += load_year(db, years - 1, stores, args.rows_per_day, rng)
+        daily = kpi_latency_ms(db, stores[0], "daily", args.repeats)
+        weekly = kpi_latency_ms(db, stores[0], "weekly", args.repeats)
+        print(f"  {years} year(s), {total:>9,} rows: daily KPI {daily:7.2f} ms  weekly KPI {weekly:7.2f} ms")
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--years", type=int, default=5)
+    parser.add_argument("--stores", type=int, default=5)
+    parser.add_argument("--rows-per-day", type=int, default=50)
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    create_schema()
+    run_layout("off", args)
+    run_layout("monthly", args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+# File: benchmarks/bench_sales_sync.py
+
+"""
+Draining an offline POS backlog: N queued bills replayed one by one
+through process_bill vs one POST /sales/sync, then the same sync replayed
+(every bill must come back as a duplicate and stock must not move).
+
+    python -m benchmarks.bench_sales_sync --bills 500 --lines 4
+"""
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from benchmarks._setup import use_temp_sqlite, seed_store
+
+use_temp_sqlite()
+
+from sqlalchemy import func, select  # noqa: E402
+
+from inventrack import models, schemas  # noqa: E402
+from inventrack.database import SessionLocal, create_schema  # noqa: E402
+from inventrack.routes.sales import process_sale_transaction, sync_offline_bills  # noqa: E402
+from inventrack.shop_registry import shop_registry  # noqa: E402
+
+
+def queued_bills(n: int, lines: int, product_ids, rng: random.Random):
+    started = datetime.now() - timedelta(days=2)
+    return [
+        schemas.SyncBill(
+            bill_id=f"POS1-{i:06d}", billed_at=started + timedelta(minutes=3 * i), user_id=1, total_amount=0.0,
+            items=[schemas.SaleItem(product_id=pid, product_name=pid, quantity_sold=rng.randint(1, 3))
+                   for pid in rng.sample(product_ids, lines)],
+        )
+        for i in range(n)
+    ]
+
+
+def stock(store_id: str):
+    db = SessionLocal()
+    try:
+        return dict(db.execute(select(models.Inventory.product_id, models.Inventory.stock_quantity)
+                               .where(models.Inventory.store_id == store_id)).all())
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--bills", type=int, default=500)
+    parser.add_argument("--lines", type=int, default=4)
+    parser.add_argument("--products", type=int, default=200)
+    args = parser.parse_args()
+
+    create_schema()
+    db = SessionLocal()
+    one_by_one_ids = seed_store(db, "BENCH01", n_products=args.products, stock=100_000)
+    db.add(models.Shop(store_id="BENCH02", shop_name="Bench Shop", address="1 Bench Rd", city="Pune", owner_id=1))
+    db.add_all(models.Inventory(store_id="BENCH02", product_id=pid, stock_quantity=100_000) for pid in one_by_one_ids)
+    db.commit()
+    db.close()
+    bills = queued_bills(args.bills, args.lines, one_by_one_ids, random.Random(11))
+
+    started = time.perf_counter()
+    for bill in bills:
+        request = schemas.ProcessSale(store_id="BENCH01", user_id=bill.user_id, total_amount=bill.total_amount,
+                                      items=bill.items)
+        db = SessionLocal()
+        try:
+            process_sale_transaction(request, db, shop_registry.get(db, "BENCH01"))
+        finally:
+            db.close()
+    one_by_one = time.perf_counter() - started
+
+    def sync():
+        db = SessionLocal()
+        try:
+            request = schemas.SalesSyncRequest(store_id="BENCH02", bills=bills)
+            return sync_offline_bills(request, db, shop_registry.get(db, "BENCH02"))
+        finally:
+            db.close()
+
+    started = time.perf_counter()
+    first = sync()
+    synced = time.perf_counter() - started
+    after_first = stock("BENCH02")
+    started = time.perf_counter()
+    replay = sync()
+    replayed = time.perf_counter() - started
+
+    print(f"{args.bills} bills x {args.lines} lines")
+    print(f"process_bill one by one: {one_by_one:7.2f} s ({args.bills / one_by_one:8.1f} bills/s)")
+    print(f"POST /sales/sync        : {synced:7.2f} s ({args.bills / synced:8.1f} bills/s) "
+          f"accepted={first['accepted']} rejected={first['rejected']}")
+    print(f"replayed sync           : {replayed:7.2f} s duplicates={replay['duplicates']} accepted={replay['accepted']}")
+
+    db = SessionLocal()
+    units = dict(db.execute(select(models.SalesData.store_id, func.sum(models.SalesData.units_sold))
+                            .group_by(models.SalesData.store_id)).all())
+    db.close()
+    same_stock = stock("BENCH01") == after_first == stock("BENCH02")
+    print(f"stock identical to one-by-one and unchanged by the replay: {same_stock}; "
+          f"SalesData units one-by-one={units.get('BENCH01')} sync={units.get('BENCH02')}")
+
+
+if __name__ == "__main__":
+    main()
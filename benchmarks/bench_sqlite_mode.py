@@ -0,0 +1,149 @@
+# File: benchmarks/bench_sqlite_mode.py
+
+"""
+SQLite backend: default engine (SQLITE_TUNING=0) vs the tuned mode (WAL,
+single writer + reader pool, BEGIN IMMEDIATE). Concurrent billing terminals
+run while dashboard clients poll GET /analytics/{store_id}; reported are
+bills/sec, dashboard latency, "database is locked" failures and lost stock
+decrements. Each mode runs in a fresh interpreter on a fresh file.
+
+    python -m benchmarks.bench_sqlite_mode --terminals 8 --bills 600 --dashboards 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+from benchmarks._setup import REPO_ROOT
+
+STORE = "BENCH01"
+
+
+def _percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def worker(args) -> None:
+    from benchmarks._setup import use_temp_sqlite, seed_store
+    use_temp_sqlite()
+
+    import httpx
+    from datetime import date, timedelta
+    from sqlalchemy import select
+    from inventrack import models, sales_partitions
+    from inventrack.database import SessionLocal, create_schema
+    from inventrack.main import app
+
+    create_schema()
+    db = SessionLocal()
+    product_ids = seed_store(db, STORE, n_products=args.products, stock=1_000_000)
+    rng = random.Random(3)
+    sales_partitions.insert_sales_rows(db, [
+        {"date": date.today() - timedelta(days=rng.randint(0, 60)), "store_id": STORE,
+         "product_id": rng.choice(product_ids), "units_sold": 1, "price": 10, "discount": 0}
+        for _ in range(args.history)
+    ])
+    db.commit()
+    db.close()
+
+    outcomes, bill_ms, dashboard_ms, idle_ms, sold = Counter(), [], [], [], Counter()
+
+    async def terminal(client, seed, bills):
+        trng = random.Random(seed)
+        for _ in range(bills):
+            lines = [(pid, trng.randint(1, 3)) for pid in trng.sample(product_ids[:20], 4)]  # a hot shelf
+            payload = {"store_id": STORE, "user_id": 1, "total_amount": 0.0,
+                       "items": [{"product_id": p, "product_name": p, "quantity_sold": q} for p, q in lines]}
+            started = time.perf_counter()
+            response = await client.post("/sales/process_bill", json=payload)
+            if response.status_code == 200:
+                bill_ms.append((time.perf_counter() - started) * 1000)
+                outcomes["ok"] += 1
+                for p, q in lines:
+                    sold[p] += q
+            else:
+                outcomes["locked" if "locked" in response.text else "error"] += 1
+
+    async def dashboard(client, done):
+        while not done.is_set():
+            started = time.perf_counter()
+            response = await client.get(f"/analytics/{STORE}")
+            if response.status_code == 200:
+                dashboard_ms.append((time.perf_counter() - started) * 1000)
+            else:
+                outcomes["dashboard_error"] += 1
+
+    async def run():
+        transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            for i in range(args.idle_loads + 3):  # dashboard alone, no billing (first 3 warm up)
+                started = time.perf_counter()
+                (await client.get(f"/analytics/{STORE}")).raise_for_status()
+                if i >= 3:
+                    idle_ms.append((time.perf_counter() - started) * 1000)
+            done = asyncio.Event()
+            readers = [asyncio.create_task(dashboard(client, done)) for _ in range(args.dashboards)]
+            started = time.perf_counter()
+            await asyncio.gather(*[terminal(client, i, args.bills // args.terminals) for i in range(args.terminals)])
+            wall = time.perf_counter() - started
+            done.set()
+            await asyncio.gather(*readers)
+            return wall
+
+    wall = asyncio.run(run())
+    db = SessionLocal()
+    final = dict(db.execute(select(models.Inventory.product_id, models.Inventory.stock_quantity)
+                            .where(models.Inventory.store_id == STORE)).all())
+    db.close()
+    lost = sum(final[p] - (1_000_000 - sold[p]) for p in product_ids)
+    print(json.dumps({"wall": wall, "outcomes": outcomes, "bill_ms": bill_ms, "dashboard_ms": dashboard_ms,
+                      "idle_ms": idle_ms, "lost_units": lost}))
+
+
+def summarize(mode: str, results) -> None:
+    bills, dash, outcomes = results["bill_ms"], results["dashboard_ms"], results["outcomes"]
+    print(f"--- {mode} ---")
+    print(f"billing   : {outcomes.get('ok', 0) / results['wall']:7.1f} bills/sec  "
+          f"p50={statistics.median(bills) if bills else 0:7.1f} ms  p99={_percentile(bills, 0.99):7.1f} ms  "
+          f"locked={outcomes.get('locked', 0)} errors={outcomes.get('error', 0)}  lost decrements={results['lost_units']}")
+    idle = results["idle_ms"]
+    print(f"dashboard : idle p50={statistics.median(idle) if idle else 0:7.1f} ms; during billing {len(dash)} loads  p50={statistics.median(dash) if dash else 0:7.1f} ms  "
+          f"p99={_percentile(dash, 0.99):7.1f} ms  errors={outcomes.get('dashboard_error', 0)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--terminals", type=int, default=8)
+    parser.add_argument("--bills", type=int, default=600, help="Bills in total, split across terminals.")
+    parser.add_argument("--dashboards", type=int, default=2, help="Clients polling the analytics dashboard.")
+    parser.add_argument("--products", type=int, default=200)
+    parser.add_argument("--history", type=int, default=50_000, help="SalesData rows seeded for the dashboard.")
+    parser.add_argument("--idle-loads", type=int, default=20, help="Dashboard loads before billing starts.")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    for mode, tuning in (("default SQLite engine", "0"), ("tuned SQLite mode", "1")):
+        env = dict(os.environ, SQLITE_TUNING=tuning, DB_POOL_SIZE=str(args.terminals), DB_MAX_OVERFLOW="0")
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_sqlite_mode", "--worker",
+             "--terminals", str(args.terminals), "--bills", str(args.bills), "--dashboards", str(args.dashboards),
+             "--products", str(args.products), "--history", str(args.history), "--idle-loads", str(args.idle_loads)],
+            cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True,
+        )
+        summarize(mode, json.loads(out.stdout.strip().splitlines()[-1]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# File: benchmarks/bench_startup.py
+
+"""
+Cold-start cost of a worker: `import inventrack.main` time and
+time-to-first-request of a freshly spawned uvicorn process.
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+from benchmarks._setup import REPO_ROOT, use_temp_sqlite
+
+IMPORT_SNIPPET = (
+    "import time; t = time.perf_counter(); import inventrack.main; "
+    "print(time.perf_counter() - t)"
+)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def time_import(env) -> float:
+    out = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=REPO_ROOT, env=env,
+        capture_output=True, text=True, check=True,
+    )
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def time_first_request(env, timeout: float = 30.0) -> float:
+    port = _free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "inventrack.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if proc.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with code {proc.returncode}")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/", timeout=1) as resp:
+                    if resp.status == 200:
+                        return time.perf_counter() - start
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError("uvicorn did not answer in time")
+    finally:
+        proc.terminate()
+        proc.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--create-schema", action="store_true",
+                        help="Also run create_all in the lifespan (INVENTRACK_CREATE_SCHEMA=1).")
+    args = parser.parse_args()
+
+    use_temp_sqlite()
+    env = dict(os.environ)
+    if args.create_schema:
+        env["INVENTRACK_CREATE_SCHEMA"] = "1"
+
+    imports = [time_import(env) for _ in range(args.runs)]
+    first = [time_first_request(env) for _ in range(args.runs)]
+    print(f"import inventrack.main : median {statistics.median(imports) * 1000:8.1f} ms  (runs={args.runs})")
+    print(f"time-to-first-request  : median {statistics.median(first) * 1000:8.1f} ms  (runs={args.runs})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+# File: benchmarks/bench_stock_ledger.py
+
+"""
+Point-in-time stock from the stock ledger: a store with D days of
+movement history, queried for its stock at noon on the last day and for
+that day's movement report, first from the ledger alone (full replay) and
+then with nightly snapshots (newest snapshot + the ledger after it). Both
+answers are checked against the quantities the history generator tracked.
+
+    python -m benchmarks.bench_stock_ledger --days 90 --movements-per-day 5000 --products 2000
+"""
+
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from benchmarks._setup import use_temp_sqlite, seed_store
+
+use_temp_sqlite()
+
+from sqlalchemy import insert  # noqa: E402
+
+from inventrack import models, stock_ledger  # noqa: E402
+from inventrack.database import SessionLocal, create_schema  # noqa: E402
+
+
+def build_history(db, store_id: str, product_ids, days: int, per_day: int, stock: int, rng: random.Random):
+    """Writes `days` of movements plus a snapshot at each midnight; returns the quantities at each noon."""
+    quantities = {pid: stock for pid in product_ids}
+    start = datetime.combine(datetime.now().date(), datetime.min.time()) - timedelta(days=days)
+    db.execute(insert(models.StockMovement), [
+        stock_ledger.movement(store_id, pid, stock_ledger.OPENING, stock, stock, at=start) for pid in product_ids
+    ])
+    at_noon, snapshots = {}, []
+    for day in range(days):
+        midnight = start + timedelta(days=day)
+        snapshots.append((midnight, dict(quantities)))
+        rows = []
+        for i in range(per_day):
+            at = midnight + timedelta(seconds=(i + 1) * 86_400 / (per_day + 1))
+            if day not in at_noon and at.hour >= 12:
+                at_noon[day] = dict(quantities)
+            pid = rng.choice(product_ids)
+            delta = rng.randint(1, 50) if rng.random() < 0.05 else -min(quantities[pid], rng.randint(1, 3))
+            quantities[pid] += delta
+            rows.append(stock_ledger.movement(store_id, pid, stock_ledger.SALE, delta, quantities[pid], at=at))
+        at_noon.setdefault(day, dict(quantities))
+        db.execute(insert(models.StockMovement), rows)
+    db.commit()
+    return start, at_noon, snapshots
+
+
+def add_snapshots(db, store_id: str, snapshots) -> None:
+    for taken_at, quantities in snapshots:
+        snapshot = models.StockSnapshot(store_id=store_id, taken_at=taken_at, product_count=len(quantities))
+        db.add(snapshot)
+        db.flush()
+        db.execute(insert(models.StockSnapshotItem), [
+            {"snapshot_id": snapshot.snapshot_id, "product_id": pid, "quantity": qty} for pid, qty in quantities.items()
+        ])
+    db.commit()
+
+
+def timed(fn, repeat: int):
+    samples, result = [], None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--movements-per-day", type=int, default=5000)
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    create_schema()
+    db = SessionLocal()
+    product_ids = seed_store(db, "BENCH01", n_products=args.products, stock=1000)
+    started = time.perf_counter()
+    start, at_noon, snapshots = build_history(db, "BENCH01", product_ids, args.days, args.movements_per_day, 1000,
+                                              random.Random(7))
+    print(f"{args.days} days x {args.movements_per_day:,} movements ({args.days * args.movements_per_day:,} rows) "
+          f"written in {time.perf_counter() - started:.1f} s")
+
+    last = args.days - 1
+    noon = start + timedelta(days=last, hours=12)
+    midnight = start + timedelta(days=last)
+
+    def query():
+        return stock_ledger.stock_at(db, "BENCH01", noon)
+
+    def report():
+        return stock_ledger.movement_report(db, "BENCH01", midnight, noon, limit=100)
+
+    for label in ("ledger only", "with snapshots"):
+        if label == "with snapshots":
+            add_snapshots(db, "BENCH01", snapshots)
+        ms, result = timed(query, args.repeat)
+        report_ms, movements = timed(report, args.repeat)
+        ok = result["quantities"] == at_noon[last]
+        print(f"{label:15s}: stock-at {ms:8.1f} ms ({result['movements_replayed']:,} movements replayed, "
+              f"{'correct' if ok else 'WRONG'})  movements report {report_ms:8.1f} ms "
+              f"({movements['movements_total']:,} movements)")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+# File: inventrack/admission.py
+
+"""
+Admission control for DB-bound routes (ADMISSION_CONTROL=1).
+
+Every DB-bound request needs a pooled connection. Without a cap, a burst
+(festival sale, 30 terminals billing at once) queues requests in the
+threadpool behind the pool's own checkout timeout and latency collapses for
+every store. This middleware admits at most ADMISSION_MAX_IN_FLIGHT requests
+(default: pool_size + max_overflow), at most ADMISSION_PER_STORE_LIMIT per
+store, and parks the rest in a bounded priority queue. Requests that cannot
+get in quickly are shed with 503 + Retry-After.
+
+Priority: billing > other writes > listings > analytics / forecasts / export.
+When the queue is full, a higher-priority arrival evicts the lowest-priority
+waiter instead of being shed itself.
+
+Runs on the event loop (one controller per worker process), so the state
+needs no locks.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from inventrack import database
+
+# --- 1. Route classification ---
+
+BILLING, WRITE, LISTING, ANALYTICS = 0, 1, 2, 3
+CLASS_NAMES = {BILLING: "billing", WRITE: "write", LISTING: "listing", ANALYTICS: "analytics"}
+
+# (methods, path pattern, priority). The first match wins; unmatched paths
+# (/, /docs, /internal/...) bypass admission entirely.
+ROUTE_CLASSES: List[Tuple[Tuple[str, ...], "re.Pattern", int]] = [
+    (("POST",), re.compile(r"^/sales/process_bill$"), BILLING),
+    (("POST", "PUT", "PATCH", "DELETE"), re.compile(r"^/(sales|inventory|products|auth|consumer)(/|$)"), WRITE),
+    (("GET",), re.compile(r"^/(inventory|products)(/|$)"), LISTING),
+    (("GET", "POST"), re.compile(r"^/(analytics|forecast|export|ml-data)(/|$)"), ANALYTICS),
+]
+
+# Store ID taken from the path where the route has one
+STORE_IN_PATH = re.compile(r"^/(?:inventory|analytics)/(?!owner/)([^/]+)")
+
+# Only billing carries its store in the body, and bills are small.
+MAX_BODY_PEEK = 256 * 1024
+
+
+def classify(method: str, path: str) -> Optional[int]:
+    for methods, pattern, priority in ROUTE_CLASSES:
+        if method in methods and pattern.match(path):
+            return priority
+    return None
+
+
+# --- 2. Controller ---
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "store_id", "future")
+
+    def __init__(self, priority: int, seq: int, store_id: Optional[str], future: "asyncio.Future"):
+        self.priority = priority
+        self.seq = seq
+        self.store_id = store_id
+        self.future = future
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_in_flight: int,
+        per_store_limit: int,
+        max_queue: int,
+        queue_timeout: float,
+        retry_after: int,
+    ):
+        self.max_in_flight = max_in_flight
+        self.per_store_limit = per_store_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self.in_flight = 0
+        self._per_store: Dict[str, int] = {}
+        self._waiters: List[_Waiter] = []  # kept sorted by (priority, seq)
+        self._seq = itertools.count()
+
+        self.counters: Dict[str, Dict[str, int]] = {
+            name: {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_timeout": 0, "shed_evicted": 0}
+            for name in CLASS_NAMES.values()
+        }
+
+    def _has_room(self, store_id: Optional[str]) -> bool:
+        if self.in_flight >= self.max_in_flight:
+            return False
+        return store_id is None or self._per_store.get(store_id, 0) < self.per_store_limit
+
+    def _take(self, store_id: Optional[str]) -> None:
+        self.in_flight += 1
+        if store_id is not None:
+            self._per_store[store_id] = self._per_store.get(store_id, 0) + 1
+
+    async def acquire(self, priority: int, store_id: Optional[str]) -> Optional[str]:
+        """Waits for a slot. Returns None once admitted, or the reason for shedding."""
+        counters = self.counters[CLASS_NAMES[priority]]
+
+        # Fast path: room now and nobody of equal/higher priority is waiting for it
+        if self._has_room(store_id) and not any(
+            w.priority <= priority and self._has_room(w.store_id) for w in self._waiters
+        ):
+            self._take(store_id)
+            counters["admitted"] += 1
+            return None
+
+        if len(self._waiters) >= self.max_queue:
+            worst = self._waiters[-1] if self._waiters else None
+            if worst is None or worst.priority <= priority:
+                counters["shed_queue_full"] += 1
+                return "queue_full"
+            # Make room by evicting the newest lowest-priority waiter
+            self._waiters.pop()
+            self.counters[CLASS_NAMES[worst.priority]]["shed_evicted"] += 1
+            if not worst.future.done():
+                worst.future.set_result(False)
+
+        waiter = _Waiter(priority, next(self._seq), store_id, asyncio.get_running_loop().create_future())
+        self._insert(waiter)
+        counters["queued"] += 1
+
+        try:
+            admitted = await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.future.done() and waiter.future.result():
+                # Admitted in the same tick the timeout fired: give the slot back
+                self.release(store_id)
+            else:
+                self._remove(waiter)
+            counters["shed_timeout"] += 1
+            return "timeout"
+        except BaseException:
+            # Cancelled while queued (client disconnected): drop the waiter, or
+            # give back the slot if it was granted in the meantime
+            if waiter.future.done():
+                if waiter.future.result():
+                    self.release(store_id)
+            else:
+                self._remove(waiter)
+                waiter.future.cancel()
+            raise
+
+        if not admitted:
+            return "evicted"
+        counters["admitted"] += 1
+        return None
+
+    def release(self, store_id: Optional[str]) -> None:
+        self.in_flight -= 1
+        if store_id is not None:
+            remaining = self._per_store.get(store_id, 1) - 1
+            if remaining > 0:
+                self._per_store[store_id] = remaining
+            else:
+                self._per_store.pop(store_id, None)
+        self._wake()
+
+    def _wake(self) -> None:
+        # Hand free slots to the best waiters whose store is under its limit
+        i = 0
+        while i < len(self._waiters) and self.in_flight < self.max_in_flight:
+            waiter = self._waiters[i]
+            if self._has_room(waiter.store_id):
+                self._waiters.pop(i)
+                self._take(waiter.store_id)
+                waiter.future.set_result(True)
+            else:
+                i += 1
+
+    def _insert(self, waiter: _Waiter) -> None:
+        key = (waiter.priority, waiter.seq)
+        i = len(self._waiters)
+        while i > 0 and (self._waiters[i - 1].priority, self._waiters[i - 1].seq) > key:
+            i -= 1
+        self._waiters.insert(i, waiter)
+
+    def _remove(self, waiter: _Waiter) -> None:
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        busiest = sorted(self._per_store.items(), key=lambda item: item[1], reverse=True)[:10]
+        return {
+            "enabled": enabled(),
+            "max_in_flight": self.max_in_flight,
+            "per_store_limit": self.per_store_limit,
+            "max_queue": self.max_queue,
+            "queue_timeout_seconds": self.queue_timeout,
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "busiest_stores": dict(busiest),
+            "by_class": self.counters,
+        }
+
+
+# --- 3. ASGI middleware ---
+
+class AdmissionControlMiddleware:
+    def __init__(self, app, controller: "AdmissionController"):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        priority = classify(scope["method"], scope["path"])
+        if priority is None:
+            return await self.app(scope, receive, send)
+
+        store_id = None
+        match = STORE_IN_PATH.match(scope["path"])
+        if match:
+            store_id = match.group(1)
+        elif priority == BILLING:
+            receive, store_id = await _peek_store_id(receive)
+
+        reason = await self.controller.acquire(priority, store_id)
+        if reason is not None:
+            return await _send_overloaded(send, self.controller.retry_after, reason)
+        try:
+            # Returns after the full response (streaming bodies included) is sent
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(store_id)
+
+
+async def _peek_store_id(receive):
+    """Reads the (small) request body, extracts store_id and replays the body."""
+    messages, size = [], 0
+    while True:
+        message = await receive()
+        messages.append(message)
+        if message["type"] != "http.request":
+            break
+        size += len(message.get("body", b""))
+        if not message.get("more_body", False) or size > MAX_BODY_PEEK:
+            break
+
+    store_id = None
+    try:
+        payload = json.loads(b"".join(m.get("body", b"") for m in messages))
+        if isinstance(payload, dict) and payload.get("store_id") is not None:
+            store_id = str(payload["store_id"])
+    except ValueError:
+        pass  # let the endpoint report the malformed body
+
+    pending = list(messages)
+
+    async def replay():
+        if pending:
+            return pending.pop(0)
+        return await receive()
+
+    return replay, store_id
+
+
+async def _send_overloaded(send, retry_after: int, reason: str) -> None:
+    body = json.dumps({"detail": "Server is busy, please retry shortly.", "reason": reason}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": 503,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("ascii")),
+            (b"retry-after", str(retry_after).encode("ascii")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+# --- 4. Process-wide instance ---
+
+def enabled() -> bool:
+    return os.getenv("ADMISSION_CONTROL", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _controller_from_env() -> AdmissionController:
+    pool = database.pool_settings()
+    max_in_flight = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", str(pool["pool_size"] + pool["max_overflow"])))
+    return AdmissionController(
+        max_in_flight=max_in_flight,
+        per_store_limit=int(os.getenv("ADMISSION_PER_STORE_LIMIT", str(max(1, max_in_flight // 3)))),
+        max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", str(4 * max_in_flight))),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "2.0")),
+        retry_after=int(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1")),
+    )
+
+
+admission_controller = _controller_from_env()
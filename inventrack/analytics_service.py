@@ -2,12 +2,15 @@
 
 from datetime import datetime, timedelta, date
 from sqlalchemy.orm import Session
-from sqlalchemy import func
-from typing import Dict, Any
+from sqlalchemy import case, func, select
+from typing import Dict, Any, List
 from . import models
+from .sales_partitions import sales_rows
 
 # --- 1. Utility Functions ---
 
+PERIODS = ['daily', 'weekly', 'monthly', 'overall']
+
 def _get_current_period_start(period: str) -> date:
     """Calculates the start date for the current period (Daily, Weekly, Monthly, Overall)."""
     now = datetime.now()
@@ -26,72 +29,145 @@ def _get_current_period_start(period: str) -> date:
     return now.date()
 
 
+def _kpi_block(sales_count, units_sold, revenue) -> Dict[str, Any]:
+    """Structures one period's totals according to the TimePeriodKPI schema."""
+    return {
+        'total_sales_count': {'value': float(sales_count or 0), 'unit': 'Count'},
+        'total_revenue_inr': {'value': float(revenue or 0), 'unit': 'INR'},
+        'total_units_sold': {'value': float(units_sold or 0), 'unit': 'Units'}
+    }
+
+
+def _trend_point(day: date, revenue) -> Dict[str, Any]:
+    """
+    One SalesTrendDataPoint. The point was emitted as `date` before it was
+    renamed to `revenue_date`; older app builds still read `date`, so both
+    keys are sent until those builds are retired.
+    """
+    iso_day = day.isoformat()
+    return {'revenue_date': iso_day, 'date': iso_day, 'total_revenue_inr': float(revenue or 0)}
+
+
 # --- 2. Public Service Function ---
 
 def get_sales_analytics(db: Session, store_id: str) -> Dict[str, Any]:
     """
     Calculates all KPIs and the 30-day sales trend data for the dashboard.
+    Each query reads SalesData through sales_rows(), so only the monthly
+    partitions covering its date window are touched.
     """
     results = {'store_id': store_id}
-    periods = ['daily', 'weekly', 'monthly', 'overall']
-    
-    # Revenue expression: Units_Sold * Price (assuming Price is the DECIMAL column in SalesData)
-    revenue_expr = models.SalesData.units_sold * models.SalesData.price
+    periods = PERIODS
     
     # --- A. Calculate Simple KPIs (Daily, Weekly, Monthly, Overall) ---
     
     for period in periods:
         start_date = _get_current_period_start(period)
+        sales = sales_rows(db, start_date, date.today(), [store_id])
+        # Revenue expression: Units_Sold * Price (assuming Price is the DECIMAL column in SalesData)
+        revenue_expr = sales.c.Units_Sold * sales.c.Price
 
         # Aggregate query for the period (from start_date to today)
         metrics_query = db.query(
-            func.count(models.SalesData.record_id).label('total_sales_count'),
-            func.sum(models.SalesData.units_sold).label('total_units_sold'),
+            func.count(sales.c.RecordID).label('total_sales_count'),
+            func.sum(sales.c.Units_Sold).label('total_units_sold'),
             func.sum(revenue_expr).label('total_revenue_inr'),
-        ).filter(
-            models.SalesData.store_id == store_id,
-            models.SalesData.date.between(start_date, date.today())
         ).one_or_none()
 
-        metrics = {
-            'total_sales_count': float(metrics_query.total_sales_count or 0) if metrics_query else 0.0,
-            'total_units_sold': float(metrics_query.total_units_sold or 0) if metrics_query else 0.0,
-            'total_revenue_inr': float(metrics_query.total_revenue_inr or 0) if metrics_query else 0.0,
-        }
-        
-        # Structure the data according to the SimpleMetric schema
-        kpi_data = {
-            'total_sales_count': {'value': metrics['total_sales_count'], 'unit': 'Count'},
-            'total_revenue_inr': {'value': metrics['total_revenue_inr'], 'unit': 'INR'},
-            'total_units_sold': {'value': metrics['total_units_sold'], 'unit': 'Units'}
-        }
-        
+        if metrics_query:
+            kpi_data = _kpi_block(metrics_query.total_sales_count, metrics_query.total_units_sold,
+                                  metrics_query.total_revenue_inr)
+        else:
+            kpi_data = _kpi_block(0, 0, 0)
+
         results[f'kpis_{period}'] = kpi_data
         
     # --- B. Calculate Sales Trend Data for Graph (Last 30 Days Revenue) ---
     
     thirty_days_ago = date.today() - timedelta(days=30)
+    sales = sales_rows(db, thirty_days_ago, None, [store_id])
     
     # Query to get daily total revenue for the last 30 days
     trend_query = db.query(
-        models.SalesData.date.label('date'),
-        func.sum(revenue_expr).label('total_revenue_inr')
-    ).filter(
-        models.SalesData.store_id == store_id,
-        models.SalesData.date >= thirty_days_ago
+        sales.c.Date.label('date'),
+        func.sum(sales.c.Units_Sold * sales.c.Price).label('total_revenue_inr')
     ).group_by(
-        models.SalesData.date
+        sales.c.Date
     ).order_by(
-        models.SalesData.date
+        sales.c.Date
     ).all()
 
     # Convert results to Pydantic-compatible list
-    results['sales_trend_data'] = [
-        {
-            'date': row.date.isoformat(),
-            'total_revenue_inr': float(row.total_revenue_inr)
-        }
-        for row in trend_query
-    ]
+    results['sales_trend_data'] = [_trend_point(row.date, row.total_revenue_inr) for row in trend_query]
     
-    return results
\ No newline at end of file
+    return results
+
+
+# --- 3. Owner-level (multi-store) Service Function ---
+
+def get_owner_analytics(db: Session, owner_id: int, shops: List[models.Shop]) -> Dict[str, Any]:
+    """
+    KPIs and the 30-day trend for every store of one owner, plus combined
+    totals. Two grouped queries regardless of the number of stores: one
+    with conditional aggregates per period, one grouped by (store, day).
+    """
+    store_ids = [shop.store_id for shop in shops]
+    starts = {period: _get_current_period_start(period) for period in PERIODS}
+
+    # --- A. KPIs: one row per store, one set of conditional sums per period ---
+    sales = sales_rows(db, starts['overall'], date.today(), store_ids)
+    revenue_expr = sales.c.Units_Sold * sales.c.Price
+    columns = [sales.c.Store_ID.label('store_id')]
+    for period in PERIODS:
+        in_period = sales.c.Date >= starts[period]
+        columns += [
+            func.count(case((in_period, sales.c.RecordID))).label(f'{period}_count'),
+            func.sum(case((in_period, sales.c.Units_Sold))).label(f'{period}_units'),
+            func.sum(case((in_period, revenue_expr))).label(f'{period}_revenue'),
+        ]
+    kpi_rows = {row.store_id: row for row in db.execute(select(*columns).group_by(sales.c.Store_ID))}
+
+    # --- B. Trend: daily revenue per store for the last 30 days ---
+    trend_sales = sales_rows(db, date.today() - timedelta(days=30), None, store_ids)
+    trend_rows = db.execute(
+        select(
+            trend_sales.c.Store_ID.label('store_id'),
+            trend_sales.c.Date.label('date'),
+            func.sum(trend_sales.c.Units_Sold * trend_sales.c.Price).label('total_revenue_inr'),
+        ).group_by(trend_sales.c.Store_ID, trend_sales.c.Date)
+    ).all()
+
+    trends: Dict[str, Dict[date, float]] = {store_id: {} for store_id in store_ids}
+    combined_trend: Dict[date, float] = {}
+    for row in trend_rows:
+        day = row.date if isinstance(row.date, date) else date.fromisoformat(str(row.date)[:10])
+        revenue = float(row.total_revenue_inr or 0)
+        trends[row.store_id][day] = revenue
+        combined_trend[day] = combined_trend.get(day, 0.0) + revenue
+
+    def _trend_points(by_day: Dict[date, float]) -> List[Dict[str, Any]]:
+        return [_trend_point(day, by_day[day]) for day in sorted(by_day)]
+
+    # --- C. Per-store blocks and combined totals ---
+    combined = {period: [0.0, 0.0, 0.0] for period in PERIODS}
+    stores = []
+    for shop in shops:
+        row = kpi_rows.get(shop.store_id)
+        block = {'store_id': shop.store_id, 'shop_name': shop.shop_name}
+        for period in PERIODS:
+            values = [(getattr(row, f'{period}_{k}') or 0) if row else 0 for k in ('count', 'units', 'revenue')]
+            block[f'kpis_{period}'] = _kpi_block(*values)
+            for i, value in enumerate(values):
+                combined[period][i] += float(value)
+        block['sales_trend_data'] = _trend_points(trends[shop.store_id])
+        stores.append(block)
+
+    return {
+        'owner_id': owner_id,
+        'store_count': len(stores),
+        'combined': {
+            **{f'kpis_{period}': _kpi_block(*combined[period]) for period in PERIODS},
+            'sales_trend_data': _trend_points(combined_trend),
+        },
+        'stores': stores,
+    }
\ No newline at end of file
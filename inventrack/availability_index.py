@@ -0,0 +1,292 @@
+# File: inventrack/availability_index.py
+
+"""
+In-memory "who has it in stock near me" index for consumers:
+(product_id, city) -> {store_id: qty} over every active shop with stock > 0.
+
+GET /consumer/availability is answered from this index alone, so consumer
+traffic never reaches Inventory or shops. The index is
+
+- built at startup (and lazily by the first request if that failed), from a
+  read replica when one is configured;
+- patched by the write paths after they commit: `update_stock` with the new
+  quantities (billing, product create / edit, CSV upload) and `refresh_store`
+  for a new or changed shop;
+- fully rebuilt once it is AVAILABILITY_REFRESH_SECONDS old, in a background
+  thread, to pick up writes made by other workers. Updates that land while a
+  rebuild is reading are replayed onto the new index before it is swapped in.
+
+Stock updates are absolute post-commit quantities and can arrive out of
+order. They carry the write version the caller took from
+`inventory_cache.begin_write` while holding its row locks, and an update
+older than the last one applied to that product is ignored, exactly as
+`inventory_cache.patch_stock` does. A cold index is built by one request;
+concurrent ones wait for it instead of each building their own.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from inventrack import models
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_city(city: Optional[str]) -> str:
+    return " ".join((city or "").split()).casefold()
+
+
+class StoreInfo(NamedTuple):
+    store_id: str
+    shop_name: str
+    address: str
+    city: str
+    shop_phone: Optional[str]
+
+
+class _Snapshot:
+    __slots__ = ("stores", "stock", "by_key")
+
+    def __init__(self):
+        self.stores: Dict[str, StoreInfo] = {}                      # active shops
+        self.stock: Dict[str, Dict[str, int]] = {}                  # store_id -> product_id -> qty
+        self.by_key: Dict[Tuple[str, str], Dict[str, int]] = {}     # (product_id, city) -> store_id -> qty
+
+    def set_qty(self, store_id: str, product_id: str, qty: int) -> None:
+        store = self.stores.get(store_id)
+        if store is None:
+            return
+        key = (product_id, normalize_city(store.city))
+        if qty > 0:
+            self.stock.setdefault(store_id, {})[product_id] = qty
+            self.by_key.setdefault(key, {})[store_id] = qty
+        else:
+            self.stock.get(store_id, {}).pop(product_id, None)
+            holders = self.by_key.get(key)
+            if holders is not None:
+                holders.pop(store_id, None)
+                if not holders:
+                    del self.by_key[key]
+
+    def replace_store(self, store: Optional[StoreInfo], store_id: str, quantities: Dict[str, int]) -> None:
+        """Drops everything known about a store, then loads its current rows."""
+        for product_id in list(self.stock.get(store_id, ())):
+            self.set_qty(store_id, product_id, 0)
+        self.stock.pop(store_id, None)
+        self.stores.pop(store_id, None)
+        if store is None:
+            return
+        self.stores[store_id] = store
+        for product_id, qty in quantities.items():
+            self.set_qty(store_id, product_id, qty)
+
+
+def _active_shops():
+    return or_(models.Shop.status.is_(None), models.Shop.status == "Active")
+
+
+def _load_stores(db: Session, store_id: Optional[str] = None) -> Dict[str, StoreInfo]:
+    query = select(
+        models.Shop.store_id, models.Shop.shop_name, models.Shop.address, models.Shop.city, models.Shop.shop_phone,
+    ).where(_active_shops())
+    if store_id is not None:
+        query = query.where(models.Shop.store_id == store_id)
+    return {row[0]: StoreInfo(*row) for row in db.execute(query)}
+
+
+def _load_stock(db: Session, store_id: Optional[str] = None):
+    query = select(models.Inventory.store_id, models.Inventory.product_id, models.Inventory.stock_quantity).where(
+        models.Inventory.stock_quantity > 0
+    )
+    if store_id is not None:
+        query = query.where(models.Inventory.store_id == store_id)
+    return db.execute(query, execution_options={"yield_per": 50_000})
+
+
+class AvailabilityIndex:
+    def __init__(self, refresh_seconds: float):
+        self.refresh_seconds = refresh_seconds
+        self._snapshot: Optional[_Snapshot] = None
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._cold_load_lock = threading.Lock()  # one startup / lazy build at a time
+        # (store_id, product_id) -> write version of the last stock update applied
+        self._versions: Dict[Tuple[str, str], int] = {}
+        # Changes seen while a rebuild is reading, replayed onto its result
+        self._pending: Optional[List[Tuple[str, Any]]] = None
+        self._refreshing = False
+
+        self.queries = 0
+        self.rebuilds = 0
+        self.updates = 0
+        self.stale_updates = 0
+        self.build_seconds = 0.0
+
+    @property
+    def loaded(self) -> bool:
+        return self._snapshot is not None
+
+    # --- 1. Building ---
+
+    def rebuild(self, db: Session) -> int:
+        """Replaces the index with a fresh copy built from shops and Inventory."""
+        with self._rebuild_lock:
+            started = time.perf_counter()
+            with self._lock:
+                self._pending = []
+            snapshot = _Snapshot()
+            try:
+                snapshot.stores = _load_stores(db)
+                for store_id, product_id, qty in _load_stock(db):
+                    snapshot.set_qty(store_id, product_id, qty)
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            with self._lock:
+                for kind, change in self._pending:
+                    if kind == "stock":
+                        store_id, quantities = change
+                        for product_id, qty in quantities.items():
+                            snapshot.set_qty(store_id, product_id, qty)
+                    else:
+                        snapshot.replace_store(*change)
+                self._pending = None
+                self._snapshot = snapshot
+                self._loaded_at = time.monotonic()
+                self.rebuilds += 1
+            self.build_seconds = time.perf_counter() - started
+            return len(snapshot.by_key)
+
+    def _ensure_loaded(self, session_factory: Callable[[], Session]) -> None:
+        if self._snapshot is None:
+            with self._cold_load_lock:
+                if self._snapshot is not None:
+                    return  # built by the request this one waited for
+                db = session_factory()
+                try:
+                    self.rebuild(db)
+                finally:
+                    db.close()
+        elif time.monotonic() - self._loaded_at > self.refresh_seconds:
+            with self._lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            threading.Thread(
+                target=self._refresh_in_background, args=(session_factory,), name="availability-refresh", daemon=True
+            ).start()
+
+    def _refresh_in_background(self, session_factory: Callable[[], Session]) -> None:
+        db = session_factory()
+        try:
+            self.rebuild(db)
+        except Exception:
+            logger.exception("Availability index refresh failed; keeping the current one.")
+            self._loaded_at = time.monotonic()  # retry after another full interval
+        finally:
+            db.close()
+            self._refreshing = False
+
+    # --- 2. Reads ---
+
+    def lookup(self, session_factory: Callable[[], Session], product_id: str, city: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """Shops in `city` that stock `product_id`, most stock first."""
+        self._ensure_loaded(session_factory)
+        self.queries += 1
+        with self._lock:
+            snapshot = self._snapshot
+            holders = list(snapshot.by_key.get((product_id, normalize_city(city)), {}).items())
+            stores = snapshot.stores
+            holders.sort(key=lambda item: (-item[1], item[0]))
+            return [
+                {**stores[store_id]._asdict(), "qty": qty}
+                for store_id, qty in holders[:limit]
+                if store_id in stores
+            ]
+
+    # --- 3. Write-path hooks (call after the write is committed) ---
+
+    def update_stock(self, store_id: str, quantities: Dict[str, int], version: Optional[int] = None) -> None:
+        """
+        New stock levels of some products of one store, committed by write
+        `version` (from inventory_cache.begin_write). Without a version the
+        update is applied unconditionally: only for rows no other write can
+        have touched yet, such as a product created by the same request.
+        """
+        with self._lock:
+            if version is not None:
+                fresh = {}
+                for product_id, qty in quantities.items():
+                    if version <= self._versions.get((store_id, product_id), 0):
+                        self.stale_updates += 1  # a later write of this product is already applied
+                        continue
+                    self._versions[(store_id, product_id)] = version
+                    fresh[product_id] = qty
+                quantities = fresh
+                if not quantities:
+                    return
+            if self._pending is not None:
+                self._pending.append(("stock", (store_id, dict(quantities))))
+            if self._snapshot is None:
+                return
+            for product_id, qty in quantities.items():
+                self._snapshot.set_qty(store_id, product_id, qty)
+            self.updates += 1
+
+    def refresh_store(self, db: Session, store_id: str) -> None:
+        """Reloads one store's shop row and stock after a bulk write. Never raises."""
+        if self._snapshot is None and self._pending is None:
+            return
+        try:
+            store = _load_stores(db, store_id).get(store_id)
+            quantities = {product_id: qty for _, product_id, qty in _load_stock(db, store_id)} if store else {}
+        except Exception:
+            logger.exception("Availability index refresh of store %s failed.", store_id)
+            return
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append(("store", (store, store_id, quantities)))
+            if self._snapshot is not None:
+                self._snapshot.replace_store(store, store_id, quantities)
+            self.updates += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            snapshot = self._snapshot
+            return {
+                "loaded": snapshot is not None,
+                "stores": len(snapshot.stores) if snapshot else 0,
+                "keys": len(snapshot.by_key) if snapshot else 0,
+                "queries": self.queries,
+                "updates": self.updates,
+                "stale_updates": self.stale_updates,
+                "rebuilds": self.rebuilds,
+                "build_seconds": round(self.build_seconds, 3),
+                "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None,
+            }
+
+
+availability_index = AvailabilityIndex(
+    refresh_seconds=float(os.getenv("AVAILABILITY_REFRESH_SECONDS", "300")),
+)
+
+
+def warm(session_factory) -> None:
+    """Startup build. A failure here is not fatal; the first query retries."""
+    db = session_factory()
+    try:
+        keys = availability_index.rebuild(db)
+        logger.info("Availability index built with %d (product, city) keys in %.2f s.",
+                    keys, availability_index.build_seconds)
+    except Exception:
+        logger.exception("Availability index build failed; it will build lazily.")
+    finally:
+        db.close()
@@ -0,0 +1,224 @@
+# File: inventrack/backtest.py
+
+"""
+Rolling-origin backtesting of demand forecasters over historical SalesData.
+
+Every (store, product) series is rebuilt as a dense daily series. For each
+forecast origin (the last `origins` cut-off dates, `step` days apart) every
+model is trained on the days before the origin and scored on the next
+`horizon` days. Series are fanned out over a process pool; the parent only
+loads the data and sums the error accumulators.
+
+Reported per model, and per model and category:
+  MAPE  mean of |error| / actual over days with actual > 0 (%)
+  WAPE  sum |error| / sum actual (%)
+  bias  sum error / sum actual (%, positive = over-forecast)
+plus wall-clock time, series/sec and the CPU seconds each model used.
+
+    python -m inventrack.manage backtest --models naive,seasonal_naive --workers 4
+"""
+
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from inventrack import models
+from inventrack.sales_partitions import sales_rows
+
+# --- 1. Models: history (oldest first) -> `horizon` daily forecasts ---
+# Top-level functions so they pickle into the worker processes.
+
+def forecast_mock(history: List[float], horizon: int) -> List[float]:
+    """What /forecast/demand returns today (create_mock_forecast), seeded."""
+    rng = random.Random(len(history))
+    return [float(rng.randint(50, 300)) for _ in range(horizon)]
+
+
+def forecast_naive(history: List[float], horizon: int) -> List[float]:
+    return [history[-1]] * horizon
+
+
+def forecast_seasonal_naive(history: List[float], horizon: int) -> List[float]:
+    """Same weekday last week."""
+    week = history[-7:]
+    return [week[i % len(week)] for i in range(horizon)]
+
+
+def forecast_moving_average(history: List[float], horizon: int) -> List[float]:
+    window = history[-28:]
+    return [sum(window) / len(window)] * horizon
+
+
+def forecast_ses(history: List[float], horizon: int, alpha: float = 0.3) -> List[float]:
+    """Simple exponential smoothing."""
+    level = history[0]
+    for value in history[1:]:
+        level = alpha * value + (1 - alpha) * level
+    return [level] * horizon
+
+
+MODELS: Dict[str, Callable[[List[float], int], List[float]]] = {
+    "mock": forecast_mock,
+    "naive": forecast_naive,
+    "seasonal_naive": forecast_seasonal_naive,
+    "moving_average": forecast_moving_average,
+    "ses": forecast_ses,
+}
+
+
+# --- 2. Per-series evaluation (runs in the worker processes) ---
+
+def _empty_accumulator() -> Dict[str, float]:
+    return {"abs_error": 0.0, "error": 0.0, "actual": 0.0, "ape_sum": 0.0, "ape_count": 0, "points": 0, "cpu_seconds": 0.0}
+
+
+def evaluate_series(
+    series: List[float], model_names: Sequence[str], horizon: int, origins: int, step: int, min_train: int
+) -> Dict[str, Dict[str, float]]:
+    results = {name: _empty_accumulator() for name in model_names}
+    last_origin = len(series) - horizon
+    cutoffs = [last_origin - i * step for i in range(origins)]
+    cutoffs = [c for c in cutoffs if c >= min_train]
+    for name in model_names:
+        model = MODELS[name]
+        acc = results[name]
+        started = time.process_time()
+        for cutoff in cutoffs:
+            forecast = model(series[:cutoff], horizon)
+            for predicted, actual in zip(forecast, series[cutoff:cutoff + horizon]):
+                error = predicted - actual
+                acc["abs_error"] += abs(error)
+                acc["error"] += error
+                acc["actual"] += actual
+                acc["points"] += 1
+                if actual > 0:
+                    acc["ape_sum"] += abs(error) / actual
+                    acc["ape_count"] += 1
+        acc["cpu_seconds"] += time.process_time() - started
+    return results
+
+
+def _evaluate_chunk(args) -> List[Tuple[str, Dict[str, Dict[str, float]]]]:
+    chunk, model_names, horizon, origins, step, min_train = args
+    return [
+        (category, evaluate_series(series, model_names, horizon, origins, step, min_train))
+        for category, series in chunk
+    ]
+
+
+# --- 3. Loading the series (parent process) ---
+
+def load_series(
+    db: Session, start: date, end: date, store_ids: Optional[Sequence[str]] = None
+) -> List[Tuple[str, List[float]]]:
+    """(category, dense daily units from the series' first sale to `end`) per (store, product)."""
+    sales = sales_rows(db, start, end, store_ids)
+    query = (
+        select(sales.c.Store_ID, sales.c.Product_ID, sales.c.Date, func.sum(sales.c.Units_Sold))
+        .group_by(sales.c.Store_ID, sales.c.Product_ID, sales.c.Date)
+    )
+    daily: Dict[Tuple[str, str], Dict[date, float]] = {}
+    for store_id, product_id, day, units in db.execute(query):
+        if not isinstance(day, date):
+            day = date.fromisoformat(str(day)[:10])
+        daily.setdefault((store_id, product_id), {})[day] = float(units or 0)
+
+    categories = dict(db.execute(select(models.Product.id, models.Product.category)).all())
+    out = []
+    for (store_id, product_id), by_day in daily.items():
+        first = min(by_day)
+        length = (end - first).days + 1
+        out.append((
+            categories.get(product_id) or "Uncategorized",
+            [by_day.get(first + timedelta(days=i), 0.0) for i in range(length)],
+        ))
+    return out
+
+
+# --- 4. Driver ---
+
+def _metrics(acc: Dict[str, float]) -> Dict[str, Any]:
+    return {
+        "mape": round(100 * acc["ape_sum"] / acc["ape_count"], 2) if acc["ape_count"] else None,
+        "wape": round(100 * acc["abs_error"] / acc["actual"], 2) if acc["actual"] else None,
+        "bias": round(100 * acc["error"] / acc["actual"], 2) if acc["actual"] else None,
+        "points": int(acc["points"]),
+        "cpu_seconds": round(acc["cpu_seconds"], 3),
+    }
+
+
+def run_backtest(
+    series: List[Tuple[str, List[float]]],
+    model_names: Sequence[str],
+    horizon: int = 7,
+    origins: int = 8,
+    step: int = 7,
+    min_train: int = 28,
+    workers: Optional[int] = None,
+    chunk_size: int = 64,
+) -> Dict[str, Any]:
+    unknown = [name for name in model_names if name not in MODELS]
+    if unknown:
+        raise ValueError(f"Unknown model(s): {', '.join(unknown)}. Available: {', '.join(MODELS)}")
+    workers = workers or os.cpu_count() or 1
+
+    chunks = [
+        (series[i:i + chunk_size], list(model_names), horizon, origins, step, min_train)
+        for i in range(0, len(series), chunk_size)
+    ]
+    started = time.perf_counter()
+    if workers == 1:
+        per_chunk = [_evaluate_chunk(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            per_chunk = list(pool.map(_evaluate_chunk, chunks))
+    wall = time.perf_counter() - started
+
+    by_model = {name: _empty_accumulator() for name in model_names}
+    by_category: Dict[Tuple[str, str], Dict[str, float]] = {}
+    for chunk in per_chunk:
+        for category, result in chunk:
+            for name, acc in result.items():
+                for target in (by_model[name], by_category.setdefault((name, category), _empty_accumulator())):
+                    for key, value in acc.items():
+                        target[key] += value
+
+    return {
+        "series": len(series),
+        "workers": workers,
+        "horizon": horizon,
+        "origins": origins,
+        "step": step,
+        "wall_seconds": round(wall, 3),
+        "series_per_second": round(len(series) / wall, 1) if wall else None,
+        "models": {name: _metrics(acc) for name, acc in by_model.items()},
+        "categories": {
+            f"{name}/{category}": _metrics(acc) for (name, category), acc in sorted(by_category.items())
+        },
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"{report['series']:,} series, horizon {report['horizon']}d, {report['origins']} origins every "
+        f"{report['step']}d, {report['workers']} workers: {report['wall_seconds']:.2f} s wall, "
+        f"{report['series_per_second']} series/s",
+        f"{'model':32s} {'MAPE%':>8s} {'WAPE%':>8s} {'bias%':>8s} {'points':>9s} {'cpu s':>8s}",
+    ]
+
+    def row(label, m):
+        fmt = lambda v: f"{v:8.2f}" if v is not None else f"{'-':>8s}"  # noqa: E731
+        return f"{label:32s} {fmt(m['mape'])} {fmt(m['wape'])} {fmt(m['bias'])} {m['points']:9d} {m['cpu_seconds']:8.2f}"
+
+    for name, m in report["models"].items():
+        lines.append(row(name, m))
+    lines.append("")
+    for label, m in report["categories"].items():
+        lines.append(row(label, m))
+    return "\n".join(lines)
@@ -0,0 +1,102 @@
+# File: inventrack/baskets.py
+
+"""
+Bill (basket) persistence shared by process_bill and the write-behind flusher.
+
+Bill IDs are generated by the API rather than the DB so the same bill can be
+written either inside the billing transaction or later by the sales buffer,
+and a replayed buffer segment can skip bills that already made it in.
+"""
+
+import uuid
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from inventrack import models
+
+
+def new_bill_id() -> str:
+    return "B" + uuid.uuid4().hex.upper()
+
+
+def basket_lines(sales_records: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Merges repeated products of one bill into a single line each."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for record in sales_records:
+        line = merged.get(record["product_id"])
+        if line is None:
+            merged[record["product_id"]] = {
+                "product_id": record["product_id"],
+                "quantity": record["units_sold"],
+                "price": record.get("price"),
+            }
+        else:
+            line["quantity"] += record["units_sold"]
+    return list(merged.values())
+
+
+def bill_entry(
+    bill_id: str, store_id: str, user_id: Optional[int], total_amount, bill_date: date, lines: List[Dict[str, Any]]
+) -> Dict[str, Any]:
+    """The bill header in the JSON-friendly form the sales buffer also stores."""
+    return {
+        "bill_id": bill_id,
+        "store_id": store_id,
+        "user_id": user_id,
+        "total_amount": total_amount,
+        "date": bill_date.isoformat(),
+        "lines": lines,
+    }
+
+
+def stored_bill_ids(db: Session, bill_ids: Sequence[str]) -> Set[str]:
+    """The subset of `bill_ids` already in Bills."""
+    if not bill_ids:
+        return set()
+    return set(db.execute(
+        select(models.Bill.bill_id).where(models.Bill.bill_id.in_(set(bill_ids)))
+    ).scalars())
+
+
+def insert_bills(db: Session, bills: Sequence[Dict[str, Any]]) -> int:
+    """
+    Inserts bills (as built by bill_entry) and their lines, skipping bill IDs
+    that already exist. Runs inside the caller's transaction; returns the
+    number of bills written.
+    """
+    if not bills:
+        return 0
+    existing = stored_bill_ids(db, [bill["bill_id"] for bill in bills])
+
+    now = datetime.now()
+    headers, items = [], []
+    for bill in bills:
+        if bill["bill_id"] in existing:
+            continue
+        existing.add(bill["bill_id"])
+        headers.append({
+            "bill_id": bill["bill_id"],
+            "store_id": bill["store_id"],
+            "user_id": bill.get("user_id"),
+            "bill_date": date.fromisoformat(bill["date"]),
+            "created_at": now,
+            "total_amount": Decimal(str(bill["total_amount"])) if bill.get("total_amount") is not None else None,
+            "item_count": len(bill["lines"]),
+        })
+        items.extend(
+            {
+                "bill_id": bill["bill_id"],
+                "product_id": line["product_id"],
+                "quantity": line["quantity"],
+                "price": Decimal(str(line["price"])) if line.get("price") is not None else None,
+            }
+            for line in bill["lines"]
+        )
+    if headers:
+        db.execute(insert(models.Bill), headers)
+        db.execute(insert(models.BillItem), items)
+    return len(headers)
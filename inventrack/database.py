@@ -1,45 +1,301 @@
-import json 
+import itertools
+import json
+import logging
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import declarative_base, sessionmaker
 # We assume load_dotenv is called earlier, but adding it here for completeness
-from dotenv import load_dotenv 
+from dotenv import load_dotenv
+
+from inventrack import slow_query_log
 
 # Load environment variables (from .env locally, or Render ENV in production)
 load_dotenv()
 
-db_url_raw = os.getenv("DATABASE_URL")
-# This variable is set by the Dockerfile (ENV SQLALCHEMY_CONNECT_ARGS)
-ssl_connect_args_json = os.getenv("SQLALCHEMY_CONNECT_ARGS") 
+logger = logging.getLogger(__name__)
+
+# This is the single engine factory for the whole app. Nothing here touches the
+# network at import time: the engine is built on first use by get_engine().
+Base = declarative_base()
+
+_engine = None
+_engine_lock = threading.Lock()
+_session_factory = sessionmaker(autocommit=False, autoflush=False)
+
+
+def _database_url() -> str:
+    db_url_raw = os.getenv("DATABASE_URL")
+    if db_url_raw is None:
+        # This prevents the application from serving requests if the URL is missing
+        raise EnvironmentError(
+            "DATABASE_URL not found in environment variables. Deployment will fail."
+        )
+    # --- FINAL FIX: TRANSFORM THE DIALECT TO USE PYMYSQL ---
+    return db_url_raw.replace("mysql+mysqlconnector", "mysql+pymysql")
 
-if db_url_raw is None:
-    # This prevents the application from starting if the URL is missing
-    raise EnvironmentError(
-        "DATABASE_URL not found in environment variables. Deployment will fail."
-    )
-    
-# --- FINAL FIX: TRANSFORM THE DIALECT TO USE PYMYSQL ---
-DATABASE_URL = db_url_raw
 
-# --- SSL CONNECTION LOGIC (CRUCIAL FOR TiDB) ---
-connect_args = {}
-if ssl_connect_args_json:
+def _connect_args() -> dict:
+    # This variable is set by the Dockerfile (ENV SQLALCHEMY_CONNECT_ARGS)
+    ssl_connect_args_json = os.getenv("SQLALCHEMY_CONNECT_ARGS")
+    if not ssl_connect_args_json:
+        return {}
     try:
         # We parse the JSON string provided by the Dockerfile ENV variable
-        connect_args = json.loads(ssl_connect_args_json)
+        return json.loads(ssl_connect_args_json)
     except json.JSONDecodeError as e:
         # If the JSON is invalid, the deployment is faulty
         raise EnvironmentError(f"SQLALCHEMY_CONNECT_ARGS is invalid JSON: {e}")
 
-# --- ENGINE CREATION (Uses the transformed URL and SSL args) ---
-engine = create_engine(
-    DATABASE_URL, 
-    pool_pre_ping=True, 
-    pool_recycle=3600,
-    # This applies the '{"ssl": {"ca": "tidb_ca_cert.pem"}}' to the driver
-    connect_args=connect_args 
-)
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+def pool_settings() -> dict:
+    """Connection pool sizing (DB_POOL_SIZE / DB_MAX_OVERFLOW)."""
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    }
+
+
+def _build_engine(url: str):
+    # SQLite files get their own tuned setup (see SQLITE MODE below)
+    if _sqlite_tuned(url):
+        return _build_sqlite_engine(url, writer=True)
+    # --- ENGINE CREATION (Uses the transformed URL and SSL args) ---
+    engine = create_engine(
+        url,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        # This applies the '{"ssl": {"ca": "tidb_ca_cert.pem"}}' to the driver
+        connect_args=_connect_args(),
+        **pool_settings(),
+    )
+    # Opt-in slow-query log (SLOW_QUERY_LOG=1); installs nothing when disabled
+    slow_query_log.attach_if_enabled(engine)
+    return engine
+
+
+# --- SQLITE MODE ---
+# Single-store / edge installs run on a local SQLite file. Unless
+# SQLITE_TUNING=0, such a URL gets:
+# - WAL journaling, synchronous=NORMAL, a memory map, a larger page cache and
+#   a busy timeout, applied on every new connection;
+# - one writer connection (SessionLocal): writers queue for it in the pool
+#   instead of spinning on "database is locked";
+# - a pool of query-only reader connections (ReadSessionLocal), which WAL
+#   lets run alongside the writer and which always see its last commit;
+# - BEGIN IMMEDIATE for every writer transaction. SQLite has no
+#   SELECT ... FOR UPDATE, so this is what makes read-check-decrement
+#   sequences (process_bill) safe: the write lock is held from the first read.
+
+def _sqlite_tuned(url: str) -> bool:
+    parsed = make_url(url)
+    return (
+        parsed.get_backend_name() == "sqlite"
+        and parsed.database not in (None, "", ":memory:")
+        and os.getenv("SQLITE_TUNING", "1").strip().lower() not in ("0", "false", "no", "off")
+    )
+
+
+def _sqlite_pragmas() -> list:
+    return [
+        "PRAGMA journal_mode=WAL",
+        "PRAGMA synchronous=NORMAL",
+        f"PRAGMA mmap_size={int(os.getenv('SQLITE_MMAP_SIZE_MB', '256')) * 1024 * 1024}",
+        f"PRAGMA cache_size=-{int(os.getenv('SQLITE_CACHE_SIZE_MB', '64')) * 1024}",  # negative: KiB
+        f"PRAGMA busy_timeout={int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))}",
+        "PRAGMA temp_store=MEMORY",
+    ]
+
+
+def _build_sqlite_engine(url: str, writer: bool):
+    if writer:
+        pool = {"pool_size": 1, "max_overflow": 0,
+                "pool_timeout": float(os.getenv("SQLITE_WRITE_TIMEOUT_SECONDS", "30"))}
+    else:
+        pool = {"pool_size": int(os.getenv("SQLITE_READ_POOL_SIZE", str(pool_settings()["pool_size"]))),
+                "max_overflow": pool_settings()["max_overflow"]}
+    engine = create_engine(url, connect_args={"check_same_thread": False}, **pool)
+    pragmas = _sqlite_pragmas() + ([] if writer else ["PRAGMA query_only=ON"])
+    begin = "BEGIN IMMEDIATE" if writer else "BEGIN"
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        # Take over transaction control from the sqlite3 module so BEGIN is ours
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql(begin)
+
+    slow_query_log.attach_if_enabled(engine)
+    return engine
+
+
+_sqlite_reader = None
+_sqlite_primary = None
+
+
+def _sqlite_read_engine():
+    global _sqlite_reader
+    if _sqlite_reader is None:
+        with _engine_lock:
+            if _sqlite_reader is None:
+                _sqlite_reader = _build_sqlite_engine(_database_url(), writer=False)
+    return _sqlite_reader
+
+
+def sqlite_mode() -> bool:
+    """True when the primary is a tuned SQLite file (single writer + reader pool)."""
+    global _sqlite_primary
+    if _sqlite_primary is None:
+        _sqlite_primary = _sqlite_tuned(_database_url())
+    return _sqlite_primary
+
+
+def get_engine():
+    """Returns the process-wide (primary) engine, creating it on first call."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _build_engine(_database_url())
+                _session_factory.configure(bind=_engine)
+    return _engine
+
+
+def SessionLocal(**kwargs):
+    """Opens a Session bound to the lazily created engine."""
+    get_engine()
+    return _session_factory(**kwargs)
+
+
+# --- READ REPLICAS ---
+# DATABASE_REPLICA_URLS is a comma-separated list of replica URLs. Read-only
+# endpoints take a session from ReadSessionLocal(); writes and FOR UPDATE paths
+# always use SessionLocal() (the primary).
+
+REPLICA_RETRY_SECONDS = float(os.getenv("REPLICA_RETRY_SECONDS", "30"))
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+
+class _Replica:
+    def __init__(self, url: str):
+        self.engine = _build_engine(url)
+        self.down_until = 0.0
+        self.failures = 0
+        self.sessions = 0
+
+
+_replicas = None
+_replica_cursor = itertools.count()
+_recent_writes = {}
+
+
+def get_replicas():
+    global _replicas
+    if _replicas is None:
+        with _engine_lock:
+            if _replicas is None:
+                urls = [u.strip() for u in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if u.strip()]
+                _replicas = [_Replica(u) for u in urls]
+    return _replicas
+
+
+def note_write(store_id: str) -> None:
+    """Pins this store's reads to the primary for READ_YOUR_WRITES_SECONDS."""
+    if READ_YOUR_WRITES_SECONDS <= 0:
+        return
+    now = time.monotonic()
+    _recent_writes[store_id] = now + READ_YOUR_WRITES_SECONDS
+    if len(_recent_writes) > 10000:
+        for key in [k for k, until in list(_recent_writes.items()) if until < now]:
+            _recent_writes.pop(key, None)
+
+
+def _recently_written(store_id) -> bool:
+    return store_id is not None and _recent_writes.get(store_id, 0.0) > time.monotonic()
+
+
+def ReadSessionLocal(store_id=None):
+    """
+    Opens a Session on a healthy replica (round-robin), falling back to the
+    primary when none is configured or healthy, or when `store_id` was
+    written to within the read-your-writes window. In SQLite mode it is a
+    reader connection on the same file (WAL readers see every commit).
+    """
+    if sqlite_mode():
+        return _session_factory(bind=_sqlite_read_engine())
+    replicas = get_replicas()
+    if not replicas or _recently_written(store_id):
+        return SessionLocal()
+
+    now = time.monotonic()
+    for _ in range(len(replicas)):
+        replica = replicas[next(_replica_cursor) % len(replicas)]
+        if replica.down_until > now:
+            continue
+        session = _session_factory(bind=replica.engine)
+        try:
+            session.connection()  # checkout with pre-ping doubles as the health check
+        except DBAPIError:
+            session.close()
+            replica.failures += 1
+            replica.down_until = now + REPLICA_RETRY_SECONDS
+            logger.warning("Read replica %s is unhealthy; skipping it for %ss.",
+                           replica.engine.url.render_as_string(hide_password=True), REPLICA_RETRY_SECONDS)
+            continue
+        replica.sessions += 1
+        return session
+    return SessionLocal()
+
+
+def replica_status() -> list:
+    now = time.monotonic()
+    return [
+        {
+            "url": r.engine.url.render_as_string(hide_password=True),
+            "healthy": r.down_until <= now,
+            "failures": r.failures,
+            "sessions": r.sessions,
+        }
+        for r in get_replicas()
+    ]
+
+
+def __getattr__(name):
+    # Backwards compatibility for `from inventrack.database import engine`.
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def create_schema() -> None:
+    """Creates any missing tables. Run explicitly, never at import time."""
+    from inventrack import models  # noqa: F401  (registers the tables on Base)
+    engine = get_engine()
+    Base.metadata.create_all(bind=engine)
+    # create_all skips existing tables, so add indexes introduced since then
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def warm_pool(connections: int) -> int:
+    """Opens `connections` pooled connections in parallel so the first requests skip the handshake."""
+    engine = get_engine()
+    # Nothing to gain on a local file, and the SQLite writer pool holds one connection
+    if connections <= 0 or sqlite_mode():
+        return 0
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        opened = list(executor.map(lambda _: engine.connect(), range(connections)))
+    for conn in opened:
+        conn.close()  # returns the connection to the pool, still open
+    return len(opened)
@@ -1,12 +1,71 @@
-from .database import SessionLocal 
-from typing import Generator
+from .database import SessionLocal, ReadSessionLocal, sqlite_mode
+from .shop_registry import CachedShop, shop_registry
+from typing import Annotated, Generator
 from sqlalchemy.orm import Session 
+from starlette.concurrency import run_in_threadpool
 from inventrack import models
-from fastapi import Depends, HTTPException, status 
+from fastapi import Depends, HTTPException, Request, status 
 
 def get_db() -> Generator[Session, None, None]:
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+def get_read_db(request: Request) -> Generator[Session, None, None]:
+    """
+    Session for read-only endpoints: served by a read replica when one is
+    configured, or by the primary inside a store's read-your-writes window.
+    Never use it for writes or FOR UPDATE queries.
+    """
+    db = ReadSessionLocal(request.path_params.get("store_id"))
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _load_shop(store_id: str):
+    """
+    Registry miss: reads the shop on its own session, closed before the
+    handler runs. That is the primary (to see brand-new shops), or in SQLite
+    mode a WAL reader, which sees every commit and never takes the single
+    writer connection or the write lock that BEGIN IMMEDIATE would.
+    """
+    db = ReadSessionLocal() if sqlite_mode() else SessionLocal()
+    try:
+        return shop_registry.load(db, store_id)
+    finally:
+        db.close()
+
+async def get_valid_store(request: Request) -> CachedShop:
+    """
+    The shop named by the `store_id` path parameter or, failing that, by the
+    `store_id` field of the JSON body; 404 if it does not exist. Answered from
+    the shop registry, so the DB is only queried on a registry miss, on a
+    short-lived session of its own (see _load_shop): read-only routes never
+    hold the primary because of it.
+    """
+    store_id = request.path_params.get("store_id")
+    if store_id is None:
+        try:
+            payload = await request.json()  # already read and cached by FastAPI
+        except ValueError:
+            payload = None
+        if isinstance(payload, dict) and payload.get("store_id") is not None:
+            store_id = str(payload["store_id"])
+    if store_id is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="store_id is required.")
+
+    found, shop = shop_registry.cached(store_id)
+    if not found:
+        shop = await run_in_threadpool(_load_shop, store_id)
+    if shop is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Store ID {store_id} not found."
+        )
+    return shop
+
+# The caller's shop (cached snapshot with the models.Shop attribute names)
+ValidStore = Annotated[CachedShop, Depends(get_valid_store)]
@@ -0,0 +1,256 @@
+# File: inventrack/inventory_cache.py
+
+"""
+Bounded in-process cache of each store's serialized inventory listing
+(the response body of GET /inventory/{store_id}/products).
+
+Reads go through `get_listing`; the write paths keep entries fresh by patching
+stock in place (process_bill) or invalidating (product edits, CSV upload,
+create_product). Entries are evicted LRU once the memory budget is exceeded.
+
+Stock patches are absolute quantities applied after commit, so they can
+arrive out of order. A write takes a version with `begin_write` while it
+still holds its row locks (versions of writes to the same product are then
+in commit order) and passes it to `patch_stock`, which ignores a patch
+older than the one already applied to that product. A listing loaded while
+a write of its store is in flight is not cached.
+
+Each process keeps its own cache, so INVENTORY_CACHE_TTL_SECONDS bounds how
+stale a listing can get when a write lands on a different worker.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set
+
+
+class _Entry:
+    __slots__ = ("rows", "index", "body", "size", "loaded_at", "base_version", "versions", "_stock")
+
+    def __init__(self, rows: List[Dict[str, Any]], loaded_at: float, base_version: int = 0):
+        self.rows = rows
+        self.index = {row["id"]: i for i, row in enumerate(rows)}
+        self.body: Optional[bytes] = None
+        self.size = 0
+        self.loaded_at = loaded_at
+        # Every write up to base_version is in the loaded rows; versions holds
+        # the write version of the last patch applied to each product.
+        self.base_version = base_version
+        self.versions: Dict[str, int] = {}
+        self._stock: Optional[Dict[str, int]] = None
+
+    def stock(self) -> Dict[str, int]:
+        if self._stock is None:
+            self._stock = {row["id"]: row["qty"] for row in self.rows}
+        return self._stock
+
+    def serialize(self) -> bytes:
+        if self.body is None:
+            self.body = json.dumps(self.rows, separators=(",", ":")).encode("utf-8")
+            # Rough footprint: the encoded body plus the row dicts behind it.
+            self.size = 3 * len(self.body)
+        return self.body
+
+
+class InventoryListingCache:
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        # Bumped on every write so a load that raced a write is not cached.
+        self._generations: Dict[str, int] = {}
+        self._epoch = 0
+        # Write versions handed out by begin_write and not yet patched / aborted
+        self._last_version = 0
+        self._in_flight: Dict[str, Set[int]] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.patches = 0
+        self.stale_patches = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    # --- 1. Read-through ---
+
+    def get_listing(self, store_id: str, loader: Callable[[], List[Dict[str, Any]]]) -> bytes:
+        """Returns the JSON listing for a store, calling `loader` on a miss."""
+        if not self.enabled:
+            return json.dumps(loader(), separators=(",", ":")).encode("utf-8")
+
+        with self._lock:
+            entry = self._entries.get(store_id)
+            if entry is not None and time.monotonic() - entry.loaded_at < self.ttl_seconds:
+                self._entries.move_to_end(store_id)
+                self.hits += 1
+                if entry.body is None:
+                    self._bytes -= entry.size
+                    body = entry.serialize()
+                    self._bytes += entry.size
+                    self._evict()
+                    return body
+                return entry.body
+        return self._load(store_id, loader).serialize()
+
+    def get_stock(self, store_id: str, loader: Callable[[], List[Dict[str, Any]]]) -> Dict[str, int]:
+        """
+        {product_id: qty} of a store's listing, from the same entry as
+        get_listing (product search's store filter). Do not mutate it.
+        """
+        if not self.enabled:
+            return {row["id"]: row["qty"] for row in loader()}
+
+        with self._lock:
+            entry = self._entries.get(store_id)
+            if entry is not None and time.monotonic() - entry.loaded_at < self.ttl_seconds:
+                self._entries.move_to_end(store_id)
+                self.hits += 1
+                return entry.stock()
+        return self._load(store_id, loader).stock()
+
+    def _load(self, store_id: str, loader: Callable[[], List[Dict[str, Any]]]) -> "_Entry":
+        """Miss: loads the listing and caches it unless a write raced the load."""
+        with self._lock:
+            self.misses += 1
+            generation = self._generations.get(store_id, 0)
+            epoch = self._epoch
+            # A write in flight may or may not be visible to the loader
+            cacheable = not self._in_flight.get(store_id)
+            base_version = self._last_version
+
+        entry = _Entry(loader(), time.monotonic(), base_version)
+        entry.serialize()  # sizes the entry before it is accounted
+
+        with self._lock:
+            if cacheable and self._generations.get(store_id, 0) == generation and self._epoch == epoch:
+                self._drop(store_id)
+                self._entries[store_id] = entry
+                self._bytes += entry.size
+                self._evict()
+        return entry
+
+    # --- 2. Write-path hooks ---
+
+    def begin_write(self, store_id: str) -> int:
+        """
+        A version for a stock write of `store_id`. Call it after the write
+        has locked its Inventory rows and before it commits; then pass the
+        version to patch_stock, or to abort_write if the commit fails.
+        """
+        with self._lock:
+            self._last_version += 1
+            self._in_flight.setdefault(store_id, set()).add(self._last_version)
+            self._generations[store_id] = self._generations.get(store_id, 0) + 1
+            return self._last_version
+
+    def abort_write(self, store_id: str, version: int) -> None:
+        """The write did not commit (or its outcome is unknown): forget the version and the listing."""
+        with self._lock:
+            self._finish(store_id, version)
+            self._generations[store_id] = self._generations.get(store_id, 0) + 1
+            if self._drop(store_id):
+                self.invalidations += 1
+
+    def patch_stock(self, store_id: str, quantities: Dict[str, int], version: int) -> None:
+        """Applies the committed stock levels of write `version` to a cached listing without reloading it."""
+        with self._lock:
+            self._finish(store_id, version)
+            self._generations[store_id] = self._generations.get(store_id, 0) + 1
+            entry = self._entries.get(store_id)
+            if entry is None:
+                return
+            if any(pid not in entry.index for pid in quantities):
+                # A product new to this store: the listing shape changed.
+                self._drop(store_id)
+                self.invalidations += 1
+                return
+            rows = None
+            for pid, qty in quantities.items():
+                if version <= entry.versions.get(pid, entry.base_version):
+                    self.stale_patches += 1  # a later write of this product is already applied
+                    continue
+                if rows is None:
+                    rows = list(entry.rows)  # copy-on-write; readers may hold the old list
+                i = entry.index[pid]
+                rows[i] = {**rows[i], "qty": qty}
+                entry.versions[pid] = version
+            if rows is not None:
+                entry.rows = rows
+                entry.body = None
+                entry._stock = None
+                self.patches += 1
+
+    def invalidate(self, store_id: str) -> None:
+        with self._lock:
+            self._generations[store_id] = self._generations.get(store_id, 0) + 1
+            if self._drop(store_id):
+                self.invalidations += 1
+
+    def invalidate_product(self, product_id: str) -> None:
+        """Product master edits show up in every store that lists the product."""
+        with self._lock:
+            self._epoch += 1
+            for store_id in [s for s, e in self._entries.items() if product_id in e.index]:
+                self._drop(store_id)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._bytes = 0
+
+    # --- 3. Bookkeeping ---
+
+    def _finish(self, store_id: str, version: int) -> None:
+        in_flight = self._in_flight.get(store_id)
+        if in_flight is not None:
+            in_flight.discard(version)
+            if not in_flight:
+                del self._in_flight[store_id]
+
+    def _drop(self, store_id: str) -> bool:
+        entry = self._entries.pop(store_id, None)
+        if entry is None:
+            return False
+        self._bytes -= entry.size
+        return True
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, entry = self._entries.popitem(last=False)
+            self._bytes -= entry.size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "patches": self.patches,
+                "stale_patches": self.stale_patches,
+            }
+
+
+# Process-wide instance used by the inventory, products and sales routers.
+inventory_cache = InventoryListingCache(
+    max_bytes=int(os.getenv("INVENTORY_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("INVENTORY_CACHE_TTL_SECONDS", "30")),
+)
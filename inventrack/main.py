@@ -1,18 +1,47 @@
 # File: main.py
 
+import logging
+import os
+from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import FastAPI
-from inventrack import models
-from inventrack.database import engine 
+from starlette.concurrency import run_in_threadpool
+from inventrack import database, sales_buffer, product_catalog, admission, recommendations, availability_index, slow_query_log, request_profiler
+from inventrack.database import SessionLocal
 from inventrack.dependencies import get_db 
 # Import all routers. Note: demand_routes contains the actual endpoint.
 # File: main.py (MODIFIED)
 # ...
-from inventrack.routes import auth, products, inventory, sales, demand_routes, ml_data_access, analytics_routes, consumer_auth_routes 
+from inventrack.routes import auth, products, inventory, sales, demand_routes, ml_data_access, analytics_routes, consumer_auth_routes, consumer_routes, internal, export, batch
 
-models.Base.metadata.create_all(bind=engine)
+logger = logging.getLogger(__name__)
 
-app = FastAPI()
+# Importing this module must stay free of DB side effects. Schema creation is
+# `python -m inventrack.manage create-schema` (or INVENTRACK_CREATE_SCHEMA=1).
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if os.getenv("INVENTRACK_CREATE_SCHEMA", "0").lower() in ("1", "true", "yes", "on"):
+        await run_in_threadpool(database.create_schema)
+    # Open pooled connections up front so the first requests skip the TLS handshake
+    try:
+        await run_in_threadpool(database.warm_pool, int(os.getenv("DB_POOL_WARMUP", "2")))
+    except Exception:
+        logger.exception("Connection pool warm-up failed; connections will open on demand.")
+    # Optional write-behind mode for SalesData (SALES_WRITE_BEHIND=1).
+    # Starting replays any segments left over from a crash.
+    await run_in_threadpool(sales_buffer.start_from_env)
+    # Product master cache used by the billing / CSV / create-product paths
+    await run_in_threadpool(product_catalog.warm, SessionLocal)
+    # "Frequently bought together" model from the last rebuild-cooccurrence run
+    await run_in_threadpool(recommendations.load_from_snapshot)
+    # (product, city) -> stock index behind GET /consumer/availability
+    await run_in_threadpool(availability_index.warm, database.ReadSessionLocal)
+    yield
+    # Flush-on-shutdown: drain buffered history rows before the worker exits.
+    await run_in_threadpool(sales_buffer.stop)
+
+app = FastAPI(lifespan=lifespan)
 
 # Include all routers
 app.include_router(sales.router) 
@@ -23,6 +52,24 @@ app.include_router(demand_routes.router)
 app.include_router(ml_data_access.router)
 app.include_router(analytics_routes.router) 
 app.include_router(consumer_auth_routes.router)
+app.include_router(consumer_routes.router)
+app.include_router(export.router)
+app.include_router(batch.router)
+app.include_router(internal.router)
+
+# Opt-in admission control / backpressure for DB-bound routes (ADMISSION_CONTROL=1).
+# Added before CORS so shed 503 responses still carry the CORS headers.
+if admission.enabled():
+    app.add_middleware(admission.AdmissionControlMiddleware, controller=admission.admission_controller)
+
+# On-demand per-request profiling (REQUEST_PROFILING=1). The routers' endpoints
+# are wrapped by request_profiler.ProfiledRoute.
+if request_profiler.enabled():
+    app.add_middleware(request_profiler.ProfilingMiddleware, **request_profiler.middleware_options())
+
+# Tags slow queries with the route that issued them (SLOW_QUERY_LOG=1)
+if slow_query_log.enabled():
+    app.add_middleware(slow_query_log.RouteContextMiddleware)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,237 @@
+# File: inventrack/manage.py
+
+"""
+Operational commands that must not run as a side effect of importing the app.
+
+    python -m inventrack.manage create-schema
+    python -m inventrack.manage partitions status|init|create|detach [--dry-run]
+    python -m inventrack.manage rollup-sales [--since YYYY-MM-DD]
+    python -m inventrack.manage rebuild-cooccurrence [--since YYYY-MM-DD]
+    python -m inventrack.manage backtest [--models naive,ses] [--workers N]
+    python -m inventrack.manage import-sales FILE.csv [--store ID] [--job-id ID]
+    python -m inventrack.manage snapshot-stock [--store ID]
+    python -m inventrack.manage reconcile-stock [--store ID] [--fix]
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+from inventrack import (
+    database, sales_partitions, range_analytics, recommendations, backtest, sales_import, stock_ledger,
+)
+
+
+def cmd_create_schema(args) -> int:
+    database.create_schema()
+    print("Schema is up to date.")
+    return 0
+
+
+def cmd_partitions(args) -> int:
+    """SalesData partition maintenance (needs SALES_PARTITIONING=monthly)."""
+    engine = database.get_engine()
+    if sales_partitions.layout(engine) == "single":
+        print("SALES_PARTITIONING is not 'monthly'; nothing to do.")
+        return 1
+
+    with engine.begin() as connection:
+        if args.action == "status":
+            for name in sales_partitions.list_partitions(connection):
+                print(name)
+            return 0
+        if args.action == "init":
+            actions = sales_partitions.init_partitioning(connection, args.months_ahead, args.dry_run)
+        elif args.action == "create":
+            actions = sales_partitions.create_upcoming(connection, args.months_ahead, args.dry_run)
+        else:
+            cutoff = sales_partitions.add_months(date.today(), -args.keep_months)
+            actions = sales_partitions.detach_before(connection, cutoff, args.dry_run)
+
+    for action in actions:
+        print(("[dry-run] " if args.dry_run else "") + action)
+    if not actions:
+        print("Nothing to do.")
+    return 0
+
+
+def cmd_rollup_sales(args) -> int:
+    db = database.SessionLocal()
+    try:
+        since, through = range_analytics.refresh_daily_rollup(
+            db, date.fromisoformat(args.since) if args.since else None, args.lookback_days
+        )
+    finally:
+        db.close()
+    print(f"Sales rollups refreshed for {since} .. {through}.")
+    return 0
+
+
+def cmd_rebuild_cooccurrence(args) -> int:
+    started = time.perf_counter()
+    db = database.SessionLocal()
+    try:
+        model, baskets = recommendations.rebuild_from_db(
+            db, date.fromisoformat(args.since) if args.since else None, keep=args.keep
+        )
+    finally:
+        db.close()
+    output = Path(args.output) if args.output else recommendations.SNAPSHOT_PATH
+    recommendations.write_snapshot(model, output)
+    print(f"Counted {baskets:,} baskets in {time.perf_counter() - started:.1f} s; snapshot written to {output}.")
+    return 0
+
+
+def cmd_backtest(args) -> int:
+    end = date.fromisoformat(args.end) if args.end else date.today() - timedelta(days=1)
+    start = end - timedelta(days=args.history_days - 1)
+    db = database.SessionLocal()
+    try:
+        series = backtest.load_series(db, start, end, args.store or None)
+    finally:
+        db.close()
+    report = backtest.run_backtest(
+        series, args.models.split(","), horizon=args.horizon, origins=args.origins,
+        step=args.step, min_train=args.min_train, workers=args.workers,
+    )
+    print(backtest.format_report(report))
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+    return 0
+
+
+def cmd_import_sales(args) -> int:
+    started = time.perf_counter()
+
+    def progress(job):
+        elapsed = time.perf_counter() - started
+        print(f"  {job.rows_read:,} read, {job.rows_imported:,} imported, {job.rows_rejected:,} rejected "
+              f"({job.rows_read / elapsed:,.0f} rows/s)")
+
+    db = database.SessionLocal()
+    try:
+        job = sales_import.import_file(
+            db, Path(args.file), job_id=args.job_id, store_id=args.store, date_format=args.date_format,
+            batch_rows=args.batch_rows, load_data=args.load_data,
+            rejects_path=Path(args.rejects) if args.rejects else None,
+            refresh_rollup=not args.no_rollup, progress=progress,
+        )
+    except sales_import.SalesImportError as e:
+        print(f"Import failed: {e}", file=sys.stderr)
+        return 1
+    finally:
+        db.close()
+    print(f"Job {job.job_id}: {job.status}, {job.rows_imported:,} rows imported, {job.rows_rejected:,} rejected "
+          f"({job.min_date} .. {job.max_date}) in {time.perf_counter() - started:.1f} s.")
+    return 0
+
+
+def cmd_snapshot_stock(args) -> int:
+    started = time.perf_counter()
+    db = database.SessionLocal()
+    try:
+        stores = args.store or stock_ledger.store_ids(db)
+        products = 0
+        for store_id in stores:
+            products += stock_ledger.take_snapshot(db, store_id)["products"]
+    finally:
+        db.close()
+    print(f"Snapshotted {len(stores):,} stores ({products:,} products) in {time.perf_counter() - started:.1f} s.")
+    return 0
+
+
+def cmd_reconcile_stock(args) -> int:
+    db = database.SessionLocal()
+    try:
+        stores = args.store or stock_ledger.store_ids(db)
+        drift = []
+        for store_id in stores:
+            drift.extend(stock_ledger.reconcile(db, store_id, fix=args.fix))
+    finally:
+        db.close()
+    for d in drift:
+        print(f"{d['store_id']} {d['product_id']}: inventory={d['inventory']} ledger={d['ledger']} "
+              f"difference={d['difference']:+d} ({d['movements']} movements)")
+    verb = "corrected" if args.fix else "found"
+    print(f"Checked {len(stores):,} stores; {len(drift):,} products out of balance {verb}.")
+    return 1 if drift and not args.fix else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m inventrack.manage")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("create-schema", help="Create any missing tables.")
+    p.set_defaults(func=cmd_create_schema)
+
+    p = sub.add_parser("partitions", help="Monthly SalesData partition maintenance.")
+    p.add_argument("action", choices=["status", "init", "create", "detach"],
+                   help="init: switch to the monthly layout; create: add upcoming months; "
+                        "detach: move old months out to SalesData_archive_YYYYMM tables.")
+    p.add_argument("--months-ahead", type=int, default=3)
+    p.add_argument("--keep-months", type=int, default=36,
+                   help="detach: keep this many months before the current one.")
+    p.add_argument("--dry-run", action="store_true", help="Print the DDL instead of running it.")
+    p.set_defaults(func=cmd_partitions)
+
+    p = sub.add_parser("rollup-sales", help="Refresh the sales rollups used by range analytics (run nightly).")
+    p.add_argument("--since", help="Recompute from this date (default: a few days before the watermark).")
+    p.add_argument("--lookback-days", type=int, default=3)
+    p.set_defaults(func=cmd_rollup_sales)
+
+    p = sub.add_parser("rebuild-cooccurrence",
+                       help="Recount the 'frequently bought together' model from stored baskets.")
+    p.add_argument("--since", help="Only count bills from this date on (default: all).")
+    p.add_argument("--keep", type=int, default=50, help="Neighbours kept per product.")
+    p.add_argument("--output", help="Snapshot path (default: COOCCURRENCE_SNAPSHOT).")
+    p.set_defaults(func=cmd_rebuild_cooccurrence)
+
+    p = sub.add_parser("backtest", help="Rolling-origin backtest of the demand forecasters over SalesData.")
+    p.add_argument("--models", default=",".join(backtest.MODELS),
+                   help=f"Comma-separated, from: {', '.join(backtest.MODELS)}.")
+    p.add_argument("--store", action="append", help="Limit to this store (repeatable).")
+    p.add_argument("--end", help="Last day of history (default: yesterday).")
+    p.add_argument("--history-days", type=int, default=365)
+    p.add_argument("--horizon", type=int, default=7)
+    p.add_argument("--origins", type=int, default=8)
+    p.add_argument("--step", type=int, default=7, help="Days between forecast origins.")
+    p.add_argument("--min-train", type=int, default=28, help="Skip origins with less history than this.")
+    p.add_argument("--workers", type=int, help="Worker processes (default: CPU count).")
+    p.add_argument("--json", help="Also write the full report to this file.")
+    p.set_defaults(func=cmd_backtest)
+
+    p = sub.add_parser("import-sales", help="Bulk-import historical SalesData from a CSV export (resumable).")
+    p.add_argument("file")
+    p.add_argument("--store", help="Import every row into this store (the file then needs no Store_ID column).")
+    p.add_argument("--job-id", help="Checkpoint key; re-run with the same ID to resume (default: from file name, size, mtime).")
+    p.add_argument("--date-format", help="strptime format of the Date column (default: ISO YYYY-MM-DD).")
+    p.add_argument("--batch-rows", type=int, default=sales_import.BATCH_ROWS, help="Rows per batch and transaction.")
+    p.add_argument("--load-data", action="store_true",
+                   help="MySQL/TiDB: load batches with LOAD DATA LOCAL INFILE (needs local_infile in the connect args).")
+    p.add_argument("--rejects", help="Append rejected records with the reason to this CSV.")
+    p.add_argument("--no-rollup", action="store_true", help="Do not refresh the sales rollups for the imported dates.")
+    p.set_defaults(func=cmd_import_sales)
+
+    p = sub.add_parser("snapshot-stock", help="Snapshot each store's Inventory for point-in-time stock (run nightly).")
+    p.add_argument("--store", action="append", help="Only this store (repeatable; default: all shops).")
+    p.set_defaults(func=cmd_snapshot_stock)
+
+    p = sub.add_parser("reconcile-stock", help="Check the stock ledger totals against Inventory (exit 1 on drift).")
+    p.add_argument("--store", action="append", help="Only this store (repeatable; default: all shops).")
+    p.add_argument("--fix", action="store_true",
+                   help="Append correcting movements ('opening' for stock that predates the ledger).")
+    p.set_defaults(func=cmd_reconcile_stock)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
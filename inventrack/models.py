@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, TIMESTAMP, DECIMAL, Date
+from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, TIMESTAMP, DECIMAL, Date, Index
 from sqlalchemy.ext.declarative import declarative_base 
 from inventrack.database import Base 
 class User(Base):
@@ -57,4 +57,97 @@ class SalesData(Base):
     units_sold = Column("Units_Sold", Integer, nullable=False)
     price = Column("Price", DECIMAL(10, 2))
     discount = Column("Discount", DECIMAL(5, 2))
-    weather_competit_seasonality = Column("Weather_Competit_Seasonality", String(255))
\ No newline at end of file
+    weather_competit_seasonality = Column("Weather_Competit_Seasonality", String(255))
+    # Every analytics query filters on Store_ID plus a Date range
+    __table_args__ = (Index("ix_SalesData_store_date", "Store_ID", "Date"),)
+class SalesDailyRollup(Base):
+    """Per store/day/product aggregate of SalesData, refreshed by `manage.py rollup-sales`."""
+    __tablename__ = "SalesDailyRollup"
+    store_id = Column("Store_ID", String(50), primary_key=True)
+    date = Column("Date", Date, primary_key=True)
+    product_id = Column("Product_ID", String(50), primary_key=True)
+    units_sold = Column("Units_Sold", Integer, nullable=False)
+    revenue = Column("Revenue", DECIMAL(14, 2), nullable=False)
+    sales_count = Column("Sales_Count", Integer, nullable=False)
+class SalesStoreDailyRollup(Base):
+    """Per store/day totals of SalesDailyRollup (the range series), refreshed with it."""
+    __tablename__ = "SalesStoreDailyRollup"
+    store_id = Column("Store_ID", String(50), primary_key=True)
+    date = Column("Date", Date, primary_key=True)
+    units_sold = Column("Units_Sold", Integer, nullable=False)
+    revenue = Column("Revenue", DECIMAL(14, 2), nullable=False)
+    sales_count = Column("Sales_Count", Integer, nullable=False)
+class SalesMonthlyProductRollup(Base):
+    """Per store/month/product totals of SalesDailyRollup (range top-N), refreshed with it."""
+    __tablename__ = "SalesMonthlyProductRollup"
+    store_id = Column("Store_ID", String(50), primary_key=True)
+    month = Column("Month", Date, primary_key=True)  # first day of the month
+    product_id = Column("Product_ID", String(50), primary_key=True)
+    units_sold = Column("Units_Sold", Integer, nullable=False)
+    revenue = Column("Revenue", DECIMAL(14, 2), nullable=False)
+    sales_count = Column("Sales_Count", Integer, nullable=False)
+class RollupState(Base):
+    """Watermark of each aggregate table: every day up to covered_through is complete."""
+    __tablename__ = "RollupState"
+    rollup_name = Column("Rollup_Name", String(50), primary_key=True)
+    covered_through = Column("Covered_Through", Date, nullable=False)
+    refreshed_at = Column("Refreshed_At", TIMESTAMP)
+class Bill(Base):
+    """One processed bill (the basket header); its lines are BillItem rows."""
+    __tablename__ = "Bills"
+    bill_id = Column("Bill_ID", String(40), primary_key=True)
+    store_id = Column("Store_ID", String(50), ForeignKey("shops.Store_ID"), nullable=False)
+    user_id = Column("User_ID", Integer)
+    bill_date = Column("Bill_Date", Date, nullable=False)
+    created_at = Column("Created_At", TIMESTAMP)
+    total_amount = Column("Total_Amount", DECIMAL(12, 2))
+    item_count = Column("Item_Count", Integer, nullable=False)
+    __table_args__ = (Index("ix_Bills_store_date", "Store_ID", "Bill_Date"),)
+class BillItem(Base):
+    __tablename__ = "BillItems"
+    bill_id = Column("Bill_ID", String(40), ForeignKey("Bills.Bill_ID"), primary_key=True)
+    product_id = Column("Product_ID", String(50), ForeignKey("products.Product_ID"), primary_key=True)
+    quantity = Column("Quantity", Integer, nullable=False)
+    price = Column("Price", DECIMAL(10, 2))
+class SalesImportJob(Base):
+    """Progress of one historical SalesData import; the resume checkpoint is Rows_Read."""
+    __tablename__ = "SalesImportJobs"
+    job_id = Column("Job_ID", String(64), primary_key=True)
+    source = Column("Source", String(255))
+    status = Column("Status", String(20), nullable=False)
+    rows_read = Column("Rows_Read", Integer, nullable=False, default=0)
+    rows_imported = Column("Rows_Imported", Integer, nullable=False, default=0)
+    rows_rejected = Column("Rows_Rejected", Integer, nullable=False, default=0)
+    min_date = Column("Min_Date", Date)
+    max_date = Column("Max_Date", Date)
+    error = Column("Error", Text)
+    started_at = Column("Started_At", TIMESTAMP)
+    updated_at = Column("Updated_At", TIMESTAMP)
+class StockMovement(Base):
+    """Append-only stock ledger: one row per change of an Inventory quantity, in the same transaction."""
+    __tablename__ = "StockMovements"
+    movement_id = Column("Movement_ID", Integer, primary_key=True)
+    store_id = Column("Store_ID", String(50), ForeignKey("shops.Store_ID"), nullable=False)
+    product_id = Column("Product_ID", String(50), ForeignKey("products.Product_ID"), nullable=False)
+    created_at = Column("Created_At", TIMESTAMP, nullable=False)
+    source = Column("Source", String(20), nullable=False)
+    delta = Column("Delta", Integer, nullable=False)
+    quantity_after = Column("Quantity_After", Integer, nullable=False)
+    reference = Column("Reference", String(64))
+    __table_args__ = (
+        Index("ix_StockMovements_store_time", "Store_ID", "Created_At"),
+        Index("ix_StockMovements_store_product_time", "Store_ID", "Product_ID", "Created_At"),
+    )
+class StockSnapshot(Base):
+    """A store's Inventory as of Taken_At, written by `manage.py snapshot-stock`; lines are StockSnapshotItem rows."""
+    __tablename__ = "StockSnapshots"
+    snapshot_id = Column("Snapshot_ID", Integer, primary_key=True)
+    store_id = Column("Store_ID", String(50), ForeignKey("shops.Store_ID"), nullable=False)
+    taken_at = Column("Taken_At", TIMESTAMP, nullable=False)
+    product_count = Column("Product_Count", Integer, nullable=False)
+    __table_args__ = (Index("ix_StockSnapshots_store_time", "Store_ID", "Taken_At"),)
+class StockSnapshotItem(Base):
+    __tablename__ = "StockSnapshotItems"
+    snapshot_id = Column("Snapshot_ID", Integer, ForeignKey("StockSnapshots.Snapshot_ID"), primary_key=True)
+    product_id = Column("Product_ID", String(50), ForeignKey("products.Product_ID"), primary_key=True)
+    quantity = Column("Quantity", Integer, nullable=False)
@@ -0,0 +1,271 @@
+# File: inventrack/product_catalog.py
+
+"""
+Process-wide cache of the `products` master table, indexed by id and by name.
+
+Loaded at startup, kept current by the write paths through `upsert` (the
+change hook), and reloaded once it is older than
+PRODUCT_CATALOG_REFRESH_SECONDS so edits made by other workers show up.
+That reload runs in one background thread with its own read session;
+lookups keep using the current copy meanwhile, so a billing request never
+waits for it. Upserts made during the reload are replayed onto its result. Only products that actually changed are passed to the listeners.
+Lookups that miss fall back to the DB and populate the cache.
+
+The cache can be one refresh interval behind edits made by other workers, so
+decisions that must be current -- name uniqueness before an insert, the MSP a
+bill records -- use `fresh` / `fresh_by_name` instead: they read the rows in
+the caller's transaction and bring the cached entries up to date.
+"""
+
+import logging
+import os
+import threading
+import time
+from decimal import Decimal
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional
+
+from sqlalchemy.orm import Session
+
+from inventrack import database, models
+
+logger = logging.getLogger(__name__)
+
+
+class CatalogProduct(NamedTuple):
+    """Immutable snapshot of the product columns the write paths need."""
+    id: str
+    product_name: str
+    category: str
+    subcategory: str
+    mrp: Optional[Decimal]
+    msp: Optional[Decimal]
+
+
+def snapshot_of(product: models.Product) -> CatalogProduct:
+    return CatalogProduct(
+        id=product.id,
+        product_name=product.product_name,
+        category=product.category,
+        subcategory=product.subcategory,
+        mrp=product.mrp,
+        msp=product.msp,
+    )
+
+
+class ProductCatalog:
+    # More changed products than this in one reload are signalled as a full reload
+    FULL_RELOAD_CHANGES = 200
+    # Values per IN list when reading products through
+    READ_CHUNK = 1000
+
+    def __init__(self, refresh_seconds: float, session_factory: Callable[[], Session]):
+        self.refresh_seconds = refresh_seconds
+        self._session_factory = session_factory
+        self._by_id: Dict[str, CatalogProduct] = {}
+        self._by_name: Dict[str, str] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.RLock()  # one (re)load at a time
+        self._refreshing = False
+        # Upserts made while a load is reading, replayed onto its result
+        self._pending: Optional[List[CatalogProduct]] = None
+        self._listeners: List[Callable[[CatalogProduct, Optional[CatalogProduct]], None]] = []
+
+        self.hits = 0
+        self.misses = 0
+        self.reloads = 0
+
+    # --- 1. Loading ---
+
+    def load(self, db: Session) -> int:
+        """Replaces the cache with a fresh copy of the products table."""
+        with self._load_lock:
+            with self._lock:
+                self._pending = []
+            try:
+                rows = db.query(
+                    models.Product.id,
+                    models.Product.product_name,
+                    models.Product.category,
+                    models.Product.subcategory,
+                    models.Product.mrp,
+                    models.Product.msp,
+                ).all()
+            except Exception:
+                with self._lock:
+                    self._pending = None
+                raise
+            by_id = {row.id: CatalogProduct(*row) for row in rows}
+
+            with self._lock:
+                for snapshot in self._pending:
+                    by_id[snapshot.id] = snapshot
+                self._pending = None
+                by_name: Dict[str, str] = {}
+                for product in by_id.values():
+                    by_name.setdefault(product.product_name, product.id)
+                previous = self._by_id
+                self._by_id = by_id
+                self._by_name = by_name
+                self._loaded_at = time.monotonic()
+                self.reloads += 1
+                listeners = list(self._listeners)
+
+        changed = [(product, previous.get(product.id)) for product in by_id.values() if previous.get(product.id) != product]
+        if not changed and len(by_id) == len(previous):
+            return len(by_id)
+        full = not previous or len(changed) > self.FULL_RELOAD_CHANGES or any(pid not in by_id for pid in previous)
+        for listener in listeners:
+            if full:
+                listener(None, None)  # full reload signal
+            else:
+                for product, old in changed:
+                    listener(product, old)
+        return len(by_id)
+
+    def _ensure_fresh(self, db: Session) -> None:
+        loaded_at = self._loaded_at
+        if loaded_at is None:
+            # Never loaded (startup warm-up failed): the first caller loads, the others wait for it
+            with self._load_lock:
+                if self._loaded_at is None:
+                    self.load(db)
+        elif time.monotonic() - loaded_at > self.refresh_seconds:
+            self._refresh_in_background()
+
+    def _refresh_in_background(self) -> None:
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, name="product-catalog-refresh", daemon=True).start()
+
+    def _refresh(self) -> None:
+        db = self._session_factory()
+        try:
+            self.load(db)
+        except Exception:
+            logger.exception("Product catalog refresh failed; keeping the current copy.")
+            self._loaded_at = time.monotonic()  # retry after another full interval
+        finally:
+            db.close()
+            self._refreshing = False
+
+    # --- 2. Lookups (fall back to the DB on a miss) ---
+
+    def get(self, db: Session, product_id: str) -> Optional[CatalogProduct]:
+        self._ensure_fresh(db)
+        product = self._by_id.get(product_id)
+        if product is not None:
+            self.hits += 1
+            return product
+        self.misses += 1
+        row = db.query(models.Product).filter(models.Product.id == product_id).first()
+        return self.upsert(row) if row else None
+
+    def find_by_name(self, db: Session, product_name: str) -> Optional[CatalogProduct]:
+        self._ensure_fresh(db)
+        product_id = self._by_name.get(product_name)
+        if product_id is not None and product_id in self._by_id:
+            self.hits += 1
+            return self._by_id[product_id]
+        self.misses += 1
+        row = db.query(models.Product).filter(models.Product.product_name == product_name).first()
+        return self.upsert(row) if row else None
+
+    def cached(self, product_id: str) -> Optional[CatalogProduct]:
+        """Cache-only lookup, for paths that must not open a DB session."""
+        return self._by_id.get(product_id)
+
+    def all(self) -> List[CatalogProduct]:
+        return list(self._by_id.values())
+
+    # --- 3. Current values (read in the caller's transaction) ---
+
+    def fresh(self, db: Session, product_ids: Iterable[str]) -> Dict[str, CatalogProduct]:
+        """The products in `product_ids` as they are in the DB now; unknown IDs are left out."""
+        return self._read_through(db, models.Product.id, set(product_ids))
+
+    def fresh_by_name(self, db: Session, product_names: Iterable[str]) -> Dict[str, CatalogProduct]:
+        """Name -> product for the names that exist in the DB now; cached names that no longer exist are dropped."""
+        names = set(product_names)
+        found: Dict[str, CatalogProduct] = {}
+        for product in self._read_through(db, models.Product.product_name, names).values():
+            found.setdefault(product.product_name, product)
+        with self._lock:
+            for name in names - found.keys():
+                self._by_name.pop(name, None)  # renamed or deleted by another worker
+        return found
+
+    def _read_through(self, db: Session, column, values: set) -> Dict[str, CatalogProduct]:
+        products: Dict[str, CatalogProduct] = {}
+        ordered = sorted(values)
+        for start in range(0, len(ordered), self.READ_CHUNK):
+            rows = db.query(
+                models.Product.id,
+                models.Product.product_name,
+                models.Product.category,
+                models.Product.subcategory,
+                models.Product.mrp,
+                models.Product.msp,
+            ).filter(column.in_(ordered[start:start + self.READ_CHUNK])).all()
+            for row in rows:
+                product = CatalogProduct(*row)
+                if self._by_id.get(product.id) != product:
+                    self.upsert(product)
+                products[product.id] = product
+        return products
+
+    # --- 4. Change hook (call after the write is committed) ---
+
+    def upsert(self, product) -> CatalogProduct:
+        """Accepts a Product row or a CatalogProduct taken with snapshot_of()."""
+        snapshot = product if isinstance(product, CatalogProduct) else snapshot_of(product)
+        with self._lock:
+            previous = self._by_id.get(snapshot.id)
+            # Single-key dict writes are atomic for the lock-free readers; a
+            # reader racing a rename just misses and falls back to the DB.
+            if previous is not None and self._by_name.get(previous.product_name) == previous.id:
+                del self._by_name[previous.product_name]
+            self._by_id[snapshot.id] = snapshot
+            self._by_name.setdefault(snapshot.product_name, snapshot.id)
+            if self._pending is not None:
+                self._pending.append(snapshot)
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(snapshot, previous)
+        return snapshot
+
+    def add_listener(self, callback: Callable[[Optional[CatalogProduct], Optional[CatalogProduct]], None]) -> None:
+        """
+        Registers callback(new, previous) for product changes.
+        callback(None, None) means the whole catalog was reloaded.
+        """
+        with self._lock:
+            self._listeners.append(callback)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "products": len(self._by_id),
+            "hits": self.hits,
+            "misses": self.misses,
+            "reloads": self.reloads,
+        }
+
+
+product_catalog = ProductCatalog(
+    refresh_seconds=float(os.getenv("PRODUCT_CATALOG_REFRESH_SECONDS", "300")),
+    session_factory=database.ReadSessionLocal,
+)
+
+
+def warm(session_factory) -> None:
+    """Startup load. A failure here is not fatal; the first lookup retries."""
+    db = session_factory()
+    try:
+        count = product_catalog.load(db)
+        logger.info("Product catalog loaded with %d products.", count)
+    except Exception:
+        logger.exception("Product catalog warm-up failed; it will load lazily.")
+    finally:
+        db.close()
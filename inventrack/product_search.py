@@ -0,0 +1,319 @@
+# File: inventrack/product_search.py
+
+"""
+In-process search index over the product master (product_name, category,
+subcategory) backing GET /products/search and the CSV importer's optional
+normalized name matching.
+
+Text is normalized (Unicode NFKC, case-folded, punctuation -> space,
+whitespace collapsed) and split into tokens. Three structures sit on top:
+
+- inverted indexes token -> {product_id} for the name and for the
+  category/subcategory fields (the field decides the weight);
+- a sorted vocabulary, searched with bisect, for prefix matches (the
+  flat-array equivalent of a prefix trie: one contiguous range per prefix);
+- a trigram index over the vocabulary for typo-tolerant fallback matches.
+
+The index follows the product catalog through its change hook: single
+products are re-indexed on upsert, and a full catalog reload rebuilds the
+index off to the side and swaps it in.
+"""
+
+import heapq
+import logging
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from itertools import islice
+from typing import AbstractSet, Dict, Iterable, List, Optional, Set, Tuple
+
+from inventrack.product_catalog import CatalogProduct, product_catalog
+
+logger = logging.getLogger(__name__)
+
+NAME_WEIGHT = 3.0
+CATEGORY_WEIGHT = 1.0
+# Upper bound on vocabulary tokens a single prefix expands to (keeps "a" cheap)
+MAX_PREFIX_EXPANSION = 64
+MAX_FUZZY_EXPANSION = 8
+MIN_TRIGRAM_SIMILARITY = 0.4
+# Above this many matches only a bounded subset is scored (broad prefixes like "a")
+MAX_SCORED_CANDIDATES = 200
+
+_NON_ALNUM = re.compile(r"[^\w]+", re.UNICODE)
+
+
+def normalize(text: Optional[str]) -> str:
+    """Case/whitespace/punctuation-insensitive form used for indexing and matching."""
+    if not text:
+        return ""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return " ".join(_NON_ALNUM.sub(" ", text).replace("_", " ").split())
+
+
+def _trigrams(token: str) -> Set[str]:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class _Index:
+    """The index structures; mutated only under the owning ProductSearchIndex's lock."""
+
+    def __init__(self):
+        self.products: Dict[str, CatalogProduct] = {}
+        self.names: Dict[str, str] = {}                  # product_id -> normalized name
+        self.doc_tokens: Dict[str, Set[str]] = {}        # product_id -> all its tokens
+        self.name_postings: Dict[str, Set[str]] = {}     # token -> product_ids (name field)
+        self.category_postings: Dict[str, Set[str]] = {} # token -> product_ids (category/subcategory)
+        self.vocabulary: List[str] = []                  # sorted tokens
+        self.trigrams: Dict[str, Set[str]] = {}          # trigram -> tokens
+        self.by_normalized_name: Dict[str, str] = {}     # normalized name -> product_id
+
+    def add(self, product: CatalogProduct, bulk: bool = False) -> None:
+        """Indexes one product. In bulk mode the caller sorts the vocabulary afterwards."""
+        name = normalize(product.product_name)
+        name_tokens = set(name.split())
+        category_tokens = set(normalize(f"{product.category or ''} {product.subcategory or ''}").split())
+
+        self.products[product.id] = product
+        self.names[product.id] = name
+        self.doc_tokens[product.id] = name_tokens | category_tokens
+        for tokens, postings in ((name_tokens, self.name_postings), (category_tokens, self.category_postings)):
+            for token in tokens:
+                posting = postings.get(token)
+                if posting is None:
+                    posting = postings[token] = set()
+                    self._add_token(token, bulk)
+                posting.add(product.id)
+        self.by_normalized_name.setdefault(name, product.id)
+
+    def _add_token(self, token: str, bulk: bool) -> None:
+        if token in self.name_postings and token in self.category_postings:
+            return  # already in the vocabulary through the other field
+        if bulk:
+            self.vocabulary.append(token)
+        else:
+            insort(self.vocabulary, token)
+        for gram in _trigrams(token):
+            self.trigrams.setdefault(gram, set()).add(token)
+
+    def remove(self, product_id: str) -> None:
+        product = self.products.pop(product_id, None)
+        if product is None:
+            return
+        name = self.names.pop(product_id)
+        for token in self.doc_tokens.pop(product_id, ()):
+            for postings in (self.name_postings, self.category_postings):
+                posting = postings.get(token)
+                if posting is not None:
+                    posting.discard(product_id)
+                    if not posting:
+                        del postings[token]
+            if token not in self.name_postings and token not in self.category_postings:
+                self._drop_token(token)
+        if self.by_normalized_name.get(name) == product_id:
+            del self.by_normalized_name[name]
+
+    def _drop_token(self, token: str) -> None:
+        i = bisect_left(self.vocabulary, token)
+        if i < len(self.vocabulary) and self.vocabulary[i] == token:
+            del self.vocabulary[i]
+        for gram in _trigrams(token):
+            tokens = self.trigrams.get(gram)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self.trigrams[gram]
+
+    # --- query-side helpers ---
+
+    def prefix_tokens(self, prefix: str) -> List[str]:
+        start = bisect_left(self.vocabulary, prefix)
+        out = []
+        for token in self.vocabulary[start:start + MAX_PREFIX_EXPANSION]:
+            if not token.startswith(prefix):
+                break
+            out.append(token)
+        return out
+
+    def similar_tokens(self, token: str) -> List[str]:
+        grams = _trigrams(token)
+        counts: Dict[str, int] = {}
+        for gram in grams:
+            for candidate in self.trigrams.get(gram, ()):
+                counts[candidate] = counts.get(candidate, 0) + 1
+        similar = []
+        for candidate, shared in counts.items():
+            similarity = shared / (len(grams) + len(_trigrams(candidate)) - shared)
+            if similarity >= MIN_TRIGRAM_SIMILARITY:
+                similar.append((similarity, candidate))
+        return [candidate for _, candidate in heapq.nlargest(MAX_FUZZY_EXPANSION, similar)]
+
+    def matches(self, token: str) -> "_TokenMatch":
+        """Products matching one query token: exact, else prefix, else fuzzy."""
+        match = _TokenMatch()
+        expansions = self.prefix_tokens(token)
+        exact = bool(expansions) and expansions[0] == token
+        if not expansions:
+            expansions = self.similar_tokens(token)
+            match.fuzzy = True
+        for candidate in expansions:
+            strong = exact and candidate == token
+            for postings, target_strong, target_weak in (
+                (self.name_postings, match.name_exact, match.name_other),
+                (self.category_postings, match.category_exact, match.category_other),
+            ):
+                posting = postings.get(candidate)
+                if posting:
+                    (target_strong if strong else target_weak).update(posting)
+        return match
+
+
+class _TokenMatch:
+    __slots__ = ("name_exact", "name_other", "category_exact", "category_other", "fuzzy")
+
+    def __init__(self):
+        self.name_exact: Set[str] = set()
+        self.name_other: Set[str] = set()   # prefix (or fuzzy) matches in the name
+        self.category_exact: Set[str] = set()
+        self.category_other: Set[str] = set()
+        self.fuzzy = False
+
+    def all(self) -> Set[str]:
+        return self.name_exact | self.name_other | self.category_exact | self.category_other
+
+    def score(self, product_id: str) -> float:
+        factor = 0.5 if self.fuzzy else 1.0
+        if product_id in self.name_exact:
+            return NAME_WEIGHT * factor
+        if product_id in self.name_other:
+            return NAME_WEIGHT * 0.6 * factor
+        if product_id in self.category_exact:
+            return CATEGORY_WEIGHT * factor
+        if product_id in self.category_other:
+            return CATEGORY_WEIGHT * 0.6 * factor
+        return 0.0
+
+
+class ProductSearchIndex:
+    def __init__(self):
+        self._index = _Index()
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self.built_at: Optional[float] = None
+        self.build_seconds = 0.0
+        self.queries = 0
+        self.updates = 0
+
+    # --- 1. Building / change hook ---
+
+    def rebuild(self, products: Iterable[CatalogProduct]) -> int:
+        started = time.perf_counter()
+        fresh = _Index()
+        for product in products:
+            fresh.add(product, bulk=True)
+        fresh.vocabulary.sort()
+        with self._lock:
+            self._index = fresh
+            self.built_at = time.time()
+            self.build_seconds = time.perf_counter() - started
+        return len(fresh.products)
+
+    def on_catalog_change(self, new: Optional[CatalogProduct], previous: Optional[CatalogProduct]) -> None:
+        """product_catalog listener: (None, None) signals a full reload."""
+        if new is None:
+            if self.built_at is None:
+                # Startup: build synchronously so search works from the first request
+                self.rebuild(product_catalog.all())
+            else:
+                self._rebuild_in_background()
+            return
+        with self._lock:
+            self._index.remove(new.id)
+            self._index.add(new)
+            self.updates += 1
+
+    def _rebuild_in_background(self) -> None:
+        with self._lock:
+            if self._rebuilding:
+                return
+            self._rebuilding = True
+
+        def run():
+            try:
+                self.rebuild(product_catalog.all())
+            except Exception:
+                logger.exception("Product search index rebuild failed; keeping the previous index.")
+            finally:
+                self._rebuilding = False
+
+        threading.Thread(target=run, name="product-search-rebuild", daemon=True).start()
+
+    # --- 2. Queries ---
+
+    def search(self, query: str, limit: int = 20,
+               allowed_ids: Optional[AbstractSet[str]] = None) -> List[Tuple[CatalogProduct, float]]:
+        """
+        Top `limit` products for `query`. Every query token must match (exact,
+        prefix or, failing both, a close trigram match); if no product matches
+        all of them, products matching any token are ranked instead. With
+        `allowed_ids` (a store's products) both steps only see those products.
+        """
+        tokens = normalize(query).split()
+        if not tokens:
+            return []
+        with self._lock:
+            self.queries += 1
+            index = self._index
+            per_token = [index.matches(token) for token in tokens]
+
+            # Set algebra runs in C; Python only loops over the final candidates
+            candidate_sets = [match.all() for match in per_token]
+            if allowed_ids is not None:
+                # Before intersecting: a full match elsewhere must not hide partial matches in the store
+                candidate_sets = [candidates & allowed_ids for candidates in candidate_sets]
+            candidate_sets.sort(key=len)
+            matched = candidate_sets[0].intersection(*candidate_sets[1:])
+            if not matched:
+                matched = set().union(*candidate_sets)
+            if len(matched) > MAX_SCORED_CANDIDATES:
+                # Broad queries ("a", "mil"): prefer exact name hits
+                exact = matched.intersection(*(m.name_exact for m in per_token if m.name_exact))
+                pool = exact if len(exact) >= limit else matched
+                # Ranking the whole pool would cost O(pool); score a bounded
+                # slice instead. Such queries narrow as the user keeps typing.
+                matched = islice(pool, MAX_SCORED_CANDIDATES)
+
+            normalized_query = " ".join(tokens)
+            ranked = []
+            for product_id in matched:
+                name = index.names[product_id]
+                score = sum(match.score(product_id) for match in per_token)
+                if name.startswith(normalized_query):
+                    score += NAME_WEIGHT
+                ranked.append((score, -len(name), product_id))
+            top = heapq.nlargest(limit, ranked)
+            return [(index.products[product_id], score) for score, _, product_id in top]
+
+    def find_by_normalized_name(self, product_name: str) -> Optional[CatalogProduct]:
+        """Exact match after normalization ("Amul  Milk 1L " == "amul milk 1l")."""
+        with self._lock:
+            product_id = self._index.by_normalized_name.get(normalize(product_name))
+            return self._index.products.get(product_id) if product_id else None
+
+    def stats(self) -> Dict[str, object]:
+        index = self._index
+        return {
+            "products": len(index.products),
+            "tokens": len(index.vocabulary),
+            "trigrams": len(index.trigrams),
+            "build_seconds": round(self.build_seconds, 3),
+            "queries": self.queries,
+            "updates": self.updates,
+        }
+
+
+product_search = ProductSearchIndex()
+product_catalog.add_listener(product_search.on_catalog_change)
@@ -0,0 +1,360 @@
+# File: range_analytics.py
+
+"""
+Ad-hoc date-range analytics: arbitrary from/to, day/week/month buckets and
+top-N products / categories.
+
+A small planner picks the cheapest source for the window: the rollups for
+the days RollupState marks as complete plus raw SalesData for anything
+newer. The series reads SalesStoreDailyRollup (one row per day), the
+product ranking reads SalesMonthlyProductRollup for the whole months in the
+window and SalesDailyRollup only for the partial months at its edges.
+Aggregation happens in SQL; Python only touches per-day and per-product
+totals (one row per day / product).
+"""
+
+import heapq
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import Date, Integer, and_, bindparam, delete, func, insert, literal, select, update
+from sqlalchemy.orm import Session
+
+from . import models
+from .sales_partitions import add_months, sales_rows
+
+# One watermark for all three rollup tables. It was "sales_daily" before the
+# store/day and monthly tables existed; that row does not cover them, so after
+# an upgrade reads stay on raw SalesData until the next refresh rebuilds all three.
+DAILY_ROLLUP = "sales_rollups"
+GRANULARITIES = ("day", "week", "month")
+
+
+# --- 1. Planner ---
+
+def _rollup_covered_through(db: Session) -> Optional[date]:
+    state = db.get(models.RollupState, DAILY_ROLLUP)
+    return state.covered_through if state else None
+
+
+def _month_end(month: date) -> date:
+    return add_months(month, 1) - timedelta(days=1)
+
+
+def _whole_months(start: date, end: date, covered: date) -> Tuple[Optional[date], Optional[date]]:
+    """
+    First and last month (as first days) whose SalesMonthlyProductRollup rows
+    lie inside [start, end]. The month holding `covered` only has rows up to
+    `covered`, so it counts as whole when the window reaches the watermark.
+    """
+    first = start if start.day == 1 else add_months(start, 1)
+    last = end.replace(day=1)
+    if end != covered and end != _month_end(last):
+        last = add_months(last, -1)
+    return (first, last) if first <= last else (None, None)
+
+
+def plan_source(db: Session, store_id: str, start: date, end: date) -> Tuple[List[Any], List[Any], str]:
+    """
+    Returns (series_sources, product_sources, plan) for one store. Series
+    sources have Date, Units_Sold, Revenue and Sales_Count columns, product
+    sources Product_ID, Units_Sold and Revenue; each list covers [start, end]
+    without overlap. They are aggregated one by one rather than through a
+    UNION, which most engines would materialize first.
+    """
+    covered = _rollup_covered_through(db)
+    series_sources, product_sources, plan = [], [], []
+
+    if covered is not None and covered >= start:
+        rollup_end = min(end, covered)
+        store_daily = models.SalesStoreDailyRollup.__table__
+        series_sources.append(
+            select(
+                store_daily.c.Date, store_daily.c.Units_Sold, store_daily.c.Revenue, store_daily.c.Sales_Count,
+            ).where(
+                store_daily.c.Store_ID == store_id,
+                store_daily.c.Date.between(start, rollup_end),
+            ).subquery("store_daily_src")
+        )
+
+        daily = models.SalesDailyRollup.__table__
+        first_month, last_month = _whole_months(start, rollup_end, covered)
+        if first_month is None:
+            edges = [(start, rollup_end)]
+        else:
+            monthly = models.SalesMonthlyProductRollup.__table__
+            product_sources.append(
+                select(monthly.c.Product_ID, monthly.c.Units_Sold, monthly.c.Revenue).where(
+                    monthly.c.Store_ID == store_id,
+                    monthly.c.Month.between(first_month, last_month),
+                ).subquery("monthly_src")
+            )
+            edges = [(start, first_month - timedelta(days=1)), (add_months(last_month, 1), rollup_end)]
+        for index, (edge_start, edge_end) in enumerate(edges):
+            if edge_start <= edge_end:
+                product_sources.append(
+                    select(daily.c.Product_ID, daily.c.Units_Sold, daily.c.Revenue).where(
+                        daily.c.Store_ID == store_id,
+                        daily.c.Date.between(edge_start, edge_end),
+                    ).subquery(f"daily_src_{index}")
+                )
+        plan.append("rollup")
+        start = rollup_end + timedelta(days=1)
+
+    if start <= end:
+        raw = sales_rows(db, start, end, [store_id])
+        raw_src = select(
+            raw.c.Date,
+            raw.c.Product_ID,
+            raw.c.Units_Sold,
+            (raw.c.Units_Sold * raw.c.Price).label("Revenue"),
+            literal(1, Integer).label("Sales_Count"),
+        ).subquery("raw_src")
+        series_sources.append(raw_src)
+        product_sources.append(raw_src)
+        plan.append("raw")
+
+    return series_sources, product_sources, "+".join(plan)
+
+
+# --- 2. Bucketing ---
+# The DB groups by day (at most one row per day in the window); folding days
+# into weeks/months here is cheaper than per-row date functions in SQL and
+# works the same on every dialect.
+
+def _bucket_start(day: date, granularity: str) -> date:
+    if granularity == "week":  # Monday of the week
+        return day - timedelta(days=day.weekday())
+    if granularity == "month":
+        return day.replace(day=1)
+    return day
+
+
+# --- 3. Public service function ---
+
+def get_range_analytics(
+    db: Session, store_id: str, start: date, end: date, granularity: str = "day", top_n: int = 10
+) -> Dict[str, Any]:
+    """Series by bucket plus top-N products and categories for [start, end]."""
+    series_sources, product_sources, plan = plan_source(db, store_id, start, end)
+    buckets: Dict[date, Dict[str, Any]] = {}
+    products: Dict[str, Dict[str, Any]] = {}
+
+    # A. Time series: one row per day from the DB, folded into buckets
+    for source in series_sources:
+        daily_rows = db.execute(
+            select(
+                source.c.Date.label("day"),
+                func.sum(source.c.Sales_Count).label("sales_count"),
+                func.sum(source.c.Units_Sold).label("units_sold"),
+                func.sum(source.c.Revenue).label("revenue"),
+            ).group_by(source.c.Date)
+        ).all()
+        for row in daily_rows:
+            day = row.day if isinstance(row.day, date) else date.fromisoformat(str(row.day)[:10])
+            key = _bucket_start(day, granularity)
+            point = buckets.setdefault(key, {"bucket": key.isoformat(), "sales_count": 0.0,
+                                             "units_sold": 0.0, "revenue_inr": 0.0})
+            point["sales_count"] += float(row.sales_count or 0)
+            point["units_sold"] += float(row.units_sold or 0)
+            point["revenue_inr"] += float(row.revenue or 0)
+
+    # B. Per-product totals (at most one row per product per source), ranked below
+    for source in product_sources:
+        per_product = (
+            select(
+                source.c.Product_ID.label("product_id"),
+                func.sum(source.c.Units_Sold).label("units_sold"),
+                func.sum(source.c.Revenue).label("revenue"),
+            ).group_by(source.c.Product_ID).subquery("per_product")
+        )
+        product_rows = db.execute(
+            select(
+                per_product.c.product_id,
+                per_product.c.units_sold,
+                per_product.c.revenue,
+                models.Product.product_name,
+                models.Product.category,
+            ).outerjoin(models.Product, models.Product.id == per_product.c.product_id)
+        ).all()
+        for row in product_rows:
+            p = products.setdefault(row.product_id, {
+                "product_id": row.product_id,
+                "product_name": row.product_name,
+                "category": row.category,
+                "units_sold": 0.0,
+                "revenue_inr": 0.0,
+            })
+            p["units_sold"] += float(row.units_sold or 0)
+            p["revenue_inr"] += float(row.revenue or 0)
+
+    series = [buckets[key] for key in sorted(buckets)]
+    categories: Dict[str, Dict[str, Any]] = {}
+    for p in products.values():
+        c = categories.setdefault(p["category"] or "Uncategorized",
+                                  {"category": p["category"] or "Uncategorized", "units_sold": 0.0, "revenue_inr": 0.0})
+        c["units_sold"] += p["units_sold"]
+        c["revenue_inr"] += p["revenue_inr"]
+
+    return {
+        "store_id": store_id,
+        "from_date": start.isoformat(),
+        "to_date": end.isoformat(),
+        "granularity": granularity,
+        "plan": plan,
+        "totals": {
+            "sales_count": sum(point["sales_count"] for point in series),
+            "units_sold": sum(point["units_sold"] for point in series),
+            "revenue_inr": sum(point["revenue_inr"] for point in series),
+        },
+        "series": series,
+        "top_products_by_revenue": heapq.nlargest(top_n, products.values(), key=lambda p: p["revenue_inr"]),
+        "top_products_by_units": heapq.nlargest(top_n, products.values(), key=lambda p: p["units_sold"]),
+        "top_categories_by_revenue": heapq.nlargest(top_n, categories.values(), key=lambda c: c["revenue_inr"]),
+        "top_categories_by_units": heapq.nlargest(top_n, categories.values(), key=lambda c: c["units_sold"]),
+    }
+
+
+# --- 4. Rollup maintenance (`python -m inventrack.manage rollup-sales`) ---
+
+def refresh_daily_rollup(db: Session, since: Optional[date] = None, lookback_days: int = 3) -> Tuple[date, date]:
+    """
+    Recomputes SalesDailyRollup for [since, yesterday], the store/day and
+    monthly product rollups derived from it, and advances the watermark. By
+    default it restarts a few days before the current watermark to pick up
+    late rows (write-behind flushes, offline syncs).
+    """
+    through = date.today() - timedelta(days=1)
+    covered = _rollup_covered_through(db)
+    if since is None:
+        if covered is None:
+            # Through the router: with SQLite month tables the base table may be empty
+            history = sales_rows(db)
+            first = db.execute(select(func.min(history.c.Date))).scalar()
+            if isinstance(first, str):
+                first = date.fromisoformat(first[:10])
+            since = first or through
+        else:
+            since = covered - timedelta(days=lookback_days)
+    if isinstance(since, str):
+        since = date.fromisoformat(since)
+
+    rollup = models.SalesDailyRollup.__table__
+    raw = sales_rows(db, since, through)
+    aggregate = select(
+        raw.c.Store_ID,
+        raw.c.Date,
+        raw.c.Product_ID,
+        func.sum(raw.c.Units_Sold),
+        func.coalesce(func.sum(raw.c.Units_Sold * raw.c.Price), 0),
+        func.count(),
+    ).group_by(raw.c.Store_ID, raw.c.Date, raw.c.Product_ID)
+
+    db.execute(delete(rollup).where(rollup.c.Date.between(since, through)))
+    db.execute(insert(rollup).from_select(
+        ["Store_ID", "Date", "Product_ID", "Units_Sold", "Revenue", "Sales_Count"], aggregate
+    ))
+
+    # Store/day series from the rows just written
+    store_daily = models.SalesStoreDailyRollup.__table__
+    db.execute(delete(store_daily).where(store_daily.c.Date.between(since, through)))
+    db.execute(insert(store_daily).from_select(
+        ["Store_ID", "Date", "Units_Sold", "Revenue", "Sales_Count"],
+        select(
+            rollup.c.Store_ID, rollup.c.Date, func.sum(rollup.c.Units_Sold),
+            func.sum(rollup.c.Revenue), func.sum(rollup.c.Sales_Count),
+        ).where(rollup.c.Date.between(since, through)).group_by(rollup.c.Store_ID, rollup.c.Date)
+    ))
+
+    # Monthly product totals: every month the refreshed days touch, recomputed whole
+    monthly = models.SalesMonthlyProductRollup.__table__
+    month = since.replace(day=1)
+    while month <= through:
+        month_end = min(_month_end(month), through)
+        db.execute(delete(monthly).where(monthly.c.Month == month))
+        db.execute(insert(monthly).from_select(
+            ["Store_ID", "Month", "Product_ID", "Units_Sold", "Revenue", "Sales_Count"],
+            select(
+                rollup.c.Store_ID, literal(month, Date), rollup.c.Product_ID, func.sum(rollup.c.Units_Sold),
+                func.sum(rollup.c.Revenue), func.sum(rollup.c.Sales_Count),
+            ).where(rollup.c.Date.between(month, month_end)).group_by(rollup.c.Store_ID, rollup.c.Product_ID)
+        ))
+        month = add_months(month, 1)
+
+    state = db.get(models.RollupState, DAILY_ROLLUP)
+    if state is None:
+        state = models.RollupState(rollup_name=DAILY_ROLLUP, covered_through=through)
+        db.add(state)
+    state.covered_through = through
+    state.refreshed_at = datetime.now()
+    db.commit()
+    return since, through
+
+
+def patch_rollups(db: Session, sales_records: List[Dict[str, Any]]) -> None:
+    """
+    Adds SalesData rows inserted after the fact (offline syncs, write-behind
+    flushes) that are dated on or before the rollup watermark to
+    SalesDailyRollup and the store/day and monthly product rollups, in the
+    caller's transaction. Rows without a price count as 0 revenue, as in
+    refresh_daily_rollup.
+    """
+    covered = _rollup_covered_through(db)
+    if covered is None:
+        return
+    by_store: Dict[str, List[Dict[Tuple, List[Any]]]] = {}
+    for record in sales_records:
+        if record["date"] > covered:
+            continue
+        daily, store_daily, monthly = by_store.setdefault(record["store_id"], [{}, {}, {}])
+        units = record["units_sold"]
+        price = record["price"]
+        revenue = (Decimal(str(price)) if price is not None else Decimal("0")) * units
+        for totals, key in (
+            (daily, (record["date"], record["product_id"])),
+            (store_daily, (record["date"],)),
+            (monthly, (record["date"].replace(day=1), record["product_id"])),
+        ):
+            entry = totals.setdefault(key, [0, Decimal("0"), 0])
+            entry[0] += units
+            entry[1] += revenue
+            entry[2] += 1
+
+    for store_id, (daily, store_daily, monthly) in by_store.items():
+        _add_to_rollup(db, models.SalesDailyRollup.__table__, ("Date", "Product_ID"), store_id, daily)
+        _add_to_rollup(db, models.SalesStoreDailyRollup.__table__, ("Date",), store_id, store_daily)
+        _add_to_rollup(db, models.SalesMonthlyProductRollup.__table__, ("Month", "Product_ID"), store_id, monthly)
+
+
+def _add_to_rollup(db: Session, rollup, key_columns: Tuple[str, ...], store_id: str,
+                   totals: Dict[Tuple, List[Any]]) -> None:
+    """Adds [units, revenue, count] per key to one rollup table: UPDATE the rows that exist, INSERT the rest."""
+    first = rollup.c[key_columns[0]]
+    present = set(db.execute(
+        select(*[rollup.c[name] for name in key_columns]).where(
+            and_(rollup.c.Store_ID == store_id, first.in_({key[0] for key in totals}))
+        )
+    ).all())
+    updates = [
+        {**{f"k_{name}": value for name, value in zip(key_columns, key)},
+         "units": units, "revenue": revenue, "count": count}
+        for key, (units, revenue, count) in totals.items() if key in present
+    ]
+    inserts = [
+        {"Store_ID": store_id, **dict(zip(key_columns, key)), "Units_Sold": units, "Revenue": revenue,
+         "Sales_Count": count}
+        for key, (units, revenue, count) in totals.items() if key not in present
+    ]
+    if updates:
+        db.execute(
+            update(rollup)
+            .where(rollup.c.Store_ID == store_id,
+                   *[rollup.c[name] == bindparam(f"k_{name}") for name in key_columns])
+            .values(Units_Sold=rollup.c.Units_Sold + bindparam("units"),
+                    Revenue=rollup.c.Revenue + bindparam("revenue"),
+                    Sales_Count=rollup.c.Sales_Count + bindparam("count")),
+            updates,
+        )
+    if inserts:
+        db.execute(insert(rollup), inserts)
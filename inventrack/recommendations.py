@@ -0,0 +1,349 @@
+# File: inventrack/recommendations.py
+
+"""
+"Frequently bought together" from stored baskets (Bills / BillItems).
+
+The model is a sparse co-occurrence matrix kept as a dict of Counters, one
+per scope: each store, plus ALL_STORES for the chain-wide view.
+
+- process_bill adds every committed basket to a small delta;
+- compaction (a background thread, started every COOCCURRENCE_COMPACT_EVERY
+  baskets or by a read once the delta is COOCCURRENCE_COMPACT_SECONDS old)
+  merges the delta into
+  per-product neighbour lists sorted by count and truncated to
+  COOCCURRENCE_KEEP entries, so memory stays O(products * KEEP) and a
+  lookup is a slice of a precomputed list: O(k);
+- `python -m inventrack.manage rebuild-cooccurrence` recounts everything
+  from BillItems and writes a snapshot that every worker loads at startup
+  and picks up again when the file changes.
+
+Each worker adds only the bills it processed itself between snapshots. It
+keeps a log of those baskets (the newest COOCCURRENCE_LOCAL_MAX), and a
+reloaded snapshot gets the ones added after its rebuild started counting
+replayed on top, so they are not lost. Reloads are read and decompressed
+in a background thread and swapped in under the lock in one step.
+"""
+
+import gzip
+import json
+import logging
+import os
+import threading
+import time
+from collections import Counter, deque
+from datetime import date, datetime
+from itertools import combinations
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from inventrack import models
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent
+ALL_STORES = "*"
+SNAPSHOT_VERSION = 1
+
+
+def _count_basket(baskets: Counter, item_baskets: Dict[str, Counter], pairs: Dict[str, Dict[str, Counter]],
+                  store_id: str, items: List[str]) -> None:
+    """Adds one basket (sorted, de-duplicated product IDs) to the store and chain-wide counts."""
+    for scope in (store_id, ALL_STORES):
+        baskets[scope] += 1
+        item_baskets.setdefault(scope, Counter()).update(items)
+        by_product = pairs.setdefault(scope, {})
+        for a, b in combinations(items, 2):
+            by_product.setdefault(a, Counter())[b] += 1
+            by_product.setdefault(b, Counter())[a] += 1
+
+
+class CooccurrenceModel:
+    def __init__(self, keep: int = 50, compact_every: int = 500, compact_seconds: float = 30.0,
+                 local_max: int = 200_000, clock: Callable[[], datetime] = datetime.now):
+        self.keep = keep
+        self.compact_every = compact_every
+        self.compact_seconds = compact_seconds
+
+        # scope -> product_id -> [(other_product_id, count)] sorted by count desc
+        self._neighbours: Dict[str, Dict[str, List[Tuple[str, int]]]] = {}
+        # scope -> product_id -> number of baskets containing it
+        self._item_baskets: Dict[str, Counter] = {}
+        self._baskets: Counter = Counter()  # scope -> basket count
+
+        # Not yet compacted: scope -> product_id -> Counter(other_product_id)
+        self._delta: Dict[str, Dict[str, Counter]] = {}
+        self._delta_baskets = 0
+        self._delta_since: Optional[float] = None
+        self._lock = threading.Lock()          # guards the dicts above
+        self._compact_lock = threading.Lock()  # one compaction at a time
+        self._compacting = False
+        # Baskets added by this worker: (added_at, store_id, items), replayed onto reloaded snapshots
+        self._local: deque = deque(maxlen=local_max)
+        self._clock = clock  # stamps _local; compared with the snapshot's counted_at
+        self._generation = 0  # bumped by every snapshot load
+
+        self.snapshot_mtime: Optional[float] = None
+        self.built_at: Optional[str] = None
+        self.counted_at: Optional[str] = None
+        self.compactions = 0
+
+    # --- 1. Incremental updates ---
+
+    def add_basket(self, store_id: str, product_ids: Iterable[str]) -> None:
+        items = sorted(set(product_ids))
+        if not items:
+            return
+        with self._lock:
+            _count_basket(self._baskets, self._item_baskets, self._delta, store_id, items)
+            self._local.append((self._clock(), store_id, items))
+            self._delta_baskets += 1
+            if self._delta_since is None:
+                self._delta_since = time.monotonic()
+            due = self._delta_baskets >= self.compact_every
+        if due:
+            self._compact_in_background()
+
+    def _compact_in_background(self) -> None:
+        # Keeps the merge off the billing request that happened to fill the delta
+        with self._lock:
+            if self._compacting:
+                return
+            self._compacting = True
+        threading.Thread(target=self.compact, name="cooccurrence-compact", daemon=True).start()
+
+    def compact(self) -> None:
+        """Merges the pending delta into the neighbour lists of the products it touched."""
+        with self._compact_lock:
+            try:
+                with self._lock:
+                    delta, self._delta = self._delta, {}
+                    self._delta_baskets = 0
+                    self._delta_since = None
+                    generation = self._generation
+                # Merge outside the data lock so add_basket / top never wait on it
+                updates = {}
+                for scope, by_product in delta.items():
+                    neighbours = self._neighbours.get(scope, {})
+                    for product_id, counts in by_product.items():
+                        merged = Counter(dict(neighbours.get(product_id, ())))
+                        merged.update(counts)
+                        updates[(scope, product_id)] = merged.most_common(self.keep)
+                with self._lock:
+                    if generation != self._generation:
+                        return  # a snapshot was loaded meanwhile and replayed these baskets itself
+                    for (scope, product_id), pairs in updates.items():
+                        self._neighbours.setdefault(scope, {})[product_id] = pairs
+                    self.compactions += 1
+            finally:
+                self._compacting = False
+
+    # --- 2. Reads ---
+
+    def top(self, product_id: str, store_id: Optional[str] = None, k: int = 10) -> List[Dict[str, Any]]:
+        """Products most often in the same basket as `product_id` (store or chain-wide)."""
+        scope = store_id or ALL_STORES
+        if self._delta_since is not None and time.monotonic() - self._delta_since > self.compact_seconds:
+            self._compact_in_background()
+        with self._lock:
+            neighbours = self._neighbours.get(scope, {}).get(product_id, [])[:k]
+            baskets = self._baskets.get(scope, 0)
+            item_baskets = self._item_baskets.get(scope, Counter())
+            base = item_baskets.get(product_id, 0)
+            out = []
+            for other, together in neighbours:
+                other_baskets = item_baskets.get(other, 0)
+                out.append({
+                    "product_id": other,
+                    "baskets_together": together,
+                    # P(other | product) and how much more likely than chance
+                    "confidence": round(together / base, 4) if base else 0.0,
+                    "lift": round(together * baskets / (base * other_baskets), 4) if base and other_baskets else 0.0,
+                })
+            return out
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "scopes": len(self._neighbours),
+                "baskets": self._baskets.get(ALL_STORES, 0),
+                "products": len(self._neighbours.get(ALL_STORES, {})),
+                "pending_baskets": self._delta_baskets,
+                "local_baskets": len(self._local),
+                "compactions": self.compactions,
+                "snapshot_built_at": self.built_at,
+            }
+
+    # --- 3. Snapshots ---
+
+    def to_snapshot(self) -> Dict[str, Any]:
+        self.compact()
+        with self._lock:
+            return {
+                "version": SNAPSHOT_VERSION,
+                "built_at": self.built_at or datetime.now().isoformat(timespec="seconds"),
+                "counted_at": self.counted_at,
+                "keep": self.keep,
+                "baskets": dict(self._baskets),
+                "item_baskets": {scope: dict(counts) for scope, counts in self._item_baskets.items()},
+                "neighbours": self._neighbours,
+            }
+
+    def load_snapshot(self, data: Dict[str, Any], mtime: Optional[float] = None) -> None:
+        if data.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported co-occurrence snapshot version {data.get('version')!r}")
+        neighbours = {
+            scope: {pid: [(other, count) for other, count in pairs] for pid, pairs in by_product.items()}
+            for scope, by_product in data["neighbours"].items()
+        }
+        item_baskets = {scope: Counter(counts) for scope, counts in data["item_baskets"].items()}
+        baskets = Counter(data["baskets"])
+        # Older snapshots only have built_at, which is later than the bills they counted
+        counted_at = data.get("counted_at") or data.get("built_at")
+        counted_at = datetime.fromisoformat(counted_at) if counted_at else None
+
+        with self._lock:
+            # This worker's baskets the snapshot has not counted go back on top, as pending delta
+            while self._local and counted_at is not None and self._local[0][0] <= counted_at:
+                self._local.popleft()
+            delta: Dict[str, Dict[str, Counter]] = {}
+            for _, store_id, items in self._local:
+                _count_basket(baskets, item_baskets, delta, store_id, items)
+            self._neighbours = neighbours
+            self._item_baskets = item_baskets
+            self._baskets = baskets
+            self._delta = delta
+            self._delta_baskets = len(self._local)
+            self._delta_since = time.monotonic() if self._local else None
+            self._generation += 1
+            self.built_at = data.get("built_at")
+            self.counted_at = data.get("counted_at")
+            self.snapshot_mtime = mtime
+
+
+# --- 4. Rebuild from history (`python -m inventrack.manage rebuild-cooccurrence`) ---
+
+def rebuild_from_db(db: Session, since: Optional[date] = None, batch_size: int = 50_000, keep: int = 50) -> Tuple[CooccurrenceModel, int]:
+    """
+    Streams BillItems ordered by bill and recounts every basket. Full pair
+    counts are held per scope only while counting, then truncated to `keep`.
+    """
+    counts: Dict[str, Dict[str, Counter]] = {}
+    item_baskets: Dict[str, Counter] = {}
+    baskets: Counter = Counter()
+
+    def add(store_id: str, items: List[str]) -> None:
+        _count_basket(baskets, item_baskets, counts, store_id, sorted(set(items)))
+
+    query = (
+        select(models.BillItem.bill_id, models.Bill.store_id, models.BillItem.product_id)
+        .join(models.Bill, models.Bill.bill_id == models.BillItem.bill_id)
+        .order_by(models.BillItem.bill_id)
+    )
+    if since is not None:
+        query = query.where(models.Bill.bill_date >= since)
+
+    # Bills committed after this point may be missing; workers replay their own from here
+    counted_at = datetime.now().isoformat(timespec="microseconds")
+    result = db.execute(query, execution_options={"stream_results": True, "yield_per": batch_size})
+    current_bill, current_store, items, total = None, None, [], 0
+    for bill_id, store_id, product_id in result:
+        if bill_id != current_bill:
+            if items:
+                add(current_store, items)
+                total += 1
+            current_bill, current_store, items = bill_id, store_id, []
+        items.append(product_id)
+    if items:
+        add(current_store, items)
+        total += 1
+
+    model = CooccurrenceModel(keep=keep)
+    model._neighbours = {
+        scope: {pid: counter.most_common(keep) for pid, counter in by_product.items()}
+        for scope, by_product in counts.items()
+    }
+    model._item_baskets = item_baskets
+    model._baskets = baskets
+    model.built_at = datetime.now().isoformat(timespec="seconds")
+    model.counted_at = counted_at
+    return model, total
+
+
+def write_snapshot(model: CooccurrenceModel, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump(model.to_snapshot(), f, separators=(",", ":"))
+    os.replace(tmp, path)  # readers never see a half-written file
+
+
+def read_snapshot(path: Path) -> Dict[str, Any]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return json.load(f)
+
+
+# --- 5. Process-wide instance ---
+
+SNAPSHOT_PATH = Path(os.getenv("COOCCURRENCE_SNAPSHOT", str(BASE_DIR / "cooccurrence.json.gz")))
+SNAPSHOT_CHECK_SECONDS = 60.0
+
+cooccurrence = CooccurrenceModel(
+    keep=int(os.getenv("COOCCURRENCE_KEEP", "50")),
+    compact_every=int(os.getenv("COOCCURRENCE_COMPACT_EVERY", "500")),
+    compact_seconds=float(os.getenv("COOCCURRENCE_COMPACT_SECONDS", "30")),
+    local_max=int(os.getenv("COOCCURRENCE_LOCAL_MAX", "200000")),
+)
+_last_snapshot_check = 0.0
+_reload_lock = threading.Lock()
+_reloading = False
+
+
+def load_from_snapshot() -> bool:
+    """Loads (or reloads, if the file changed) the rebuild snapshot. Never raises."""
+    try:
+        mtime = SNAPSHOT_PATH.stat().st_mtime
+    except FileNotFoundError:
+        return False
+    if cooccurrence.snapshot_mtime == mtime:
+        return False
+    try:
+        cooccurrence.load_snapshot(read_snapshot(SNAPSHOT_PATH), mtime)
+        logger.info("Co-occurrence snapshot loaded from %s.", SNAPSHOT_PATH)
+        return True
+    except Exception:
+        logger.exception("Could not load co-occurrence snapshot %s.", SNAPSHOT_PATH)
+        return False
+
+
+def maybe_reload_snapshot() -> None:
+    """
+    Cheap check (a stat call at most once a minute) used on the read path.
+    A changed file is loaded by a background thread; reads keep using the
+    current model until it is swapped in.
+    """
+    global _last_snapshot_check, _reloading
+    now = time.monotonic()
+    if now - _last_snapshot_check < SNAPSHOT_CHECK_SECONDS:
+        return
+    _last_snapshot_check = now
+    try:
+        if SNAPSHOT_PATH.stat().st_mtime == cooccurrence.snapshot_mtime:
+            return
+    except FileNotFoundError:
+        return
+    with _reload_lock:
+        if _reloading:
+            return
+        _reloading = True
+    threading.Thread(target=_reload, name="cooccurrence-snapshot-load", daemon=True).start()
+
+
+def _reload() -> None:
+    global _reloading
+    try:
+        load_from_snapshot()
+    finally:
+        _reloading = False
@@ -0,0 +1,274 @@
+# File: inventrack/request_profiler.py
+
+"""
+On-demand per-request profiling (REQUEST_PROFILING=1).
+
+A request is profiled with cProfile when it carries
+`X-Profile: <REQUEST_PROFILING_TOKEN>` or is picked by sampling at
+REQUEST_PROFILING_SAMPLE_RATE (0.0 - 1.0). Its response then carries
+`X-Profile-Id`, and the profile is kept in memory (the last
+REQUEST_PROFILING_MAX_PROFILES) for
+
+- GET /internal/profiles              summaries, newest first
+- GET /internal/profiles/top          top functions across stored profiles
+- GET /internal/profiles/{id}         pstats report (or ?raw=true: a .prof
+                                      file for snakeviz / pstats)
+
+Sync endpoints run in the threadpool and cProfile only sees the thread it
+was enabled on, so the routers use ProfiledRoute, which wraps each
+endpoint: the wrapper runs it under the profiler in whichever thread
+executes it. For async endpoints (CSV upload) the profile also contains whatever
+other coroutines ran on the event loop while the endpoint was awaiting.
+Dependencies (get_db, ValidStore) are not profiled.
+
+One request is profiled at a time per worker; a request picked while
+another is being profiled runs normally. When the feature is off nothing
+is installed. When it is on, an unprofiled request costs one header check
+in the middleware and one context-variable read in the endpoint wrapper.
+"""
+
+import contextvars
+import cProfile
+import functools
+import inspect
+import io
+import itertools
+import marshal
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from fastapi.routing import APIRoute
+
+
+def enabled() -> bool:
+    return os.getenv("REQUEST_PROFILING", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+PROFILE_HEADER = b"x-profile"
+
+
+# --- 1. Per-request capture ---
+
+class _Capture:
+    __slots__ = ("profile_id", "profiler")
+
+    def __init__(self, profile_id: str):
+        self.profile_id = profile_id
+        self.profiler: Optional[cProfile.Profile] = None
+
+
+# The capture of the request being served, set by the middleware only for
+# requests chosen for profiling.
+_current: "contextvars.ContextVar[Optional[_Capture]]" = contextvars.ContextVar("request_profile", default=None)
+
+
+def _profiled(call):
+    """Wraps an endpoint so it runs under cProfile when its request is being profiled."""
+    if inspect.iscoroutinefunction(call):
+        @functools.wraps(call)
+        async def wrapper(*args, **kwargs):
+            capture = _current.get()
+            if capture is None:
+                return await call(*args, **kwargs)
+            capture.profiler = cProfile.Profile()
+            capture.profiler.enable()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                capture.profiler.disable()
+    else:
+        @functools.wraps(call)
+        def wrapper(*args, **kwargs):
+            capture = _current.get()
+            if capture is None:
+                return call(*args, **kwargs)
+            capture.profiler = cProfile.Profile()
+            capture.profiler.enable()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                capture.profiler.disable()
+    wrapper._request_profiler = True
+    return wrapper
+
+
+class ProfiledRoute(APIRoute):
+    """
+    route_class of the API routers. Wraps the endpoint before FastAPI
+    analyses it, and only when REQUEST_PROFILING=1 at import time.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        if enabled() and not getattr(endpoint, "_request_profiler", False):
+            endpoint = _profiled(endpoint)
+        super().__init__(path, endpoint, **kwargs)
+
+
+# --- 2. Store ---
+
+class ProfileStore:
+    def __init__(self, max_profiles: int):
+        self.max_profiles = max_profiles
+        # profile_id -> {"meta": {...}, "stats": raw pstats dict}
+        self._profiles: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.profiled = 0
+        self.skipped_busy = 0
+
+    def add(self, capture: _Capture, meta: Dict[str, Any]) -> None:
+        capture.profiler.create_stats()
+        with self._lock:
+            self._profiles[capture.profile_id] = {"meta": meta, "stats": capture.profiler.stats}
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+            self.profiled += 1
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [entry["meta"] for entry in reversed(self._profiles.values())]
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def _stats(self, raw_stats: List[dict]) -> pstats.Stats:
+        # Shallow copies: Stats.add merges into the first dict it was given
+        stats = pstats.Stats(_RawStats(dict(raw_stats[0])), stream=io.StringIO())
+        for raw in raw_stats[1:]:
+            stats.add(_RawStats(raw))
+        return stats
+
+    def report(self, profile_id: str, sort: str, limit: int) -> Optional[Dict[str, Any]]:
+        entry = self.get(profile_id)
+        if entry is None:
+            return None
+        stats = self._stats([entry["stats"]])
+        return {**entry["meta"], "report": _format(stats, sort, limit)}
+
+    def raw(self, profile_id: str) -> Optional[bytes]:
+        """The profile in the pstats dump format (readable by pstats.Stats / snakeviz)."""
+        entry = self.get(profile_id)
+        return marshal.dumps(entry["stats"]) if entry is not None else None
+
+    def top(self, sort: str, limit: int, endpoint: Optional[str] = None) -> Dict[str, Any]:
+        """Functions with the most time across the stored profiles (optionally of one endpoint)."""
+        with self._lock:
+            entries = [e for e in self._profiles.values() if endpoint is None or e["meta"]["endpoint"] == endpoint]
+        if not entries:
+            return {"profiles": 0, "functions": []}
+        stats = self._stats([e["stats"] for e in entries])
+        stats.sort_stats(sort)
+        functions = []
+        for func in stats.fcn_list[:limit]:
+            _, calls, tottime, cumtime, _ = stats.stats[func]
+            filename, line, name = func
+            functions.append({
+                "function": f"{name} ({filename}:{line})" if line else name,
+                "calls": calls,
+                "tottime_ms": round(tottime * 1000, 3),
+                "cumtime_ms": round(cumtime * 1000, 3),
+                "tottime_ms_per_request": round(tottime * 1000 / len(entries), 3),
+            })
+        return {"profiles": len(entries), "sort": sort, "functions": functions}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"stored": len(self._profiles), "profiled": self.profiled, "skipped_busy": self.skipped_busy}
+
+
+class _RawStats:
+    """Adapter so pstats.Stats can load an in-memory stats dict (it calls create_stats())."""
+
+    def __init__(self, stats: dict):
+        self.stats = stats
+
+    def create_stats(self) -> None:
+        pass
+
+
+def _format(stats: pstats.Stats, sort: str, limit: int) -> str:
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+# --- 3. Middleware ---
+
+class ProfilingMiddleware:
+    def __init__(self, app, store: ProfileStore, token: Optional[str], sample_rate: float):
+        self.app = app
+        self.store = store
+        self.token = token.encode() if token else None
+        self.sample_rate = sample_rate
+        self._busy = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def _trigger(self, scope) -> Optional[str]:
+        if self.token is not None:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return "header" if value == self.token else None
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return "sampled"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        trigger = self._trigger(scope)
+        if trigger is None:
+            return await self.app(scope, receive, send)
+        if not self._busy.acquire(blocking=False):
+            self.store.skipped_busy += 1
+            return await self.app(scope, receive, send)
+
+        capture = _Capture(f"{next(self._ids)}-{uuid.uuid4().hex[:8]}")
+        status_code = None
+
+        async def send_with_id(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-profile-id", capture.profile_id.encode())]
+            await send(message)
+
+        token = _current.set(capture)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            _current.reset(token)
+            self._busy.release()
+            if capture.profiler is not None:
+                route = scope.get("route")
+                self.store.add(capture, {
+                    "id": capture.profile_id,
+                    "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+                    "endpoint": f"{scope['method']} {getattr(route, 'path', scope['path'])}",
+                    "path": scope["path"],
+                    "status": status_code,
+                    "trigger": trigger,
+                    "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+                })
+
+
+# --- 4. Process-wide instance ---
+
+profile_store = ProfileStore(max_profiles=int(os.getenv("REQUEST_PROFILING_MAX_PROFILES", "200")))
+
+
+def middleware_options() -> Dict[str, Any]:
+    return {
+        "store": profile_store,
+        "token": os.getenv("REQUEST_PROFILING_TOKEN") or None,
+        "sample_rate": float(os.getenv("REQUEST_PROFILING_SAMPLE_RATE", "0")),
+    }
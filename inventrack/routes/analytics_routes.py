@@ -1,39 +1,71 @@
 # File: routes/analytics_routes.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from typing import Annotated
+from datetime import date
 from sqlalchemy.orm import Session
-from inventrack.dependencies import get_db
-from inventrack.schemas import SalesAnalyticsResponse # Import the response schema
-from inventrack.analytics_service import get_sales_analytics
+from inventrack.dependencies import get_read_db, ValidStore
+from inventrack.schemas import SalesAnalyticsResponse, RangeAnalyticsResponse, OwnerAnalyticsResponse # Import the response schemas
+from inventrack.analytics_service import get_sales_analytics, get_owner_analytics
+from inventrack.range_analytics import get_range_analytics
 from inventrack import models # Needed for store existence check
+from inventrack.request_profiler import ProfiledRoute
 
 router = APIRouter(
     prefix="/analytics",
-    tags=['Sales Analytics Dashboard']
+    tags=['Sales Analytics Dashboard'],
+    route_class=ProfiledRoute
 )
 
-DBDependency = Annotated[Session, Depends(get_db)]
+# Read-only router: served from a read replica when one is configured
+ReadDBDependency = Annotated[Session, Depends(get_read_db)]
+
+# Declared before the /{store_id} routes so "owner" is never taken as a store ID
+@router.get(
+    "/owner/{user_id}",
+    response_model=OwnerAnalyticsResponse,
+    status_code=status.HTTP_200_OK
+)
+def get_owner_dashboard_analytics(user_id: int, db: ReadDBDependency):
+    """
+    Dashboard KPIs and the 30-day trend for every store owned by a user,
+    per store and combined, computed with grouped queries over the whole
+    store set instead of one /analytics/{store_id} call per store.
+    """
+    shops = (
+        db.query(models.Shop)
+        .filter(models.Shop.owner_id == user_id)
+        .order_by(models.Shop.store_id)
+        .all()
+    )
+    if not shops:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"No stores found for user ID {user_id}."
+        )
+
+    try:
+        return get_owner_analytics(db, user_id, shops)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process owner analytics: {str(e)}"
+        )
+
 
 @router.get(
     "/{store_id}", 
     response_model=SalesAnalyticsResponse,
     status_code=status.HTTP_200_OK
 )
-def get_dashboard_analytics(store_id: str, db: DBDependency):
+def get_dashboard_analytics(store_id: str, db: ReadDBDependency, shop: ValidStore):
     """
     Retrieves all key sales metrics (Revenue, Sales Count, Units Sold) 
     for the current Daily, Weekly, Monthly, and Overall periods, 
     plus time-series data for the sales trend graph.
     """
     
-    # 1. Verify the store exists
-    shop = db.query(models.Shop).filter(models.Shop.store_id == store_id).first()
-    if not shop:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Store ID {store_id} not found."
-        )
+    # 1. The store was verified by the ValidStore dependency (shop registry)
 
     # 2. Call the service function to compute all metrics
     try:
@@ -44,4 +76,37 @@ def get_dashboard_analytics(store_id: str, db: DBDependency):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to process sales analytics: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.get(
+    "/{store_id}/range",
+    response_model=RangeAnalyticsResponse,
+    status_code=status.HTTP_200_OK
+)
+def get_store_range_analytics(
+    store_id: str,
+    db: ReadDBDependency,
+    shop: ValidStore,
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    granularity: str = Query("day", pattern="^(day|week|month)$"),
+    top_n: int = Query(10, ge=1, le=100),
+):
+    """
+    Sales for an arbitrary from/to range at day, week or month granularity,
+    plus the top-N products and categories by revenue and by units.
+    """
+    if from_date > to_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="'from' must not be after 'to'."
+        )
+
+    try:
+        return get_range_analytics(db, store_id, from_date, to_date, granularity, top_n)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to process range analytics: {str(e)}"
+        )
@@ -6,10 +6,14 @@ from typing import Annotated, Dict, Any # Added Dict, Any for the shopkeeper res
 import uuid 
 from inventrack import schemas, models
 from inventrack.dependencies import get_db 
+from inventrack.shop_registry import shop_registry
+from inventrack.availability_index import availability_index
+from inventrack.request_profiler import ProfiledRoute
 
 router = APIRouter(
     prefix="/auth",
-    tags=['Authentication']
+    tags=['Authentication'],
+    route_class=ProfiledRoute
 )
 
 # Define the dependency type alias
@@ -59,6 +63,9 @@ def create_shopkeeper(request: schemas.ShopkeeperCreate, db: DBDependency):
     db.add(new_shop)
     db.commit()
     db.refresh(new_shop)
+    # Replaces a cached "not found" for this ID, if a client probed it earlier
+    shop_registry.put(new_shop)
+    availability_index.refresh_store(db, new_store_id)
 
     return {
         "message": f"Shopkeeper '{new_user.full_name}' and shop '{new_shop.shop_name}' created successfully.",
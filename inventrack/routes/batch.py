@@ -0,0 +1,171 @@
+# File: inventrack/routes/batch.py
+
+"""
+POST /batch: several API calls in one round trip (app launch fetches the
+listing, analytics, restock status and recommendations together).
+
+Each sub-request is dispatched through the full ASGI app, middleware
+included, with the caller's headers, so it behaves exactly like a separate
+call (admission control, ValidStore, profiling). Runs of consecutive GETs
+execute concurrently, at most BATCH_MAX_CONCURRENCY at a time; every other
+method runs alone, in order, after the sub-requests before it, so a GET
+listed after a write sees that write.
+
+Sub-requests are not merged into one DB session: a Session is not
+thread-safe and each handler commits / rolls back its own work, so each
+one checks out its own pooled connection like a normal request.
+"""
+
+import asyncio
+import json
+import os
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlsplit
+
+from fastapi import APIRouter, HTTPException, Request, status
+
+from inventrack import schemas
+from inventrack.request_profiler import ProfiledRoute
+
+router = APIRouter(
+    tags=['Batch'],
+    route_class=ProfiledRoute
+)
+
+BATCH_MAX_REQUESTS = int(os.getenv("BATCH_MAX_REQUESTS", "20"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+ALLOWED_METHODS = {"GET", "POST", "PUT", "PATCH", "DELETE"}
+# Headers of the batch call that are not passed on to its sub-requests
+HOP_HEADERS = {b"content-length", b"content-type", b"transfer-encoding", b"connection", b"expect"}
+
+
+def _error(sub: schemas.BatchSubRequest, status_code: int, detail: str) -> Dict[str, Any]:
+    return {"id": sub.id, "status": status_code, "headers": {"content-type": "application/json"},
+            "body": {"detail": detail}}
+
+
+def _validate(sub: schemas.BatchSubRequest):
+    """Error response for a sub-request that must not be dispatched, else None."""
+    if sub.method.upper() not in ALLOWED_METHODS:
+        return _error(sub, status.HTTP_405_METHOD_NOT_ALLOWED, f"Method {sub.method} is not allowed in a batch.")
+    path = urlsplit(sub.path).path
+    if not path.startswith("/"):
+        return _error(sub, status.HTTP_400_BAD_REQUEST, "Sub-request paths must start with '/'.")
+    if path.rstrip("/") == "/batch":
+        return _error(sub, status.HTTP_400_BAD_REQUEST, "Batches cannot be nested.")
+    return None
+
+
+def _scope(parent: Dict[str, Any], sub: schemas.BatchSubRequest, body: bytes) -> Dict[str, Any]:
+    url = urlsplit(sub.path)
+    headers: List[Tuple[bytes, bytes]] = [(k, v) for k, v in parent["headers"] if k not in HOP_HEADERS]
+    if sub.headers:
+        overridden = {k.lower().encode("latin-1") for k in sub.headers}
+        headers = [(k, v) for k, v in headers if k not in overridden]
+        headers += [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in sub.headers.items()]
+    if body:
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    scope = {
+        "type": "http",
+        "asgi": parent.get("asgi", {"version": "3.0"}),
+        "http_version": parent.get("http_version", "1.1"),
+        "method": sub.method.upper(),
+        "scheme": parent.get("scheme", "http"),
+        "server": parent.get("server"),
+        "client": parent.get("client"),
+        "root_path": parent.get("root_path", ""),
+        "path": url.path,
+        "raw_path": url.path.encode(),
+        "query_string": url.query.encode(),
+        "headers": headers,
+    }
+    if "state" in parent:
+        scope["state"] = parent["state"]
+    return scope
+
+
+async def _dispatch(app, parent: Dict[str, Any], sub: schemas.BatchSubRequest) -> Dict[str, Any]:
+    body = json.dumps(sub.body).encode() if sub.body is not None else b""
+    response: Dict[str, Any] = {"status": 500, "headers": [], "chunks": []}
+    finished = asyncio.Event()
+    body_sent = False
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # Streaming responses listen for a disconnect; only report one once done
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = message.get("headers", [])
+        elif message["type"] == "http.response.body":
+            response["chunks"].append(message.get("body", b""))
+            if not message.get("more_body", False):
+                finished.set()
+
+    try:
+        await app(_scope(parent, sub, body), receive, send)
+    finally:
+        finished.set()
+
+    headers = {k.decode("latin-1"): v.decode("latin-1") for k, v in response["headers"]
+               if k.lower() != b"content-length"}
+    raw = b"".join(response["chunks"])
+    if not raw:
+        payload = None
+    elif headers.get("content-type", "").startswith("application/json"):
+        payload = json.loads(raw)
+    else:
+        payload = raw.decode("utf-8", errors="replace")
+    return {"id": sub.id, "status": response["status"], "headers": headers, "body": payload}
+
+
+@router.post("/batch", response_model=schemas.BatchResponse, status_code=status.HTTP_200_OK)
+async def run_batch(batch: schemas.BatchRequest, request: Request):
+    """
+    Runs up to BATCH_MAX_REQUESTS sub-requests and returns their responses in
+    request order, each with its own status. Consecutive GETs run
+    concurrently; writes run one at a time, in order. A failing sub-request
+    does not affect the others.
+    """
+    if not batch.requests:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="The batch is empty.")
+    if len(batch.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"A batch can hold at most {BATCH_MAX_REQUESTS} requests.",
+        )
+
+    app = request.app
+    parent = request.scope
+    limit = asyncio.Semaphore(max(1, BATCH_MAX_CONCURRENCY))
+    responses: List[Any] = [None] * len(batch.requests)
+
+    async def run_one(index: int, sub: schemas.BatchSubRequest):
+        async with limit:
+            try:
+                responses[index] = await _dispatch(app, parent, sub)
+            except Exception as exc:
+                responses[index] = _error(sub, status.HTTP_500_INTERNAL_SERVER_ERROR,
+                                          f"Sub-request failed: {type(exc).__name__}")
+
+    reads: List[Any] = []
+    for index, sub in enumerate(batch.requests):
+        invalid = _validate(sub)
+        if invalid is not None:
+            responses[index] = invalid
+        elif sub.method.upper() == "GET":
+            reads.append(run_one(index, sub))
+        else:
+            # A write waits for the reads listed before it, and runs alone
+            await asyncio.gather(*reads)
+            reads = []
+            await run_one(index, sub)
+    await asyncio.gather(*reads)
+    return {"responses": responses}
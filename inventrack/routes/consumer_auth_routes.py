@@ -5,10 +5,12 @@ from sqlalchemy.orm import Session
 from typing import Annotated
 from .. import schemas, models
 from ..dependencies import get_db
+from ..request_profiler import ProfiledRoute
 
 router = APIRouter(
     prefix="/consumer/auth",
-    tags=['Consumer Authentication']
+    tags=['Consumer Authentication'],
+    route_class=ProfiledRoute
 )
 
 DBDependency = Annotated[Session, Depends(get_db)]
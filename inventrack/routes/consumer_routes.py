@@ -0,0 +1,38 @@
+# File: routes/consumer_routes.py
+
+from fastapi import APIRouter, Query, status
+from inventrack import schemas
+from inventrack.availability_index import availability_index
+from inventrack.database import ReadSessionLocal
+from inventrack.product_catalog import product_catalog
+from inventrack.request_profiler import ProfiledRoute
+
+router = APIRouter(
+    prefix="/consumer",
+    tags=['Consumer'],
+    route_class=ProfiledRoute
+)
+
+@router.get(
+    "/availability",
+    response_model=schemas.AvailabilityResponse,
+    status_code=status.HTTP_200_OK
+)
+def get_product_availability(
+    product_id: str = Query(..., min_length=1),
+    city: str = Query(..., min_length=1),
+    limit: int = Query(50, ge=1, le=200),
+):
+    """
+    Shops in a city that have a product in stock, most stock first.
+    Answered from the in-memory availability index (city matched ignoring
+    case and spacing); no DB session is opened per request.
+    """
+    stores = availability_index.lookup(ReadSessionLocal, product_id, city, limit)
+    product = product_catalog.cached(product_id)
+    return {
+        "product_id": product_id,
+        "product_name": product.product_name if product else None,
+        "city": city,
+        "stores": stores,
+    }
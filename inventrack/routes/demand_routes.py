@@ -3,17 +3,20 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing import Annotated, List, Dict, Any
 from sqlalchemy.orm import Session
-from inventrack.dependencies import get_db
+from inventrack.dependencies import get_read_db, ValidStore
 from inventrack import schemas, models
 # Correctly import the mock utility function
 from .demand_forecast import create_mock_forecast 
+from ..request_profiler import ProfiledRoute
 
 router = APIRouter(
     prefix="/forecast",
-    tags=['Demand Forecasting (Dynamic)']
+    tags=['Demand Forecasting (Dynamic)'],
+    route_class=ProfiledRoute
 )
 
-DBDependency = Annotated[Session, Depends(get_db)]
+# Read-only router: served from a read replica when one is configured
+ReadDBDependency = Annotated[Session, Depends(get_read_db)]
 
 @router.post(
     "/demand", 
@@ -22,7 +25,8 @@ DBDependency = Annotated[Session, Depends(get_db)]
 )
 def get_demand_forecast_dynamic(
     request: schemas.DemandForecastRequest,
-    db: DBDependency
+    db: ReadDBDependency,
+    shop: ValidStore
 ):
     """
     DYNAMIC ENDPOINT: Triggers the ML prediction based on the specific 
@@ -33,12 +37,7 @@ def get_demand_forecast_dynamic(
     """
     
     # --- STEP 1: VERIFY CONTEXT (Required by the dynamic design) ---
-    shop = db.query(models.Shop).filter(models.Shop.store_id == request.store_id).first()
-    if not shop:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Store ID {request.store_id} not found."
-        )
+    # Done by the ValidStore dependency (404 for unknown stores)
 
     # --- STEP 2: MOCK RETURN (Using the corrected utility function) ---
     
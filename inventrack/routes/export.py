@@ -0,0 +1,160 @@
+# File: routes/export.py
+
+from fastapi import APIRouter, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
+from typing import Iterator, Optional
+from datetime import date
+import csv
+import io
+import zlib
+from sqlalchemy import select
+from inventrack.database import ReadSessionLocal
+from inventrack.sales_partitions import sales_rows
+from inventrack.request_profiler import ProfiledRoute
+
+# pyarrow is optional: without it the export falls back to gzip CSV.
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - depends on the deployment image
+    pa = None
+    pq = None
+
+router = APIRouter(
+    prefix="/export",
+    tags=['Data Export (ML Pipeline)'],
+    route_class=ProfiledRoute
+)
+
+EXPORT_COLUMNS = [
+    "Date", "Store_ID", "Product_ID", "Units_Sold", "Price", "Discount", "Weather_Competit_Seasonality",
+]
+
+MEDIA_TYPES = {
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "csv": ("application/gzip", "csv.gz"),
+}
+
+
+# --- 1. Row source: server-side cursor, fixed-size batches ---
+
+def _iter_batches(store_id: Optional[str], start: date, end: date, batch_size: int) -> Iterator[list]:
+    # Own session: the response body is produced after the endpoint returns
+    db = ReadSessionLocal(store_id)
+    try:
+        sales = sales_rows(db, start, end, [store_id] if store_id else None)
+        query = select(*[sales.c[name] for name in EXPORT_COLUMNS])
+        result = db.execute(query, execution_options={"stream_results": True, "yield_per": batch_size})
+        for batch in result.partitions(batch_size):
+            yield batch
+    finally:
+        db.close()
+
+
+# --- 2. Encoders ---
+
+def _arrow_schema():
+    return pa.schema([
+        ("Date", pa.date32()),
+        ("Store_ID", pa.string()),
+        ("Product_ID", pa.string()),
+        ("Units_Sold", pa.int32()),
+        ("Price", pa.decimal128(10, 2)),
+        ("Discount", pa.decimal128(5, 2)),
+        ("Weather_Competit_Seasonality", pa.string()),
+    ])
+
+
+def _to_record_batch(rows, schema):
+    columns = list(zip(*rows))
+    return pa.RecordBatch.from_arrays(
+        [pa.array(col, type=field.type) for col, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+def _drain(buffer: io.BytesIO) -> bytes:
+    chunk = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return chunk
+
+
+def _encode_arrow(batches) -> Iterator[bytes]:
+    schema = _arrow_schema()
+    buffer = io.BytesIO()
+    with pa.ipc.new_stream(buffer, schema) as writer:
+        for rows in batches:
+            writer.write_batch(_to_record_batch(rows, schema))
+            yield _drain(buffer)
+    yield _drain(buffer)  # end-of-stream marker
+
+
+def _encode_parquet(batches) -> Iterator[bytes]:
+    schema = _arrow_schema()
+    buffer = io.BytesIO()
+    with pq.ParquetWriter(buffer, schema, compression="zstd") as writer:
+        for rows in batches:
+            # One row group per batch keeps memory flat
+            writer.write_batch(_to_record_batch(rows, schema))
+            yield _drain(buffer)
+    yield _drain(buffer)  # footer
+
+
+def _encode_csv_gzip(batches) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    text = io.StringIO()
+    writer = csv.writer(text)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        writer.writerows(rows)
+        chunk = compressor.compress(text.getvalue().encode("utf-8"))
+        text.seek(0)
+        text.truncate()
+        if chunk:
+            yield chunk
+    yield compressor.compress(text.getvalue().encode("utf-8")) + compressor.flush()
+
+
+def stream_sales_export(fmt: str, store_id: Optional[str], start: date, end: date, batch_size: int) -> Iterator[bytes]:
+    """Yields the encoded export chunk by chunk; never holds more than one batch."""
+    batches = _iter_batches(store_id, start, end, batch_size)
+    if fmt == "arrow":
+        return _encode_arrow(batches)
+    if fmt == "parquet":
+        return _encode_parquet(batches)
+    return _encode_csv_gzip(batches)
+
+
+# --- 3. Endpoint ---
+
+@router.get("/sales", status_code=status.HTTP_200_OK)
+def export_sales(
+    from_date: date = Query(..., alias="from"),
+    to_date: date = Query(..., alias="to"),
+    store_id: Optional[str] = None,
+    format: Optional[str] = Query(None, pattern="^(arrow|parquet|csv)$"),
+    batch_size: int = Query(50_000, ge=1_000, le=500_000),
+):
+    """
+    Streams SalesData rows for [from, to] (optionally one store) for the
+    offline ML models. Default format is Arrow IPC when pyarrow is
+    installed, gzip CSV otherwise.
+    """
+    if from_date > to_date:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="'from' must not be after 'to'.")
+
+    fmt = format or ("arrow" if pa is not None else "csv")
+    if fmt in ("arrow", "parquet") and pa is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Format '{fmt}' needs pyarrow, which is not installed. Use format=csv.")
+
+    media_type, extension = MEDIA_TYPES[fmt]
+    filename = f"sales_{store_id or 'all'}_{from_date.isoformat()}_{to_date.isoformat()}.{extension}"
+    return StreamingResponse(
+        stream_sales_export(fmt, store_id, from_date, to_date, batch_size),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,118 @@
+# File: routes/internal.py
+
+from fastapi import APIRouter, HTTPException, Query, Response, status
+from typing import Dict, Any, List, Literal, Optional
+from inventrack import database, slow_query_log, request_profiler
+from inventrack.admission import admission_controller
+from inventrack.availability_index import availability_index
+from inventrack.inventory_cache import inventory_cache
+from inventrack.product_catalog import product_catalog
+from inventrack.product_search import product_search
+from inventrack.shop_registry import shop_registry
+
+# Operational endpoints (cache counters etc.). Not used by the Flutter app.
+router = APIRouter(
+    prefix="/internal",
+    tags=['Internal Diagnostics']
+)
+
+@router.get("/inventory-cache", response_model=Dict[str, Any], status_code=status.HTTP_200_OK)
+def get_inventory_cache_stats():
+    """
+    Hit-rate, size and eviction counters of the per-store inventory listing cache.
+    """
+    return inventory_cache.stats()
+
+@router.get("/product-catalog", response_model=Dict[str, Any], status_code=status.HTTP_200_OK)
+def get_product_catalog_stats():
+    """
+    Size and hit/miss counters of the in-memory product master cache, plus
+    the size and query counters of the product search index built on it.
+    """
+    return {**product_catalog.stats(), "search_index": product_search.stats()}
+
+@router.get("/shop-registry", response_model=Dict[str, Any], status_code=status.HTTP_200_OK)
+def get_shop_registry_stats():
+    """
+    Size and hit / negative-hit / miss counters of the shop registry behind ValidStore.
+    """
+    return shop_registry.stats()
+
+@router.get("/availability-index", response_model=Dict[str, Any], status_code=status.HTTP_200_OK)
+def get_availability_index_stats():
+    """
+    Size, age and query / update / rebuild counters of the consumer availability index.
+    """
+    return availability_index.stats()
+
+@router.get("/slow-queries", response_model=Dict[str, Any], status_code=status.HTTP_200_OK)
+def get_slow_queries(limit: int = Query(100, ge=0, le=1000)):
+    """
+    Most recent statements slower than SLOW_QUERY_THRESHOLD_MS (newest first)
+    and per-fingerprint totals, slowest in total first (SLOW_QUERY_LOG=1).
+    """
+    if not slow_query_log.enabled():
+        return {"enabled": False}
+    return slow_query_log.slow_query_log.snapshot(limit)
+
+@router.get("/profiles", response_model=Dict[str, Any], status_code=status.HTTP_200_OK)
+def list_profiles():
+    """
+    Stored request profiles, newest first (REQUEST_PROFILING=1). Profile a
+    request by sending `X-Profile: <REQUEST_PROFILING_TOKEN>`; its response
+    carries the `X-Profile-Id` to look up here.
+    """
+    if not request_profiler.enabled():
+        return {"enabled": False}
+    return {"enabled": True, **request_profiler.profile_store.stats(),
+            "profiles": request_profiler.profile_store.summaries()}
+
+@router.get("/profiles/top", response_model=Dict[str, Any], status_code=status.HTTP_200_OK)
+def get_top_functions(
+    sort: Literal["tottime", "cumulative", "calls"] = "tottime",
+    limit: int = Query(30, ge=1, le=500),
+    endpoint: Optional[str] = None,
+):
+    """
+    Functions with the most time across the stored profiles, optionally only
+    those of one endpoint (e.g. `POST /inventory/{store_id}/upload_csv`).
+    """
+    return request_profiler.profile_store.top(sort, limit, endpoint)
+
+@router.get("/profiles/{profile_id}", status_code=status.HTTP_200_OK)
+def get_profile(
+    profile_id: str,
+    sort: Literal["tottime", "cumulative", "calls"] = "cumulative",
+    limit: int = Query(40, ge=1, le=500),
+    raw: bool = False,
+):
+    """
+    pstats report of one profiled request; with raw=true, the profile as a
+    .prof file (`python -m pstats`, snakeviz).
+    """
+    if raw:
+        data = request_profiler.profile_store.raw(profile_id)
+    else:
+        data = request_profiler.profile_store.report(profile_id, sort, limit)
+    if data is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Profile {profile_id} not found.")
+    if raw:
+        return Response(content=data, media_type="application/octet-stream",
+                        headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'})
+    return data
+
+@router.get("/read-replicas", response_model=List[Dict[str, Any]], status_code=status.HTTP_200_OK)
+def get_read_replica_status():
+    """
+    Health and usage of the configured read replicas (empty when none are set).
+    """
+    return database.replica_status()
+
+@router.get("/admission", response_model=Dict[str, Any], status_code=status.HTTP_200_OK)
+async def get_admission_stats():
+    """
+    In-flight, queue depth and admitted / queued / shed counters per request
+    class of the admission controller (ADMISSION_CONTROL=1). Runs on the
+    event loop, which owns the controller state.
+    """
+    return admission_controller.stats()
@@ -1,30 +1,43 @@
 # File: inventrack/routes/inventory.py
 
-from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile, status
 from sqlalchemy.orm import Session
-from typing import Annotated, List, Any 
+from typing import Annotated, List, Any, Optional
+from datetime import datetime, timedelta
 from inventrack import models, schemas
-from inventrack.dependencies import get_db 
+from inventrack import database, sales_sync, stock_ledger
+from inventrack.dependencies import get_db, get_read_db, ValidStore
+from inventrack.inventory_cache import inventory_cache
+from inventrack.availability_index import availability_index
+from inventrack.product_catalog import product_catalog, snapshot_of
+from inventrack.product_search import product_search, normalize
+from inventrack.request_profiler import ProfiledRoute
 import uuid
 
 # Imports for CSV processing
 import csv
 import io
 
-router = APIRouter(prefix="/inventory", tags=["Inventory"])
+router = APIRouter(prefix="/inventory", tags=["Inventory"], route_class=ProfiledRoute)
 DBDependency = Annotated[Session, Depends(get_db)]
+ReadDBDependency = Annotated[Session, Depends(get_read_db)]
 
 @router.get(
     "/{store_id}/products", 
     status_code=status.HTTP_200_OK,
     response_model=List[schemas.InventoryProduct] 
 )
-def get_products_by_shop(store_id: str, db: DBDependency): 
+def get_products_by_shop(store_id: str, db: ReadDBDependency): 
     """
     Gets all products for a specific shop by joining the
     inventory and products tables.
+    Served from the per-store listing cache; the write paths keep it fresh.
     """
-    
+    body = inventory_cache.get_listing(store_id, lambda: _load_store_listing(db, store_id))
+    return Response(content=body, media_type="application/json")
+
+
+def _load_store_listing(db: Session, store_id: str) -> List[dict]:
     products_with_stock = db.query(
         models.Product, 
         models.Inventory.stock_quantity
@@ -37,18 +50,74 @@ def get_products_by_shop(store_id: str, db: DBDependency):
 
     results = []
     for product, stock in products_with_stock:
-        results.append({
-            "id": product.id,
-            "name": product.product_name, # Mapped to "name" for Flutter
-            "category": product.category,
-            "subcategory": product.subcategory,
-            "mrp": float(product.mrp),    # FIX: Convert Decimal to float to prevent 500 Error
-            "msp": float(product.msp),    # FIX: Convert Decimal to float to prevent 500 Error
-            "qty": stock                  # Mapped to "qty" for Flutter
-        })
+        row = schemas.InventoryProduct(
+            id=product.id,
+            name=product.product_name, # Mapped to "name" for Flutter
+            category=product.category,
+            subcategory=product.subcategory,
+            mrp=float(product.mrp) if product.mrp is not None else None,    # FIX: Convert Decimal to float to prevent 500 Error
+            msp=float(product.msp) if product.msp is not None else None,    # FIX: Convert Decimal to float to prevent 500 Error
+            qty=stock                  # Mapped to "qty" for Flutter
+        )
+        # Cached in the exact shape response_model would have produced
+        results.append(row.model_dump(by_alias=True))
 
     return results
 
+def _local_naive(moment: datetime) -> datetime:
+    """Ledger times are naive server-local (datetime.now()); convert aware query values to that."""
+    return moment.astimezone().replace(tzinfo=None) if moment.tzinfo is not None else moment
+
+
+@router.get("/{store_id}/stock-at", response_model=schemas.StockAtResponse)
+def get_stock_at(
+    store_id: str,
+    db: ReadDBDependency,
+    shop: ValidStore,
+    at: Optional[datetime] = None,
+    product_id: Optional[str] = None,
+):
+    """
+    A shop's stock as of `at` (default: now), optionally for one product.
+    Answered from the newest stock snapshot taken before `at` plus the stock
+    ledger after it. Products the ledger has no record of by then are omitted.
+    """
+    at = _local_naive(at) if at is not None else datetime.now()
+    result = stock_ledger.stock_at(db, store_id, at, product_id)
+    return {
+        "store_id": store_id,
+        "at": at,
+        "snapshot_id": result["snapshot_id"],
+        "snapshot_taken_at": result["snapshot_taken_at"],
+        "movements_replayed": result["movements_replayed"],
+        "stock": [{"product_id": pid, "qty": qty} for pid, qty in sorted(result["quantities"].items())],
+    }
+
+
+@router.get("/{store_id}/movements", response_model=schemas.StockMovementsResponse)
+def get_stock_movements(
+    store_id: str,
+    db: ReadDBDependency,
+    shop: ValidStore,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    product_id: Optional[str] = None,
+    limit: int = Query(500, ge=0, le=5000),
+):
+    """
+    Stock movements of a shop in (since, until] (default: the last 24 hours):
+    per product the opening and closing quantity, units received and removed
+    and the net change by source (sale, sync, adjust, upload, create, ...),
+    plus the first `limit` movements themselves.
+    """
+    until = _local_naive(until) if until is not None else datetime.now()
+    since = _local_naive(since) if since is not None else until - timedelta(days=1)
+    if since >= until:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="since must be before until.")
+    report = stock_ledger.movement_report(db, store_id, since, until, product_id, limit)
+    return {"store_id": store_id, "since": since, "until": until, **report}
+
+
 @router.patch("/{store_id}/{product_id}", status_code=status.HTTP_200_OK)
 def update_product_details(
     store_id: str, 
@@ -59,7 +128,7 @@ def update_product_details(
     """
     API 2: Updates a product's details (name, category, mrp, msp, etc.)
     in the master 'products' table AND updates its 'stock_quantity'
-    in the 'inventory' table.
+    in the 'inventory' table (recorded in the stock ledger as an adjustment).
     """
     
     product = db.query(models.Product).filter(models.Product.id == product_id).first()
@@ -67,14 +136,23 @@ def update_product_details(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Product with id {product_id} not found")
 
-    inventory_item = db.query(models.Inventory).filter(
+    inventory_query = db.query(models.Inventory).filter(
         models.Inventory.store_id == store_id,
         models.Inventory.product_id == product_id
-    ).first()
+    )
+    if request.stock_quantity is not None:
+        # LOCK the row so the ledger delta is against the quantity being replaced
+        inventory_query = inventory_query.with_for_update()
+    inventory_item = inventory_query.first()
     if not inventory_item:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail=f"Product not found in this shop's inventory")
 
+    product_changed = any(
+        value is not None
+        for value in (request.product_name, request.category, request.subcategory, request.mrp, request.msp)
+    )
+
     if request.product_name is not None:
         product.product_name = request.product_name
     if request.category is not None:
@@ -87,31 +165,59 @@ def update_product_details(
         product.msp = request.msp
 
     if request.stock_quantity is not None:
+        stock_ledger.record(db, [stock_ledger.movement(
+            store_id, product_id, stock_ledger.ADJUST,
+            request.stock_quantity - inventory_item.stock_quantity, request.stock_quantity,
+        )])
         inventory_item.stock_quantity = request.stock_quantity
 
-    db.commit()
+    # Versioned while the inventory row is still locked (see inventory_cache)
+    cache_version = inventory_cache.begin_write(store_id) if request.stock_quantity is not None else None
+    try:
+        db.commit()
+    except Exception:
+        if cache_version is not None:
+            inventory_cache.abort_write(store_id, cache_version)
+        raise
+    database.note_write(store_id)
+
+    if product_changed:
+        product_catalog.upsert(product)
+        inventory_cache.invalidate_product(product_id)
+        if cache_version is not None:
+            inventory_cache.abort_write(store_id, cache_version)  # releases the version; listing already dropped
+    elif cache_version is not None:
+        inventory_cache.patch_stock(store_id, {product_id: request.stock_quantity}, cache_version)
+    if request.stock_quantity is not None:
+        availability_index.update_stock(store_id, {product_id: request.stock_quantity}, cache_version)
 
     return {"message": "Product details updated successfully"}
 
 
 # --- NEW: Smart CSV Upload Endpoint ---
 @router.post("/{store_id}/upload_csv")
-async def upload_inventory_csv(store_id: str, db: DBDependency, file: UploadFile = File(...)):
+def upload_inventory_csv(
+    store_id: str,
+    db: DBDependency,
+    shop: ValidStore,
+    file: UploadFile = File(...),
+    normalized_match: bool = False,
+):
     """
     Uploads a CSV to bulk-update inventory.
     - If product name exists, it ADDS to the stock.
     - If product name does not exist, it CREATES a new product and inventory item.
+    - With normalized_match=true, names are compared ignoring case, spacing
+      and punctuation ("Amul  Milk-1L" matches "amul milk 1l").
     
     Required CSV columns: product_name, category, mrp, msp, stock_quantity
     """
-    # 1. Check if the shop exists
-    shop = db.query(models.Shop).filter(models.Shop.store_id == store_id).first()
-    if not shop:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
-                            detail=f"Shop with id {store_id} not found")
+    # 1. The shop was verified by the ValidStore dependency (shop registry).
+    # A plain def: FastAPI runs it in the threadpool, so the file read and the
+    # row locks below never block the event loop.
 
     # 2. Read the CSV file
-    contents = await file.read()
+    contents = file.file.read()
     file_data = io.StringIO(contents.decode('utf-8'))
     
     # Use DictReader to read CSV as dictionaries (header row is key)
@@ -119,8 +225,14 @@ async def upload_inventory_csv(store_id: str, db: DBDependency, file: UploadFile
     
     updated_items = 0
     created_items = 0
+    upload_id = stock_ledger.new_upload_id()
+    movements = []
 
-    # 3. Process each row in the CSV
+    # 3. Parse the rows and check which products exist in the master 'products'
+    # table before taking any row lock. The names are read from the DB in this
+    # transaction (one query): the in-memory catalog may be behind renames and
+    # products created by other workers.
+    csv_rows = []
     for row in csv_reader:
         try:
             # Get data from the row, case-insensitive and stripping whitespace
@@ -129,22 +241,53 @@ async def upload_inventory_csv(store_id: str, db: DBDependency, file: UploadFile
         except (ValueError, KeyError, TypeError):
             # Skip bad rows (e.g., missing product_name or bad stock number)
             continue 
+        csv_rows.append((row, product_name, stock_from_csv))
+
+    products_by_name = product_catalog.fresh_by_name(db, {name for _, name, _ in csv_rows})
+    if normalized_match:
+        # Search-index candidates, confirmed against their current names
+        candidates = {}
+        for _, product_name, _ in csv_rows:
+            candidate = None if product_name in products_by_name else product_search.find_by_normalized_name(product_name)
+            if candidate:
+                candidates[product_name] = candidate.id
+        current = product_catalog.fresh(db, set(candidates.values()))
+        for product_name, product_id in candidates.items():
+            product = current.get(product_id)
+            if product and normalize(product.product_name) == normalize(product_name):
+                products_by_name[product_name] = product
+
+    parsed_rows = []
+    for row, product_name, stock_from_csv in csv_rows:
+        name_key = normalize(product_name) if normalized_match else product_name
+        parsed_rows.append((row, product_name, stock_from_csv, name_key, products_by_name.get(product_name)))
+
+    # Only the inventory rows of the products in the file, locked in product
+    # order (as offline sync does), so sales committed meanwhile are not
+    # overwritten by the additions and the rest of the store keeps selling
+    store_inventory = sales_sync.lock_inventory(
+        db, store_id, {product.id for *_, product in parsed_rows if product}
+    )
+    # Products created by earlier rows of this same file (not yet committed)
+    new_products = {}
 
-        # 4. Check if product exists in the master 'products' table
-        product = db.query(models.Product).filter(models.Product.product_name == product_name).first()
+    # 4. Process each row in the CSV
+    for row, product_name, stock_from_csv, name_key, product in parsed_rows:
+        product = new_products.get(name_key) or product
 
         if product:
             # --- LOGIC A: PRODUCT EXISTS ---
             
             # Now check if it's in this shop's inventory
-            inventory_item = db.query(models.Inventory).filter(
-                models.Inventory.store_id == store_id,
-                models.Inventory.product_id == product.id
-            ).first()
+            inventory_item = store_inventory.get(product.id)
 
             if inventory_item:
                 # --- A1: Exists in this shop -> ADD stock ---
                 inventory_item.stock_quantity += stock_from_csv # This is the "add" logic
+                movements.append(stock_ledger.movement(
+                    store_id, product.id, stock_ledger.UPLOAD, stock_from_csv, inventory_item.stock_quantity,
+                    reference=upload_id,
+                ))
                 updated_items += 1
             else:
                 # --- A2: Exists in master list, but not in this shop -> CREATE inventory item ---
@@ -154,6 +297,10 @@ async def upload_inventory_csv(store_id: str, db: DBDependency, file: UploadFile
                     stock_quantity=stock_from_csv
                 )
                 db.add(new_inventory_item)
+                store_inventory[product.id] = new_inventory_item
+                movements.append(stock_ledger.movement(
+                    store_id, product.id, stock_ledger.UPLOAD, stock_from_csv, stock_from_csv, reference=upload_id,
+                ))
                 created_items += 1
         
         else:
@@ -180,6 +327,7 @@ async def upload_inventory_csv(store_id: str, db: DBDependency, file: UploadFile
                 msp=msp
             )
             db.add(new_product)
+            new_products[name_key] = new_product
             
             # B2: Create new inventory item in 'inventory' table
             new_inventory_item = models.Inventory(
@@ -188,14 +336,36 @@ async def upload_inventory_csv(store_id: str, db: DBDependency, file: UploadFile
                 stock_quantity=stock_from_csv
             )
             db.add(new_inventory_item)
+            store_inventory[new_product_id] = new_inventory_item
+            movements.append(stock_ledger.movement(
+                store_id, new_product_id, stock_ledger.UPLOAD, stock_from_csv, stock_from_csv, reference=upload_id,
+            ))
             created_items += 1
 
-    # 4. Save all changes to the database
-    db.commit()
+    # 5. Save all changes to the database
+    # (snapshot first: reading attributes after commit would reload each row)
+    new_snapshots = [snapshot_of(p) for p in new_products.values()]
+    new_quantities = {pid: item.stock_quantity for pid, item in store_inventory.items()}
+    db.flush()  # products and inventory rows before the ledger rows that reference them
+    stock_ledger.record(db, movements)
+    # Versioned while the inventory rows are still locked (see inventory_cache)
+    cache_version = inventory_cache.begin_write(store_id)
+    try:
+        db.commit()
+    except Exception:
+        inventory_cache.abort_write(store_id, cache_version)
+        raise
+    database.note_write(store_id)
+    for snapshot in new_snapshots:
+        product_catalog.upsert(snapshot)
+    # Drops the listing instead when the file added products to the store
+    inventory_cache.patch_stock(store_id, new_quantities, cache_version)
+    availability_index.update_stock(store_id, new_quantities, cache_version)
 
     return {
         "message": "Inventory upload complete.",
         "shop_id": store_id,
+        "upload_id": upload_id,
         "new_products_created": created_items,
         "existing_products_updated": updated_items
     }
\ No newline at end of file
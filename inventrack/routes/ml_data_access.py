@@ -1,9 +1,14 @@
 # File: routes/ml_data_access.py
 
-from fastapi import APIRouter, HTTPException, status
-from typing import List, Dict, Any, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import Annotated, List, Dict, Any, Optional, Union
 import json
 from pathlib import Path
+from inventrack import recommendations
+from inventrack.dependencies import get_read_db
+from inventrack.product_catalog import product_catalog
+from inventrack.request_profiler import ProfiledRoute
 
 # --- Correct base path ---
 BASE_DIR = Path(__file__).resolve().parent.parent  # go up to 'inventrack'
@@ -12,9 +17,12 @@ RESTOCK_FILE = BASE_DIR / "analytics_output.txt"
 
 router = APIRouter(
     prefix="/ml-data",
-    tags=['External ML Outputs']
+    tags=['External ML Outputs'],
+    route_class=ProfiledRoute
 )
 
+ReadDBDependency = Annotated[Session, Depends(get_read_db)]
+
 # --- Endpoint 1: Product Recommendations ---
 @router.get(
     "/recommendations",
@@ -41,6 +49,35 @@ def get_product_recommendations():
             detail=f"Error reading or processing {RECOMMENDATION_FILE}: {str(e)}"
         )
 
+# --- Endpoint 1b: Frequently Bought Together (live basket model) ---
+@router.get(
+    "/recommendations/{product_id}",
+    response_model=Dict[str, Any],
+    status_code=status.HTTP_200_OK
+)
+def get_frequently_bought_together(
+    product_id: str,
+    db: ReadDBDependency,
+    store_id: Optional[str] = None,
+    k: int = Query(10, ge=1, le=50),
+):
+    """
+    Products most often bought in the same bill as `product_id`, for one
+    store or (without store_id) across all stores. Served from the in-memory
+    co-occurrence model built from stored baskets.
+    """
+    recommendations.maybe_reload_snapshot()
+    items = recommendations.cooccurrence.top(product_id, store_id, k)
+    for item in items:
+        product = product_catalog.get(db, item["product_id"])
+        item["product_name"] = product.product_name if product else None
+
+    return {
+        "product_id": product_id,
+        "store_id": store_id,
+        "frequently_bought_together": items,
+    }
+
 # --- Endpoint 2: Restock Recommendations ---
 @router.get(
     "/restock-status",
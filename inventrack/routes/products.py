@@ -1,22 +1,31 @@
 # File: inventrack/routes/products.py
 
-from fastapi import APIRouter, HTTPException, status, Depends
+from fastapi import APIRouter, HTTPException, status, Depends, Query
 from sqlalchemy.orm import Session
-from typing import Annotated, List 
+from typing import Annotated, List, Optional
 import uuid
 
 # Note: Using relative imports (from .. import x) is usually cleaner than absolute imports
 # (from inventrack import x) when inside the package, but we'll use your current style.
 from inventrack import schemas, models
-from inventrack.dependencies import get_db
+from inventrack import database, stock_ledger
+from inventrack.dependencies import get_db, get_read_db
+from inventrack.inventory_cache import inventory_cache
+from inventrack.availability_index import availability_index
+from inventrack.product_catalog import product_catalog
+from inventrack.product_search import product_search
+from inventrack.request_profiler import ProfiledRoute
+from inventrack.routes.inventory import _load_store_listing
 
 # Set the prefix and tags for this router
 router = APIRouter(
     prefix="/products",
-    tags=["Products"]
+    tags=["Products"],
+    route_class=ProfiledRoute
 )
 
 DBDependency = Annotated[Session, Depends(get_db)]
+ReadDBDependency = Annotated[Session, Depends(get_read_db)]
 
 # --- NEW ENDPOINT: Get All Products (No Filter) ---
 # FIX: Define the function as a FastAPI GET endpoint
@@ -25,7 +34,7 @@ DBDependency = Annotated[Session, Depends(get_db)]
     response_model=List[schemas.Product], 
     status_code=status.HTTP_200_OK,
 )
-def get_all_products(db: DBDependency): 
+def get_all_products(db: ReadDBDependency): 
     """
     Retrieves a complete list of all products from the master 'products' table.
     """
@@ -37,6 +46,43 @@ def get_all_products(db: DBDependency):
     return all_products
 
 
+@router.get(
+    "/search",
+    response_model=List[schemas.ProductSearchResult],
+    status_code=status.HTTP_200_OK,
+)
+def search_products(
+    db: ReadDBDependency,
+    q: str = Query(..., min_length=1, max_length=100),
+    store_id: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    Ranked product search over name, category and subcategory (prefix and
+    typo tolerant) from the in-memory search index. With store_id, only
+    products stocked by that shop are returned, with their quantity, taken
+    from the shop's cached inventory listing (no Inventory query per keystroke).
+    """
+    stock = None
+    if store_id is not None:
+        stock = inventory_cache.get_stock(store_id, lambda: _load_store_listing(db, store_id))
+
+    hits = product_search.search(q, limit, allowed_ids=stock.keys() if stock is not None else None)
+    return [
+        schemas.ProductSearchResult(
+            product_id=product.id,
+            product_name=product.product_name,
+            category=product.category,
+            subcategory=product.subcategory,
+            mrp=product.mrp,
+            msp=product.msp,
+            qty=stock.get(product.id) if stock is not None else None,
+            score=round(score, 3),
+        )
+        for product, score in hits
+    ]
+
+
 @router.post(
     "/{store_id}/",
     response_model=schemas.Product, 
@@ -52,11 +98,11 @@ def create_product(
     adds it to the specified shop's 'inventory' table.
     """
     
-    db_product = db.query(models.Product).filter(
-        models.Product.product_name == product.product_name
-    ).first()
+    # Checked against the DB in the insert's transaction: the catalog cache may
+    # be behind renames and products created by other workers
+    existing_product = product_catalog.fresh_by_name(db, [product.product_name]).get(product.product_name)
     
-    if db_product:
+    if existing_product:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail=f"Product with name '{product.product_name}' already exists."
@@ -78,6 +124,7 @@ def create_product(
     db.add(db_product)
     db.commit()
     db.refresh(db_product)
+    product_catalog.upsert(db_product)
 
     # 2. ACTION 2: Add the new product to the shop's 'inventory' table
     new_inventory_item = models.Inventory(
@@ -86,6 +133,12 @@ def create_product(
         stock_quantity=product.stock_quantity
     )
     db.add(new_inventory_item)
+    stock_ledger.record(db, [stock_ledger.movement(
+        store_id, new_product_id, stock_ledger.CREATE, product.stock_quantity, product.stock_quantity
+    )])
     db.commit()
+    database.note_write(store_id)
+    inventory_cache.invalidate(store_id)
+    availability_index.update_stock(store_id, {new_product_id: product.stock_quantity})
     
     return db_product
\ No newline at end of file
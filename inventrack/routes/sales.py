@@ -1,43 +1,64 @@
 # File: routes/sales.py
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, File, HTTPException, UploadFile, status
 from sqlalchemy.orm import Session
-from typing import Annotated, List, Dict, Any
-from datetime import date # To get the current date for SalesData
-from .. import schemas, models
-from ..dependencies import get_db 
+from typing import Annotated, List, Dict, Any, Optional
+from datetime import date, datetime, timedelta # To get the current date for SalesData
+import os
+import shutil
+import uuid
+from .. import schemas, models, sales_buffer, sales_partitions, database, baskets, sales_import, sales_sync, stock_ledger
+from ..dependencies import get_db, ValidStore
+from ..inventory_cache import inventory_cache
+from ..availability_index import availability_index
+from ..product_catalog import product_catalog
+from ..recommendations import cooccurrence
+from ..shop_registry import shop_registry
+from ..request_profiler import ProfiledRoute
+import logging
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/sales",
-    tags=['Sales & Transactions']
+    tags=['Sales & Transactions'],
+    route_class=ProfiledRoute
 )
 
 DBDependency = Annotated[Session, Depends(get_db)]
 
 @router.post("/process_bill", status_code=status.HTTP_200_OK)
-def process_sale_transaction(request: schemas.ProcessSale, db: DBDependency): 
+def process_sale_transaction(request: schemas.ProcessSale, db: DBDependency, shop: ValidStore): 
     """
     Processes a completed bill/sale:
     1. Checks inventory for stock availability.
-    2. Reduces stock quantity for each item in the Inventory table.
-    3. Creates a record in the SalesData table (Future-proofing/optional).
+    2. Reduces stock quantity for each item in the Inventory table and
+       records each change in the stock ledger.
+    3. Creates a record in the SalesData table (Future-proofing/optional)
+       and stores the bill itself as a basket (Bills / BillItems).
+       In write-behind mode (SALES_WRITE_BEHIND=1) the SalesData rows and the
+       basket are handed to the local sales buffer after the inventory commit instead.
+    4. Feeds the basket to the in-memory co-occurrence model.
     """
     
-    # 1. Verify the store exists (optional but good practice)
-    shop = db.query(models.Shop).filter(models.Shop.store_id == request.store_id).first()
-    if not shop:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Store with ID {request.store_id} not found."
-        )
+    # 1. The store was verified by the ValidStore dependency (shop registry)
 
     # List to track sales data records created
     sales_records = [] 
+    write_behind = sales_buffer.get_buffer()
+    new_quantities = {}
+    movements = []
+    bill_id = baskets.new_bill_id()
     
     # --- Start Transaction ---
     # We will process all items, if any check fails, we rollback everything.
     
     try:
+        # Product details (the MSP recorded as the price) read in this
+        # transaction, in one query: the catalog cache may be behind an MSP
+        # change made by another worker.
+        product_details_by_id = product_catalog.fresh(db, {item.product_id for item in request.items})
+
         for item in request.items:
             # 2. Check and reduce Inventory
             inventory_item = db.query(models.Inventory).filter(
@@ -59,34 +80,56 @@ def process_sale_transaction(request: schemas.ProcessSale, db: DBDependency):
             
             # --- ACTION: Reduce Stock ---
             inventory_item.stock_quantity -= item.quantity_sold
+            new_quantities[item.product_id] = inventory_item.stock_quantity
+            movements.append(stock_ledger.movement(
+                request.store_id, item.product_id, stock_ledger.SALE, -item.quantity_sold,
+                inventory_item.stock_quantity, reference=bill_id,
+            ))
             
             # 3. Create SalesData Record (using your existing model)
-            # Fetch product details needed for SalesData (like price)
-            product_details = db.query(models.Product).filter(
-                models.Product.id == item.product_id
-            ).first()
+            product_details = product_details_by_id.get(item.product_id)
             
             if product_details:
                 # Assuming the price recorded is the MSP for simplicity
-                new_sale_record = models.SalesData(
-                    date=date.today(),
-                    store_id=request.store_id,
-                    product_id=item.product_id,
-                    units_sold=item.quantity_sold,
-                    MSP=product_details.msp, # Using MSP from the product master
-                    discount=0.00, 
-                )
-                db.add(new_sale_record)
-                sales_records.append(new_sale_record)
+                sales_records.append({
+                    "product_id": item.product_id,
+                    "units_sold": item.quantity_sold,
+                    "price": product_details.msp, # Using MSP from the product master
+                    "discount": 0.00,
+                })
 
-        # 4. Commit all changes (Inventory updates and SalesData insertions)
-        db.commit()
+        stock_ledger.record(db, movements)
+        if write_behind is None:
+            sales_partitions.insert_sales_rows(db, [
+                {"date": date.today(), "store_id": request.store_id, **record} for record in sales_records
+            ])
+            baskets.insert_bills(db, [baskets.bill_entry(
+                bill_id, request.store_id, request.user_id, request.total_amount, date.today(),
+                baskets.basket_lines(sales_records),
+            )])
+
+        # 4. Commit all changes (Inventory updates and SalesData insertions).
+        # The cache version is taken while the inventory rows are still locked.
+        cache_version = inventory_cache.begin_write(request.store_id)
+        try:
+            db.commit()
+        except Exception:
+            inventory_cache.abort_write(request.store_id, cache_version)
+            raise
+        inventory_cache.patch_stock(request.store_id, new_quantities, cache_version)
+        database.note_write(request.store_id)
+        availability_index.update_stock(request.store_id, new_quantities, cache_version)
+
+        if write_behind is not None and sales_records:
+            _buffer_sales_history(db, write_behind, request, bill_id, sales_records)
+        cooccurrence.add_basket(request.store_id, [record["product_id"] for record in sales_records])
 
         return {
             "message": "Sale successfully processed and inventory updated.",
             "total_items_sold": len(request.items),
             "store_id": request.store_id,
-            "total_amount": request.total_amount
+            "total_amount": request.total_amount,
+            "bill_id": bill_id
         }
         
     except HTTPException as e:
@@ -97,4 +140,141 @@ def process_sale_transaction(request: schemas.ProcessSale, db: DBDependency):
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"An unexpected error occurred during transaction: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+def _buffer_sales_history(db: Session, write_behind, request: schemas.ProcessSale, bill_id: str,
+                          sales_records: List[Dict[str, Any]]):
+    """Hands the committed bill's history lines and basket to the write-behind buffer."""
+    store_id = request.store_id
+    entry = {
+        "store_id": store_id, "date": date.today().isoformat(), "lines": sales_records,
+        "bill_id": bill_id, "user_id": request.user_id, "total_amount": request.total_amount,
+    }
+    try:
+        write_behind.append(entry)
+    except Exception:
+        # Stock is already committed; never lose the history row, write it directly.
+        logger.exception("Sales buffer append failed; writing history rows directly.")
+        sales_partitions.insert_sales_rows(db, [
+            {"date": date.today(), "store_id": store_id, **record} for record in sales_records
+        ])
+        baskets.insert_bills(db, [baskets.bill_entry(
+            bill_id, store_id, request.user_id, request.total_amount, date.today(),
+            baskets.basket_lines(sales_records),
+        )])
+        db.commit()
+
+
+SALES_SYNC_MAX_BILLS = int(os.getenv("SALES_SYNC_MAX_BILLS", "1000"))
+
+
+@router.post("/sync", response_model=schemas.SalesSyncResponse, status_code=status.HTTP_200_OK)
+def sync_offline_bills(request: schemas.SalesSyncRequest, db: DBDependency, shop: ValidStore):
+    """
+    Applies bills queued by a POS that was offline, in one transaction:
+    stock is locked once per product, each bill keeps its client timestamp
+    as its sales date, and each bill is accepted or rejected on its own
+    (e.g. insufficient stock). Re-sending bills that were already synced is
+    safe: their bill_id is reported as a duplicate and not applied again.
+    """
+    if len(request.bills) > SALES_SYNC_MAX_BILLS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {SALES_SYNC_MAX_BILLS} bills per sync; send the rest in another request."
+        )
+    try:
+        outcome = sales_sync.sync_bills(db, request.store_id, request.bills)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"An unexpected error occurred during sync: {str(e)}"
+        )
+
+    if outcome.new_quantities:
+        database.note_write(request.store_id)
+        inventory_cache.patch_stock(request.store_id, outcome.new_quantities, outcome.cache_version)
+        availability_index.update_stock(request.store_id, outcome.new_quantities, outcome.cache_version)
+    for product_ids in outcome.accepted_baskets:
+        cooccurrence.add_basket(request.store_id, product_ids)
+
+    return {
+        "store_id": request.store_id,
+        "accepted": outcome.count(sales_sync.ACCEPTED),
+        "duplicates": outcome.count(sales_sync.DUPLICATE),
+        "rejected": outcome.count(sales_sync.REJECTED),
+        "results": outcome.results,
+    }
+
+
+@router.post("/import", status_code=status.HTTP_202_ACCEPTED)
+def import_sales_history(
+    db: DBDependency,
+    file: UploadFile = File(...),
+    store_id: Optional[str] = None,
+    job_id: Optional[str] = None,
+    date_format: Optional[str] = None,
+):
+    """
+    Bulk-imports historical sales from a CSV export into SalesData as a
+    background job (see inventrack/sales_import.py for the columns).
+    - store_id: import every row into this store (the file then needs no Store_ID column).
+    - job_id: re-upload the same file with the job_id of a failed job to
+      resume after its last committed batch.
+    Poll GET /sales/import/{job_id} for progress.
+    Sync on purpose: FastAPI runs it in the threadpool, off the event loop,
+    since the job row and the upload copy are blocking I/O.
+    """
+    if job_id is not None and not sales_import.JOB_ID_RE.match(job_id):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="job_id may only contain letters, digits, '_' and '-' (at most 64 characters)."
+        )
+    if store_id is not None and shop_registry.get(db, store_id) is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Store ID {store_id} not found."
+        )
+
+    job_id = job_id or "IMP" + uuid.uuid4().hex[:16].upper()
+    job = db.get(models.SalesImportJob, job_id)
+    # A running job that stopped checkpointing died with its worker and can be resumed
+    stale = job is not None and job.updated_at is not None and (
+        datetime.now() - job.updated_at > timedelta(minutes=sales_import.STALE_JOB_MINUTES)
+    )
+    if job is not None and (job.status == "done" or (job.status in ("queued", "running") and not stale)):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Import job {job_id} is already {job.status}."
+        )
+    if job is None:
+        db.add(models.SalesImportJob(
+            job_id=job_id, source=(file.filename or "upload.csv")[:255], status="queued",
+            rows_read=0, rows_imported=0, rows_rejected=0, updated_at=datetime.now(),
+        ))
+    else:
+        job.status, job.updated_at = "queued", datetime.now()
+    db.commit()
+
+    sales_import.IMPORT_DIR.mkdir(parents=True, exist_ok=True)
+    path = sales_import.IMPORT_DIR / f"{job_id}.csv"
+    with open(path, "wb") as out:
+        shutil.copyfileobj(file.file, out, 1024 * 1024)
+    sales_import.submit_import(path, job_id, store_id, date_format)
+
+    return {"job_id": job_id, "status": "queued", "status_url": f"/sales/import/{job_id}"}
+
+
+@router.get("/import/{job_id}", response_model=Dict[str, Any])
+def get_sales_import_status(job_id: str, db: DBDependency):
+    """
+    Progress of a sales import job: rows read / imported / rejected so far,
+    the date range imported and the error of a failed job.
+    """
+    job = db.get(models.SalesImportJob, job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Import job {job_id} not found."
+        )
+    return sales_import.job_status(job)
@@ -0,0 +1,353 @@
+# File: inventrack/sales_buffer.py
+
+"""
+Optional write-behind buffer for SalesData history rows.
+
+When enabled (SALES_WRITE_BEHIND=1), process_bill commits only the inventory
+decrement and hands the bill's history lines (and its basket, written to
+Bills / BillItems) to this buffer. Lines are
+appended to a local segment file (fsync'd) and a background thread flushes
+them to the main DB in large batched inserts (patching the sales rollups
+for days they already cover).
+
+Delivery is at-least-once: a crash between the DB commit of a segment and
+the deletion of that segment file replays the segment on next start. The
+replay skips the history rows of bills already in Bills (rows and bills are
+committed together), so only entries without a bill_id can be duplicated.
+
+A segment that keeps failing for a reason other than a DB outage (a corrupt
+entry, a constraint violation) is retried SALES_BUFFER_MAX_ATTEMPTS times --
+the count is kept in its file name, so it survives restarts -- and then
+renamed to `*.dead` so the segments behind it can be flushed. Dead segments
+stay in place for manual inspection and replay.
+
+Each worker process writes to its own `worker-<pid>` subdirectory and holds
+an exclusive flock on it while running. At start a worker replays every
+subdirectory whose lock it can take (its owner is gone), so a worker never
+seals or replays a segment another live worker is still appending to.
+"""
+
+import fcntl
+import json
+import logging
+import os
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+from inventrack import baskets, range_analytics, sales_partitions
+from inventrack.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = Path(__file__).resolve().parent
+DEFAULT_BUFFER_DIR = BASE_DIR / "sales_buffer"
+
+ACTIVE_SEGMENT = "active.log"
+SEALED_PATTERN = "segment-*.sealed"
+DEAD_SUFFIX = ".dead"
+WORKER_PATTERN = "worker-*"
+LOCK_FILE = "lock"
+
+
+def _env_flag(name: str, default: str = "0") -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+class SalesWriteBehindBuffer:
+    """Append-only local log of bill lines with a batching background flusher."""
+
+    def __init__(
+        self,
+        directory: Path,
+        flush_interval: float = 1.0,
+        batch_size: int = 5000,
+        fsync: bool = True,
+        max_attempts: int = 5,
+        session_factory: Callable = SessionLocal,
+    ):
+        self.root = Path(directory)
+        self.directory = self.root / f"worker-{os.getpid()}"
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self.max_attempts = max_attempts
+        self._session_factory = session_factory
+
+        self._append_lock = threading.Lock()  # guards the active segment
+        self._flush_lock = threading.Lock()   # one flusher at a time
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._active = None
+        self._lock_file = None
+        self._pending_lines = 0
+
+        self.flushed_rows = 0
+        self.flush_count = 0
+        self.dead_segments = 0
+
+    # --- 1. Lifecycle ---
+
+    def start(self) -> None:
+        """Replays segments left by previous runs, then starts the flusher."""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._lock_file = _try_lock(self.directory)
+        if self._lock_file is None:
+            raise RuntimeError(f"Sales buffer directory {self.directory} is locked by another process.")
+        # Our own directory may be left over from a dead process with the same pid
+        self._recover(self.directory)
+        self._recover_orphans()
+
+        self._active = open(self.directory / ACTIVE_SEGMENT, "a", encoding="utf-8")
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="sales-write-behind", daemon=True
+        )
+        self._thread.start()
+
+    def _recover(self, directory: Path) -> int:
+        """Seals a never-flushed active segment in `directory` and inserts its sealed segments."""
+        leftover = directory / ACTIVE_SEGMENT
+        if leftover.exists() and leftover.stat().st_size > 0:
+            os.replace(leftover, self._sealed_path(directory))
+        return self._flush_sealed(directory)
+
+    def _recover_orphans(self) -> None:
+        """Replays the directories of workers that exited (and the pre-per-worker root layout)."""
+        # One recovering worker at a time, so a worker that just created its
+        # directory is not mistaken for an orphan before it has locked it.
+        with open(self.root / LOCK_FILE, "a") as root_lock:
+            fcntl.flock(root_lock, fcntl.LOCK_EX)
+            self._recover(self.root)
+            for directory in sorted(self.root.glob(WORKER_PATTERN)):
+                if directory == self.directory or not directory.is_dir():
+                    continue
+                lock = _try_lock(directory)
+                if lock is None:
+                    continue  # a live worker
+                try:
+                    self._recover(directory)
+                    if all(path.name == LOCK_FILE for path in directory.iterdir()):
+                        (directory / LOCK_FILE).unlink()
+                        directory.rmdir()
+                finally:
+                    lock.close()
+
+    def stop(self) -> None:
+        """Stops the flusher and drains everything still buffered."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._append_lock:
+            if self._active is not None:
+                self._active.close()
+                self._active = None
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    # --- 2. Producer side (called from the request thread) ---
+
+    def append(self, entry: Dict[str, Any]) -> None:
+        """
+        Durably records one bill's history lines.
+        entry = {"store_id", "date", "lines": [{"product_id", "units_sold", "price", "discount"}],
+                 "bill_id", "user_id", "total_amount"}
+        """
+        line = json.dumps(entry, default=str, separators=(",", ":")) + "\n"
+        with self._append_lock:
+            if self._active is None:
+                raise RuntimeError("Sales write-behind buffer is not running.")
+            self._active.write(line)
+            self._active.flush()
+            if self.fsync:
+                os.fsync(self._active.fileno())
+            self._pending_lines += len(entry["lines"])
+            if self._pending_lines >= self.batch_size:
+                self._wake.set()
+
+    # --- 3. Consumer side (background thread) ---
+
+    def flush(self) -> int:
+        """Seals the active segment and inserts every sealed segment. Returns rows written."""
+        with self._flush_lock:
+            self._seal_active()
+            return self._flush_sealed()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                # Segments stay on disk and are retried on the next tick
+                # (up to max_attempts for a failing segment).
+                logger.exception("Sales write-behind flush failed; will retry.")
+
+    def _sealed_path(self, directory: Optional[Path] = None) -> Path:
+        return (directory or self.directory) / f"segment-{time.time_ns():020d}.sealed"
+
+    def _seal_active(self) -> None:
+        with self._append_lock:
+            if self._active is None or self._pending_lines == 0:
+                return
+            self._active.close()
+            os.replace(self.directory / ACTIVE_SEGMENT, self._sealed_path())
+            self._active = open(self.directory / ACTIVE_SEGMENT, "a", encoding="utf-8")
+            self._pending_lines = 0
+
+    def _flush_sealed(self, directory: Optional[Path] = None) -> int:
+        written = 0
+        try:
+            for segment in sorted((directory or self.directory).glob(SEALED_PATTERN)):
+                try:
+                    entries, bills = self._read_segment(segment)
+                    if entries:
+                        written += self._insert_rows(entries, bills)
+                except (OperationalError, InterfaceError):
+                    raise  # the DB is unreachable or busy, not the segment's fault
+                except Exception:
+                    self._record_failure(segment)
+                    raise
+                segment.unlink()
+        finally:
+            if written:
+                self.flushed_rows += written
+                self.flush_count += 1
+        return written
+
+    def _record_failure(self, segment: Path) -> None:
+        """Bumps the attempt count kept in the segment's name; dead-letters it after max_attempts."""
+        # segment-<ns>.sealed -> segment-<ns>.1.sealed -> ... -> segment-<ns>.<n>.dead
+        parts = segment.name.split(".")
+        attempts = (int(parts[1]) if len(parts) == 3 else 0) + 1
+        if attempts >= self.max_attempts:
+            dead = segment.with_name(f"{parts[0]}.{attempts}{DEAD_SUFFIX}")
+            os.replace(segment, dead)
+            self.dead_segments += 1
+            logger.error("Sales buffer segment %s failed %d times; moved to %s.", segment.name, attempts, dead.name)
+        else:
+            os.replace(segment, segment.with_name(f"{parts[0]}.{attempts}.sealed"))
+
+    def _read_segment(
+        self, path: Path
+    ) -> Tuple[List[Tuple[Optional[str], List[Dict[str, Any]]]], List[Dict[str, Any]]]:
+        """The segment's (bill_id, history rows) per entry, and its bills."""
+        entries, bills = [], []
+        with open(path, "r", encoding="utf-8") as f:
+            for raw in f:
+                raw = raw.strip()
+                if not raw:
+                    continue
+                try:
+                    entry = json.loads(raw)
+                except ValueError:
+                    # A torn final line from a crash mid-write; the bill's
+                    # inventory commit happened before the append, so log it.
+                    logger.error("Skipping unreadable line in %s: %r", path.name, raw[:200])
+                    continue
+                sale_date = date.fromisoformat(entry["date"])
+                rows = []
+                for line in entry["lines"]:
+                    rows.append({
+                        "date": sale_date,
+                        "store_id": entry["store_id"],
+                        "product_id": line["product_id"],
+                        "units_sold": line["units_sold"],
+                        "price": Decimal(line["price"]) if line.get("price") is not None else None,
+                        "discount": Decimal(line.get("discount") or 0),
+                    })
+                entries.append((entry.get("bill_id"), rows))
+                if entry.get("bill_id"):  # entries written before baskets existed have none
+                    bills.append(baskets.bill_entry(
+                        entry["bill_id"], entry["store_id"], entry.get("user_id"), entry.get("total_amount"),
+                        sale_date, baskets.basket_lines(entry["lines"]),
+                    ))
+        return entries, bills
+
+    def _insert_rows(
+        self, entries: List[Tuple[Optional[str], List[Dict[str, Any]]]], bills: List[Dict[str, Any]]
+    ) -> int:
+        """Inserts the history rows and bills of one segment in one transaction. Returns rows written."""
+        db = self._session_factory()
+        try:
+            # A replayed segment: bills already stored were committed together
+            # with their history rows, so both are skipped
+            stored = set()
+            for start in range(0, len(bills), self.batch_size):
+                stored |= baskets.stored_bill_ids(db, [b["bill_id"] for b in bills[start:start + self.batch_size]])
+            rows = [row for bill_id, bill_rows in entries if bill_id not in stored for row in bill_rows]
+
+            for start in range(0, len(rows), self.batch_size):
+                sales_partitions.insert_sales_rows(db, rows[start:start + self.batch_size])
+            for start in range(0, len(bills), self.batch_size):
+                baskets.insert_bills(db, bills[start:start + self.batch_size])
+            # Rows for days the rollups already cover (a flush held up past the
+            # refresh lookback) are added to them, as offline sync does
+            range_analytics.patch_rollups(db, rows)
+            db.commit()
+            return len(rows)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+def _try_lock(directory: Path):
+    """The open lock file of `directory` with an exclusive flock held, or None if another process holds it."""
+    lock = open(directory / LOCK_FILE, "a")
+    try:
+        fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        lock.close()
+        return None
+    return lock
+
+
+# --- 4. Process-wide instance ---
+
+_buffer: Optional[SalesWriteBehindBuffer] = None
+
+
+def get_buffer() -> Optional[SalesWriteBehindBuffer]:
+    """Returns the running buffer, or None when write-behind mode is off."""
+    return _buffer
+
+
+def start(directory: Optional[Path] = None, **options) -> SalesWriteBehindBuffer:
+    global _buffer
+    if _buffer is None:
+        _buffer = SalesWriteBehindBuffer(directory or DEFAULT_BUFFER_DIR, **options)
+        _buffer.start()
+    return _buffer
+
+
+def stop() -> None:
+    global _buffer
+    if _buffer is not None:
+        _buffer.stop()
+        _buffer = None
+
+
+def start_from_env() -> Optional[SalesWriteBehindBuffer]:
+    """Starts the buffer if SALES_WRITE_BEHIND is set. Called from the app lifespan."""
+    if not _env_flag("SALES_WRITE_BEHIND"):
+        return None
+    return start(
+        Path(os.getenv("SALES_BUFFER_DIR", str(DEFAULT_BUFFER_DIR))),
+        flush_interval=float(os.getenv("SALES_BUFFER_FLUSH_INTERVAL", "1.0")),
+        batch_size=int(os.getenv("SALES_BUFFER_BATCH_SIZE", "5000")),
+        fsync=_env_flag("SALES_BUFFER_FSYNC", "1"),
+        max_attempts=int(os.getenv("SALES_BUFFER_MAX_ATTEMPTS", "5")),
+    )
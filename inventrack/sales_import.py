@@ -0,0 +1,475 @@
+# File: inventrack/sales_import.py
+
+"""
+Bulk import of historical SalesData from CSV exports.
+
+    python -m inventrack.manage import-sales history.csv [--store S001] [--job-id ID]
+    POST /sales/import  (multipart upload, runs as a background job)
+
+The file is streamed in batches of SALES_IMPORT_BATCH_ROWS records. Each batch
+is coerced column by column (one map() per column, falling back to row by
+row only when a column has a bad value), store and product references are
+resolved through maps loaded once per import, and the valid rows are written
+with one executemany (or LOAD DATA LOCAL INFILE on MySQL/TiDB, which needs
+"local_infile": true in SQLALCHEMY_CONNECT_ARGS).
+
+Every batch commits together with its checkpoint row in SalesImportJobs, so
+re-running the same job after a crash skips exactly the records that were
+already committed. Rejected records are counted and, optionally, written to
+a rejects CSV with the reason.
+
+Columns (header names are matched ignoring case, spaces and underscores):
+Date, Store_ID (or a fixed store), Product_ID or Product_Name, Units_Sold
+(or Quantity), and optionally Price, Discount, Weather_Competit_Seasonality.
+Missing prices default to the product's MSP.
+"""
+
+import csv
+import hashlib
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.orm import Session
+
+from inventrack import models, range_analytics, sales_partitions
+from inventrack.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+BATCH_ROWS = int(os.getenv("SALES_IMPORT_BATCH_ROWS", "100000"))
+# A running job whose checkpoint is older than this is taken as dead (resumable)
+STALE_JOB_MINUTES = 15
+
+# Normalized header -> field
+HEADER_ALIASES = {
+    "date": "date", "salesdate": "date", "saledate": "date",
+    "storeid": "store_id", "store": "store_id",
+    "productid": "product_id",
+    "productname": "product_name", "product": "product_name", "name": "product_name",
+    "unitssold": "units_sold", "units": "units_sold", "quantity": "units_sold", "qty": "units_sold",
+    "quantitysold": "units_sold",
+    "price": "price", "unitprice": "price",
+    "discount": "discount",
+    "weathercompetitseasonality": "weather_competit_seasonality",
+}
+# SalesData columns, in the order of the coerced value tuples
+COLUMNS = ["Date", "Store_ID", "Product_ID", "Units_Sold", "Price", "Discount", "Weather_Competit_Seasonality"]
+
+
+class SalesImportError(ValueError):
+    """The file cannot be imported at all (bad header, unknown fixed store)."""
+
+
+def _normalize_header(name: str) -> str:
+    return re.sub(r"[^a-z0-9]", "", name.strip().lower())
+
+
+def default_job_id(path: Path) -> str:
+    stat = path.stat()
+    digest = hashlib.sha1(f"{path.resolve()}:{stat.st_size}:{int(stat.st_mtime)}".encode()).hexdigest()[:16]
+    return f"{path.stem[:40]}-{digest}"
+
+
+# --- 1. Reference maps (loaded once per import) ---
+
+class _References:
+    def __init__(self, db: Session):
+        self.stores = set(db.execute(select(models.Shop.store_id)).scalars())
+        self.msp: Dict[str, Optional[Decimal]] = {}
+        self.by_name: Dict[str, str] = {}
+        for product_id, name, msp in db.execute(
+            select(models.Product.id, models.Product.product_name, models.Product.msp)
+        ):
+            self.msp[product_id] = msp
+            self.by_name.setdefault(name.strip().lower(), product_id)
+
+
+# --- 2. Column-wise coercion ---
+# Values are kept in the DB-ready form bulk_insert_sales takes: ISO date
+# strings, ints and decimal strings.
+
+def _parse_date_factory(date_format: Optional[str]) -> Callable[[str], str]:
+    if not date_format:
+        def parse_iso(value: str) -> str:
+            value = value.strip()[:10]
+            date.fromisoformat(value)  # validates
+            return value
+        return parse_iso
+    return lambda value: datetime.strptime(value.strip(), date_format).date().isoformat()
+
+
+def _parse_int(value: str) -> int:
+    try:
+        return int(value)
+    except ValueError:
+        number = float(value)
+        if not number.is_integer():
+            raise
+        return int(number)
+
+
+def _parse_decimal(value: str) -> Optional[str]:
+    value = value.strip()
+    if not value:
+        return None
+    if not Decimal(value).is_finite():
+        raise ValueError(value)
+    return value
+
+
+def _coerce_column(values: List[str], parse: Callable[[str], Any], errors: List[Optional[str]], label: str) -> List[Any]:
+    """Parses value by value, recording the first error of each record."""
+    out = []
+    for i, value in enumerate(values):
+        try:
+            out.append(parse(value))
+        except (ValueError, TypeError, InvalidOperation):
+            out.append(None)
+            if errors[i] is None:
+                errors[i] = f"bad {label} {value!r}"
+    return out
+
+
+# Whole-column fast paths: C-level map() over the batch. Any failure (or an
+# unusual value) sends the column to _coerce_column, which finds the bad rows.
+
+def _iso_date_column(values: List[str]) -> List[str]:
+    stripped = list(map(str.strip, values))
+    for _ in map(date.fromisoformat, stripped):
+        pass
+    if any(len(value) != 10 for value in stripped):
+        raise ValueError("not plain YYYY-MM-DD")
+    return stripped
+
+
+def _int_column(values: List[str]) -> List[int]:
+    return list(map(int, values))
+
+
+def _decimal_column(values: List[str]) -> List[str]:
+    stripped = list(map(str.strip, values))
+    if not math.isfinite(math.fsum(map(float, stripped))):
+        raise ValueError("non-finite value")
+    return stripped
+
+
+def _float_column(values: List[str]) -> List[float]:
+    floats = list(map(float, values))
+    if not math.isfinite(math.fsum(floats)):
+        raise ValueError("non-finite value")
+    return floats
+
+
+def _parse_float(value: str) -> Optional[float]:
+    value = _parse_decimal(value)
+    return float(value) if value is not None else None
+
+
+def _coerce(values: List[str], fast: Optional[Callable[[List[str]], List[Any]]], parse: Callable[[str], Any],
+            errors: List[Optional[str]], label: str) -> List[Any]:
+    if fast is not None:
+        try:
+            return fast(values)
+        except (ValueError, TypeError, OverflowError):
+            pass
+    return _coerce_column(values, parse, errors, label)
+
+
+class _BatchCoercer:
+    def __init__(self, header: List[str], refs: _References, fixed_store: Optional[str], date_format: Optional[str],
+                 float_decimals: bool = False):
+        self.refs = refs
+        self.fixed_store = fixed_store
+        self.parse_date = _parse_date_factory(date_format)
+        self.fast_date = None if date_format else _iso_date_column
+        self.positions: Dict[str, int] = {}
+        for i, name in enumerate(header):
+            field = HEADER_ALIASES.get(_normalize_header(name))
+            if field is not None and field not in self.positions:
+                self.positions[field] = i
+
+        missing = [f for f in ("date", "units_sold") if f not in self.positions]
+        if "product_id" not in self.positions and "product_name" not in self.positions:
+            missing.append("product_id or product_name")
+        if fixed_store is None and "store_id" not in self.positions:
+            missing.append("store_id (or pass a fixed store)")
+        if missing:
+            raise SalesImportError(f"Missing column(s): {', '.join(missing)}. Header was: {header}")
+        self.width = max(self.positions.values()) + 1
+        # SQLite stores DECIMAL as REAL anyway (as SQLAlchemy does), and converting
+        # decimal strings costs it more than the insert itself
+        to_db = float if float_decimals else str
+        self.fast_decimal, self.parse_decimal = (_float_column, _parse_float) if float_decimals else (_decimal_column, _parse_decimal)
+        self.default_price = {pid: (to_db(msp) if msp is not None else None) for pid, msp in refs.msp.items()}
+
+    def coerce(self, records: List[List[str]]) -> Tuple[List[tuple], List[Tuple[List[str], str]]]:
+        """Returns (value tuples in COLUMNS order, [(record, reason)] rejected)."""
+        count = len(records)
+        errors: List[Optional[str]] = [None] * count
+        if count and min(map(len, records)) < self.width:
+            for i, record in enumerate(records):
+                if len(record) < self.width:
+                    errors[i] = f"expected at least {self.width} fields, got {len(record)}"
+                    records[i] = record + [""] * (self.width - len(record))
+
+        def column(field: str) -> Optional[List[str]]:
+            position = self.positions.get(field)
+            return None if position is None else [record[position] for record in records]
+
+        dates = _coerce(column("date"), self.fast_date, self.parse_date, errors, "date")
+        units = _coerce(column("units_sold"), _int_column, _parse_int, errors, "units_sold")
+        prices = column("price")
+        prices = (_coerce(prices, self.fast_decimal, self.parse_decimal, errors, "price")
+                  if prices is not None else [None] * count)
+        discounts = column("discount")
+        discounts = (_coerce(discounts, self.fast_decimal, self.parse_decimal, errors, "discount")
+                     if discounts is not None else [None] * count)
+        notes = column("weather_competit_seasonality")
+        notes = [value or None for value in notes] if notes is not None else [None] * count
+
+        if self.fixed_store is not None:
+            stores = [self.fixed_store] * count
+        else:
+            stores = list(map(str.strip, column("store_id")))
+            known_stores = self.refs.stores
+            if not known_stores.issuperset(stores):
+                for i, store_id in enumerate(stores):
+                    if store_id not in known_stores and errors[i] is None:
+                        errors[i] = f"unknown store {store_id!r}"
+
+        known = self.default_price
+        product_ids = column("product_id")
+        names = column("product_name")
+        if product_ids is not None:
+            product_ids = list(map(str.strip, product_ids))
+        else:
+            product_ids = [""] * count
+        if not known.keys() >= set(product_ids):
+            by_name = self.refs.by_name
+            for i, product_id in enumerate(product_ids):
+                if product_id in known:
+                    continue
+                if names is not None:
+                    product_id = product_ids[i] = by_name.get(names[i].strip().lower(), product_id)
+                if product_id not in known and errors[i] is None:
+                    errors[i] = f"unknown product {product_id or names[i]!r}"
+
+        if None in prices:
+            for i, price in enumerate(prices):
+                if price is None and errors[i] is None:
+                    prices[i] = known[product_ids[i]]
+
+        values = list(zip(dates, stores, product_ids, units, prices, discounts, notes))
+        if not any(errors):
+            return values, []
+        rows, rejected = [], []
+        for row, record, error in zip(values, records, errors):
+            if error is None:
+                rows.append(row)
+            else:
+                rejected.append((record, error))
+        return rows, rejected
+
+
+# --- 3. Loading ---
+
+def _load_data_escape(value: Any) -> str:
+    if value is None:
+        return "\\N"
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def _load_data_infile(db: Session, values: List[tuple]) -> None:
+    """MySQL / TiDB: LOAD DATA LOCAL INFILE from a temporary TSV of the batch."""
+    with tempfile.NamedTemporaryFile("w", suffix=".tsv", delete=False, encoding="utf-8", newline="\n") as f:
+        for row in values:
+            f.write("\t".join(map(_load_data_escape, row)))
+            f.write("\n")
+        path = f.name
+    try:
+        db.execute(text(
+            "LOAD DATA LOCAL INFILE :path INTO TABLE SalesData "
+            "CHARACTER SET utf8mb4 FIELDS TERMINATED BY '\\t' LINES TERMINATED BY '\\n' "
+            f"({', '.join(COLUMNS)})"
+        ), {"path": path})
+    finally:
+        os.unlink(path)
+
+
+def _use_load_data(db: Session, requested: bool) -> bool:
+    if not requested:
+        return False
+    bind = db.get_bind()
+    if bind.dialect.name != "mysql":
+        logger.warning("LOAD DATA requested but the database is %s; using executemany.", bind.dialect.name)
+        return False
+    return True
+
+
+# --- 4. Driver ---
+
+def import_file(
+    db: Session,
+    path: Path,
+    job_id: Optional[str] = None,
+    store_id: Optional[str] = None,
+    date_format: Optional[str] = None,
+    batch_rows: int = BATCH_ROWS,
+    load_data: bool = False,
+    rejects_path: Optional[Path] = None,
+    refresh_rollup: bool = True,
+    progress: Optional[Callable[[models.SalesImportJob], None]] = None,
+) -> models.SalesImportJob:
+    """
+    Imports (or resumes importing) `path` into SalesData and returns the job
+    row. A job that already finished is returned unchanged.
+    """
+    path = Path(path)
+    job_id = job_id or default_job_id(path)
+    job = db.get(models.SalesImportJob, job_id)
+    if job is None:
+        job = models.SalesImportJob(
+            job_id=job_id, source=path.name[:255], status="running",
+            rows_read=0, rows_imported=0, rows_rejected=0, started_at=datetime.now(),
+        )
+        db.add(job)
+    elif job.status == "done":
+        return job
+    job.status, job.error, job.updated_at = "running", None, datetime.now()
+    job.started_at = job.started_at or job.updated_at
+    db.commit()
+
+    try:
+        refs = _References(db)
+        if store_id is not None and store_id not in refs.stores:
+            raise SalesImportError(f"Store ID {store_id} not found.")
+        use_load_data = _use_load_data(db, load_data)
+        rejects_writer, rejects_file = None, None
+        if rejects_path is not None:
+            rejects_file = open(rejects_path, "a", newline="", encoding="utf-8")
+            rejects_writer = csv.writer(rejects_file)
+
+        try:
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                reader = csv.reader(f)
+                header = next(reader, None)
+                if header is None:
+                    raise SalesImportError("The file is empty.")
+                coercer = _BatchCoercer(header, refs, store_id, date_format,
+                                        float_decimals=db.get_bind().dialect.name == "sqlite")
+                reader = islice(reader, job.rows_read, None)  # resume after the checkpoint
+
+                while True:
+                    batch = list(islice(reader, batch_rows))
+                    if not batch:
+                        break
+                    rows, rejected = coercer.coerce([record for record in batch if record])
+                    if rows:
+                        if use_load_data:
+                            _load_data_infile(db, rows)
+                        else:
+                            sales_partitions.bulk_insert_sales(db, COLUMNS, rows)
+                        batch_dates = [row[0] for row in rows]
+                        batch_min = date.fromisoformat(min(batch_dates))
+                        batch_max = date.fromisoformat(max(batch_dates))
+                        job.min_date = min(job.min_date, batch_min) if job.min_date else batch_min
+                        job.max_date = max(job.max_date, batch_max) if job.max_date else batch_max
+                    job.rows_read += len(batch)  # blank lines included, to resume exactly
+                    job.rows_imported += len(rows)
+                    job.rows_rejected += len(rejected)
+                    job.updated_at = datetime.now()
+                    db.commit()  # the batch and its checkpoint land together
+
+                    if rejects_writer is not None:
+                        for record, reason in rejected:
+                            rejects_writer.writerow(record + [reason])
+                    if progress is not None:
+                        progress(job)
+        finally:
+            if rejects_file is not None:
+                rejects_file.close()
+
+        job.status, job.updated_at = "done", datetime.now()
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        job = db.get(models.SalesImportJob, job_id)
+        job.status, job.error, job.updated_at = "failed", str(e)[:2000], datetime.now()
+        db.commit()
+        raise
+
+    if refresh_rollup and job.min_date is not None:
+        _refresh_rollup_after_import(db, job.min_date)
+    return job
+
+
+def _refresh_rollup_after_import(db: Session, since: date) -> None:
+    """History older than the rollup watermark would otherwise be missing from range analytics."""
+    covered = range_analytics._rollup_covered_through(db)
+    if covered is not None and since <= covered:
+        started = time.perf_counter()
+        range_analytics.refresh_daily_rollup(db, since)
+        logger.info("Daily rollup refreshed from %s after import in %.1f s.", since, time.perf_counter() - started)
+
+
+# --- 5. Background jobs (POST /sales/import) ---
+# A dedicated thread, not FastAPI BackgroundTasks: those run inside the
+# request's ASGI call, which would hold its admission slot for the whole import.
+
+IMPORT_DIR = Path(os.getenv("SALES_IMPORT_DIR", str(Path(tempfile.gettempdir()) / "inventrack-imports")))
+# Uploaded files are stored as IMPORT_DIR / "<job_id>.csv"
+JOB_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def submit_import(path: Path, job_id: str, store_id: Optional[str], date_format: Optional[str]) -> None:
+    """Runs the import of an uploaded file on the import thread; the file is removed afterwards."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=int(os.getenv("SALES_IMPORT_WORKERS", "1")), thread_name_prefix="sales-import"
+            )
+    _executor.submit(_run_import_job, path, job_id, store_id, date_format)
+
+
+def _run_import_job(path: Path, job_id: str, store_id: Optional[str], date_format: Optional[str]) -> None:
+    db = SessionLocal()
+    try:
+        job = import_file(db, path, job_id=job_id, store_id=store_id, date_format=date_format)
+        logger.info("Sales import %s finished: %s rows imported, %s rejected.",
+                    job_id, job.rows_imported, job.rows_rejected)
+    except Exception:
+        logger.exception("Sales import %s failed; re-upload with the same job_id to resume.", job_id)
+    finally:
+        db.close()
+        path.unlink(missing_ok=True)
+
+
+def job_status(job: models.SalesImportJob) -> Dict[str, Any]:
+    return {
+        "job_id": job.job_id,
+        "source": job.source,
+        "status": job.status,
+        "rows_read": job.rows_read,
+        "rows_imported": job.rows_imported,
+        "rows_rejected": job.rows_rejected,
+        "min_date": job.min_date,
+        "max_date": job.max_date,
+        "error": job.error,
+        "started_at": job.started_at,
+        "updated_at": job.updated_at,
+    }
@@ -0,0 +1,175 @@
+# File: inventrack/sales_sync.py
+
+"""
+Offline POS sync (POST /sales/sync): applies a shop's queued bills in one
+transaction instead of one process_bill round trip and lock/commit cycle
+per bill.
+
+1. Bills whose client bill_id is already in Bills are reported as
+   duplicates, so a sync retried after a timeout never sells twice.
+2. The Inventory rows of every product in the batch are locked in one
+   SELECT ... FOR UPDATE, in product_id order, so concurrent syncs of the
+   same store lock in the same order.
+3. Bills are applied in client timestamp order against the locked
+   quantities. A bill is accepted whole or rejected whole (unknown product,
+   insufficient stock), with the same messages as process_bill.
+4. Stock is written once per product, SalesData rows with each bill's own
+   date in one bulk insert, the bills (baskets) under their client IDs, and
+   one stock ledger movement per bill line (referencing the bill).
+   Days the daily rollup already covers are patched in the same transaction.
+
+SalesData is always written in the transaction, even in write-behind mode:
+the Bills rows are what makes a replay idempotent.
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from inventrack import baskets, models, range_analytics, sales_partitions, schemas, stock_ledger
+from inventrack.inventory_cache import inventory_cache
+from inventrack.product_catalog import product_catalog
+
+ACCEPTED, DUPLICATE, REJECTED = "accepted", "duplicate", "rejected"
+
+# Product IDs per locking SELECT (keeps the IN list reasonable on huge syncs)
+LOCK_CHUNK = 1000
+
+
+class SyncOutcome:
+    def __init__(self):
+        self.results: List[Dict[str, Any]] = []
+        self.new_quantities: Dict[str, int] = {}
+        self.accepted_baskets: List[List[str]] = []
+        # inventory_cache write version of the committed stock changes
+        self.cache_version: Optional[int] = None
+
+    def count(self, status: str) -> int:
+        return sum(1 for result in self.results if result["status"] == status)
+
+
+def _merged_lines(bill: schemas.SyncBill) -> Dict[str, int]:
+    lines: Dict[str, int] = defaultdict(int)
+    for item in bill.items:
+        lines[item.product_id] += item.quantity_sold
+    return dict(lines)
+
+
+def lock_inventory(db: Session, store_id: str, product_ids: Sequence[str]) -> Dict[str, models.Inventory]:
+    """Locks a store's Inventory rows for `product_ids` in product order (FOR UPDATE), in chunks."""
+    rows: Dict[str, models.Inventory] = {}
+    ordered = sorted(product_ids)
+    for start in range(0, len(ordered), LOCK_CHUNK):
+        chunk = ordered[start:start + LOCK_CHUNK]
+        for row in db.execute(
+            select(models.Inventory)
+            .where(models.Inventory.store_id == store_id, models.Inventory.product_id.in_(chunk))
+            .order_by(models.Inventory.product_id, models.Inventory.inventory_id)
+            .with_for_update()
+        ).scalars():
+            rows.setdefault(row.product_id, row)  # the first row, as process_bill's .first()
+    return rows
+
+
+def sync_bills(db: Session, store_id: str, bills: Sequence[schemas.SyncBill]) -> SyncOutcome:
+    """
+    Applies `bills` of one store and commits. Results are in request order.
+    Raises on DB errors after rolling back (nothing is applied then).
+    """
+    outcome = SyncOutcome()
+    results: List[Optional[Dict[str, Any]]] = [None] * len(bills)
+
+    # 1. Request-level checks and replays of bills that already made it in
+    existing = {}
+    ids = list({bill.bill_id for bill in bills})
+    for start in range(0, len(ids), LOCK_CHUNK):
+        existing.update(db.execute(
+            select(models.Bill.bill_id, models.Bill.store_id).where(models.Bill.bill_id.in_(ids[start:start + LOCK_CHUNK]))
+        ).all())
+
+    pending: List[Tuple[int, schemas.SyncBill, Dict[str, int]]] = []
+    seen = set()
+    for index, bill in enumerate(bills):
+        lines = _merged_lines(bill)
+        if bill.bill_id in existing:
+            if existing[bill.bill_id] == store_id:
+                results[index] = {"bill_id": bill.bill_id, "status": DUPLICATE, "detail": "Already synced."}
+            else:
+                results[index] = {"bill_id": bill.bill_id, "status": REJECTED,
+                                  "detail": "bill_id is already used by another store."}
+        elif bill.bill_id in seen:
+            results[index] = {"bill_id": bill.bill_id, "status": DUPLICATE, "detail": "Repeated in this request."}
+        elif not lines:
+            results[index] = {"bill_id": bill.bill_id, "status": REJECTED, "detail": "The bill has no items."}
+        elif any(qty <= 0 for qty in lines.values()):
+            results[index] = {"bill_id": bill.bill_id, "status": REJECTED, "detail": "Quantities must be positive."}
+        else:
+            seen.add(bill.bill_id)
+            pending.append((index, bill, lines))
+
+    # 2. One locked pass over every product involved, then their details
+    # (price) read in the same transaction, not from the catalog cache
+    product_ids = {pid for _, _, lines in pending for pid in lines}
+    inventory = lock_inventory(db, store_id, product_ids) if pending else {}
+    details_by_id = product_catalog.fresh(db, product_ids)
+    available = {pid: row.stock_quantity for pid, row in inventory.items()}
+
+    # 3. Apply in client time order against the locked quantities
+    sales_records: List[Dict[str, Any]] = []
+    bill_entries: List[Dict[str, Any]] = []
+    movements: List[Dict[str, Any]] = []
+    pending.sort(key=lambda entry: (entry[1].billed_at, entry[0]))
+    for index, bill, lines in pending:
+        problem = None
+        for pid, qty in lines.items():
+            if pid not in available:
+                problem = f"Product ID {pid} not found in this shop's inventory."
+            elif available[pid] < qty:
+                problem = f"Insufficient stock for product ID {pid}. Available: {available[pid]}"
+            if problem:
+                break
+        if problem:
+            results[index] = {"bill_id": bill.bill_id, "status": REJECTED, "detail": problem}
+            continue
+
+        bill_date = bill.billed_at.date()
+        records = []
+        for pid, qty in lines.items():
+            available[pid] -= qty
+            movements.append(stock_ledger.movement(store_id, pid, stock_ledger.SYNC, -qty, available[pid],
+                                                   reference=bill.bill_id))
+            details = details_by_id.get(pid)
+            if details:
+                records.append({"product_id": pid, "units_sold": qty, "price": details.msp, "discount": 0.00})
+        sales_records.extend({"date": bill_date, "store_id": store_id, **record} for record in records)
+        bill_entries.append(baskets.bill_entry(
+            bill.bill_id, store_id, bill.user_id, bill.total_amount, bill_date, baskets.basket_lines(records),
+        ))
+        outcome.accepted_baskets.append(list(lines))
+        results[index] = {"bill_id": bill.bill_id, "status": ACCEPTED, "detail": None}
+
+    # 4. Write everything in one transaction
+    try:
+        for pid, qty in available.items():
+            if qty != inventory[pid].stock_quantity:
+                inventory[pid].stock_quantity = qty
+                outcome.new_quantities[pid] = qty
+        stock_ledger.record(db, movements)
+        sales_partitions.insert_sales_rows(db, sales_records)
+        baskets.insert_bills(db, bill_entries)
+        range_analytics.patch_rollups(db, sales_records)
+        if outcome.new_quantities:
+            # Taken while the inventory rows are still locked (see inventory_cache)
+            outcome.cache_version = inventory_cache.begin_write(store_id)
+        db.commit()
+    except Exception:
+        if outcome.cache_version is not None:
+            inventory_cache.abort_write(store_id, outcome.cache_version)
+            outcome.cache_version = None
+        db.rollback()
+        raise
+
+    outcome.results = results
+    return outcome
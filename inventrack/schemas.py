@@ -91,6 +91,14 @@ class InventoryProduct(Product):
     class Config(Product.Config):
         pass 
 
+# Search hit: stock is only known when the search is scoped to a store
+class ProductSearchResult(Product):
+    qty: Optional[int] = None
+    score: float
+
+    class Config(Product.Config):
+        pass
+
 # --- Sales Schemas ---
 
 class SaleItem(BaseModel):
@@ -104,6 +112,31 @@ class ProcessSale(BaseModel):
     total_amount: float
     items: List[SaleItem]
 
+# --- Offline POS sync (POST /sales/sync) ---
+
+class SyncBill(BaseModel):
+    bill_id: str = Field(..., min_length=1, max_length=40, description="Client-generated; a replayed ID is skipped.")
+    billed_at: datetime = Field(..., description="When the bill was made on the till (its SalesData date).")
+    user_id: int
+    total_amount: float
+    items: List[SaleItem]
+
+class SalesSyncRequest(BaseModel):
+    store_id: str
+    bills: List[SyncBill]
+
+class SyncBillResult(BaseModel):
+    bill_id: str
+    status: str = Field(..., description="'accepted', 'duplicate' (already synced) or 'rejected'.")
+    detail: Optional[str] = None
+
+class SalesSyncResponse(BaseModel):
+    store_id: str
+    accepted: int
+    duplicates: int
+    rejected: int
+    results: List[SyncBillResult]
+
 # --- Demand Forecasting Schemas (NEW) ---
 
 class DemandForecastRequest(BaseModel):
@@ -140,6 +173,8 @@ class SalesTrendDataPoint(BaseModel):
     """A single data point for the sales trend graph."""
     revenue_date: Union[date, str] = Field(..., description="Date of the revenue data point.")
     total_revenue_inr: float = Field(..., description="Total revenue for that specific period.")
+    # The key the store dashboard used for the same value before revenue_date; kept for older app builds
+    legacy_date: Optional[Union[date, str]] = Field(None, alias="date", description="Deprecated: same as revenue_date.")
 
 class SalesAnalyticsResponse(BaseModel):
     """The full dashboard response containing all simplified metrics and graph data."""
@@ -153,6 +188,66 @@ class SalesAnalyticsResponse(BaseModel):
     # Data for the graph
     sales_trend_data: List[SalesTrendDataPoint]
     forecast_trend: List[ForecastPoint] = []
+
+class OwnerCombinedAnalytics(BaseModel):
+    """KPIs and trend summed over all of an owner's stores."""
+    kpis_daily: TimePeriodKPI
+    kpis_weekly: TimePeriodKPI
+    kpis_monthly: TimePeriodKPI
+    kpis_overall: TimePeriodKPI
+    sales_trend_data: List[SalesTrendDataPoint]
+
+class OwnerStoreAnalytics(OwnerCombinedAnalytics):
+    """The same KPIs and trend for a single store of the owner."""
+    store_id: str
+    shop_name: Optional[str] = None
+
+class OwnerAnalyticsResponse(BaseModel):
+    """Owner overview: per-store and combined metrics in one response."""
+    owner_id: int
+    store_count: int
+    combined: OwnerCombinedAnalytics
+    stores: List[OwnerStoreAnalytics]
+# --- Ad-hoc Range Analytics Schemas ---
+
+class RangeSeriesPoint(BaseModel):
+    """One day/week/month bucket of the requested range."""
+    bucket: str = Field(..., description="First day of the bucket (YYYY-MM-DD).")
+    sales_count: float
+    units_sold: float
+    revenue_inr: float
+
+class RangeTotals(BaseModel):
+    sales_count: float
+    units_sold: float
+    revenue_inr: float
+
+class RankedProduct(BaseModel):
+    product_id: str
+    product_name: Optional[str] = None
+    category: Optional[str] = None
+    units_sold: float
+    revenue_inr: float
+
+class RankedCategory(BaseModel):
+    category: str
+    units_sold: float
+    revenue_inr: float
+
+class RangeAnalyticsResponse(BaseModel):
+    """Arbitrary from/to analytics with granularity and top-N breakdowns."""
+    store_id: str
+    from_date: str
+    to_date: str
+    granularity: str
+    plan: str = Field(..., description="Sources used: 'raw', 'rollup' or 'rollup+raw'.")
+    totals: RangeTotals
+    series: List[RangeSeriesPoint]
+    top_products_by_revenue: List[RankedProduct]
+    top_products_by_units: List[RankedProduct]
+    top_categories_by_revenue: List[RankedCategory]
+    top_categories_by_units: List[RankedCategory]
+
 class ConsumerCreate(BaseModel):
     full_name: str
     email_id: str
@@ -170,3 +265,83 @@ class Consumer(BaseModel):
     class Config:
         from_attributes = True
 
+
+# --- Consumer availability ("who has it in stock near me") ---
+
+class StoreAvailability(BaseModel):
+    store_id: str
+    shop_name: str
+    address: str
+    city: str
+    shop_phone: Optional[str] = None
+    qty: int
+
+class AvailabilityResponse(BaseModel):
+    product_id: str
+    product_name: Optional[str] = None
+    city: str
+    stores: List[StoreAvailability]
+
+
+# --- Batch requests (POST /batch) ---
+
+class BatchSubRequest(BaseModel):
+    id: Optional[str] = Field(None, description="Echoed back on the matching response.")
+    method: str = Field("GET", description="GET, POST, PUT, PATCH or DELETE.")
+    path: str = Field(..., description="Path with query string, e.g. /inventory/S1/products.")
+    body: Optional[Any] = Field(None, description="JSON body for writes.")
+    headers: Optional[Dict[str, str]] = None
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest]
+
+class BatchSubResponse(BaseModel):
+    id: Optional[str] = None
+    status: int
+    headers: Dict[str, str]
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]
+
+
+# --- Stock ledger (point-in-time stock and movement reports) ---
+
+class StockLevel(BaseModel):
+    product_id: str
+    qty: int
+
+class StockAtResponse(BaseModel):
+    store_id: str
+    at: datetime
+    snapshot_id: Optional[int] = Field(None, description="Snapshot the answer started from (None: ledger only).")
+    snapshot_taken_at: Optional[datetime] = None
+    movements_replayed: int
+    stock: List[StockLevel]
+
+class StockMovementOut(BaseModel):
+    movement_id: int
+    product_id: str
+    at: datetime
+    source: str
+    delta: int
+    quantity_after: int
+    reference: Optional[str] = None
+
+class ProductMovementSummary(BaseModel):
+    product_id: str
+    opening: Optional[int] = Field(None, description="Quantity at `since` (None: unknown to the ledger).")
+    received: int
+    removed: int
+    by_source: Dict[str, int]
+    closing: int
+
+class StockMovementsResponse(BaseModel):
+    store_id: str
+    since: datetime
+    until: datetime
+    snapshot_id: Optional[int] = None
+    snapshot_taken_at: Optional[datetime] = None
+    movements_total: int
+    products: List[ProductMovementSummary]
+    movements: List[StockMovementOut] = Field(..., description="The first `limit` movements, oldest first.")
@@ -0,0 +1,150 @@
+# File: inventrack/shop_registry.py
+
+"""
+Process-wide cache of `shops` rows, used by the ValidStore dependency to
+check that a store exists without a DB round trip on every request.
+
+Found shops are kept for SHOP_REGISTRY_TTL_SECONDS; unknown store IDs are
+remembered as missing for SHOP_REGISTRY_NEGATIVE_TTL_SECONDS, so a client
+retrying a bad ID does not hit the DB either. create_shopkeeper puts the new
+shop in the registry, which also clears a cached "missing" for it on this
+worker; other workers see it once their negative entry expires. Entries are
+evicted LRU beyond SHOP_REGISTRY_MAX_ENTRIES.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from inventrack import models
+
+
+class CachedShop(NamedTuple):
+    """Immutable snapshot of a `shops` row (same attribute names as models.Shop)."""
+    store_id: str
+    shop_name: str
+    business_verification_id: Optional[str]
+    address: str
+    city: str
+    shop_phone: Optional[str]
+    store_type: Optional[str]
+    status: Optional[str]
+    owner_id: int
+
+
+def shop_snapshot(shop: models.Shop) -> CachedShop:
+    return CachedShop(
+        store_id=shop.store_id,
+        shop_name=shop.shop_name,
+        business_verification_id=shop.business_verification_id,
+        address=shop.address,
+        city=shop.city,
+        shop_phone=shop.shop_phone,
+        store_type=shop.store_type,
+        status=shop.status,
+        owner_id=shop.owner_id,
+    )
+
+
+class ShopRegistry:
+    def __init__(self, ttl_seconds: float, negative_ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max_entries
+        # store_id -> (shop or None for "does not exist", expires_at)
+        self._entries: "OrderedDict[str, Tuple[Optional[CachedShop], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    # --- 1. Lookups ---
+
+    def cached(self, store_id: str) -> Tuple[bool, Optional[CachedShop]]:
+        """(True, shop or None) when the answer is cached, else (False, None). Never touches the DB."""
+        if not self.enabled:
+            return False, None
+        now = time.monotonic()
+        with self._lock:
+            cached = self._entries.get(store_id)
+            if cached is None or cached[1] <= now:
+                return False, None
+            self._entries.move_to_end(store_id)
+            if cached[0] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return True, cached[0]
+
+    def get(self, db: Session, store_id: str) -> Optional[CachedShop]:
+        """The shop, or None if it does not exist; queries the DB only on a miss."""
+        found, shop = self.cached(store_id)
+        if found:
+            return shop
+        return self.load(db, store_id)
+
+    def load(self, db: Session, store_id: str) -> Optional[CachedShop]:
+        with self._lock:
+            self.misses += 1
+        row = db.query(models.Shop).filter(models.Shop.store_id == store_id).first()
+        shop = shop_snapshot(row) if row is not None else None
+        self._store(store_id, shop)
+        return shop
+
+    # --- 2. Change hooks ---
+
+    def put(self, shop: models.Shop) -> None:
+        """Called after a shop is created or edited (replaces any cached "missing")."""
+        self._store(shop.store_id, shop_snapshot(shop))
+
+    def invalidate(self, store_id: Optional[str] = None) -> None:
+        """Drops one store, or everything when store_id is None."""
+        with self._lock:
+            if store_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(store_id, None)
+
+    def _store(self, store_id: str, shop: Optional[CachedShop]) -> None:
+        if not self.enabled:
+            return
+        ttl = self.ttl_seconds if shop is not None else self.negative_ttl_seconds
+        with self._lock:
+            self._entries[store_id] = (shop, time.monotonic() + ttl)
+            self._entries.move_to_end(store_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.negative_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "missing_entries": sum(1 for shop, _ in self._entries.values() if shop is None),
+                "hits": self.hits,
+                "negative_hits": self.negative_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.negative_hits) / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "ttl_seconds": self.ttl_seconds,
+                "negative_ttl_seconds": self.negative_ttl_seconds,
+            }
+
+
+shop_registry = ShopRegistry(
+    ttl_seconds=float(os.getenv("SHOP_REGISTRY_TTL_SECONDS", "300")),
+    negative_ttl_seconds=float(os.getenv("SHOP_REGISTRY_NEGATIVE_TTL_SECONDS", "5")),
+    max_entries=int(os.getenv("SHOP_REGISTRY_MAX_ENTRIES", "50000")),
+)
@@ -0,0 +1,321 @@
+# File: inventrack/slow_query_log.py
+
+"""
+Opt-in slow-query log (SLOW_QUERY_LOG=1).
+
+Every engine built by database._build_engine gets a pair of cursor-execute
+listeners that time each statement. Statements slower than
+SLOW_QUERY_THRESHOLD_MS are recorded with
+
+- a fingerprint: the SQL with literals, placeholders and IN lists collapsed,
+  so `WHERE store_id = 'A'` and `= 'B'` group together;
+- the shape of the bound parameters (names / types / executemany row count,
+  never the values, which may be customer data);
+- the originating route (`GET /analytics/{store_id}`) or thread name;
+- the duration.
+
+The first SLOW_QUERY_EXPLAIN_FIRST_N occurrences of each SELECT fingerprint
+also get `EXPLAIN` output (EXPLAIN QUERY PLAN on SQLite), captured on a
+separate pooled connection by a background thread so the slow request does
+not wait for it. Records go to an in-memory ring buffer of
+SLOW_QUERY_BUFFER_SIZE entries (GET /internal/slow-queries) and, as JSON
+lines, to SLOW_QUERY_LOG_PATH, rotated at SLOW_QUERY_LOG_MAX_BYTES.
+
+When disabled no listener or middleware is installed, so the overhead is
+one env check per engine.
+"""
+
+import contextvars
+import hashlib
+import json
+import logging
+import logging.handlers
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+
+def enabled() -> bool:
+    return os.getenv("SLOW_QUERY_LOG", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+# --- 1. Fingerprints and parameter shapes ---
+
+_STRING = re.compile(r"'(?:[^'\\]|\\.|'')*'")
+_NUMBER = re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?(?:e[+-]?\d+)?\b", re.IGNORECASE)
+_PLACEHOLDER = re.compile(r"%\([^)]+\)s|%s|\?|(?<![:\w]):\w+")
+_IN_LIST = re.compile(r"\bIN\s*\(\s*\?(?:\s*,\s*\?)*\s*\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"\bVALUES\s*\(\s*\?(?:\s*,\s*\?)*\s*\)(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))*", re.IGNORECASE)
+_SPACE = re.compile(r"\s+")
+
+
+def normalize_sql(statement: str) -> str:
+    """The statement with every literal / bound value replaced by `?` and lists collapsed."""
+    sql = _STRING.sub("?", statement)
+    sql = _PLACEHOLDER.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _VALUES_LIST.sub("VALUES (...)", sql)
+    return _SPACE.sub(" ", sql).strip()
+
+
+def fingerprint(normalized: str) -> str:
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:16]
+
+
+def _value_type(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (list, tuple)):
+        return f"{type(value).__name__}[{len(value)}]"
+    return type(value).__name__
+
+
+def param_shape(parameters: Any, executemany: bool) -> Any:
+    """Names and types of the bound parameters; for executemany, the row count and first row's shape."""
+    if executemany:
+        rows = parameters if isinstance(parameters, (list, tuple)) else []
+        return {"rows": len(rows), "row": param_shape(rows[0], False) if rows else None}
+    if isinstance(parameters, dict):
+        return {str(key): _value_type(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [_value_type(value) for value in parameters]
+    return None
+
+
+# --- 2. Originating route ---
+
+# The ASGI scope of the request being served. Starlette puts the matched
+# route in the scope during routing, i.e. after the middleware set this, so
+# the template is read from the scope when a slow query is recorded.
+_current_scope: "contextvars.ContextVar[Optional[dict]]" = contextvars.ContextVar("slow_query_scope", default=None)
+
+
+class RouteContextMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        token = _current_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _current_scope.reset(token)
+
+
+def current_route() -> str:
+    scope = _current_scope.get()
+    if scope is None:
+        return f"thread:{threading.current_thread().name}"
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "?")
+    return f"{scope.get('method', '?')} {path}"
+
+
+# --- 3. Recorder ---
+
+MAX_FINGERPRINTS = 5000
+
+class SlowQueryLog:
+    def __init__(self, threshold_ms: float, explain_first_n: int, buffer_size: int, log_path: Optional[str],
+                 log_max_bytes: int, log_backups: int):
+        self.threshold_ms = threshold_ms
+        self.explain_first_n = explain_first_n
+        self._recent: "deque[Dict[str, Any]]" = deque(maxlen=buffer_size)
+        # fingerprint -> {"sql", "count", "total_ms", "max_ms", "explained", "last_route", "last_seen"}
+        self._by_fingerprint: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._explainer: Optional[ThreadPoolExecutor] = None
+        self._pending_explains = 0
+        self.log_path = log_path
+        self.log_max_bytes = log_max_bytes
+        self.log_backups = log_backups
+        self._file_logger: Optional[logging.Logger] = None
+
+        self.recorded = 0
+        self.explain_failures = 0
+        self.explains_dropped = 0
+
+    # --- Engine hooks ---
+
+    def attach(self, engine) -> None:
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+
+    # The start time rides on the execution context, so a statement that
+    # raises leaves nothing behind on the connection.
+
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._slow_query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_slow_query_started", None)
+        if started is None:
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000.0
+        if elapsed_ms < self.threshold_ms or context.execution_options.get("slow_query_skip"):
+            return
+        try:
+            self.record(conn.engine, statement, parameters, executemany, elapsed_ms)
+        except Exception:
+            logger.exception("Recording a slow query failed.")
+
+    # --- Recording ---
+
+    def record(self, engine, statement: str, parameters: Any, executemany: bool, elapsed_ms: float) -> None:
+        normalized = normalize_sql(statement)
+        fp = fingerprint(normalized)
+        entry = {
+            "at": datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+            "fingerprint": fp,
+            "sql": normalized,
+            "params": param_shape(parameters, executemany),
+            "route": current_route(),
+            "duration_ms": round(elapsed_ms, 2),
+            "database": engine.url.render_as_string(hide_password=True),
+        }
+        with self._lock:
+            self.recorded += 1
+            stats = self._by_fingerprint.get(fp)
+            if stats is None:
+                if len(self._by_fingerprint) >= MAX_FINGERPRINTS:
+                    # Runaway fingerprints (e.g. un-parameterized SQL): drop the cheapest
+                    self._by_fingerprint.pop(min(self._by_fingerprint, key=lambda k: self._by_fingerprint[k]["total_ms"]))
+                stats = self._by_fingerprint[fp] = {
+                    "fingerprint": fp, "sql": normalized, "count": 0, "total_ms": 0.0, "max_ms": 0.0, "explained": 0,
+                }
+            stats["count"] += 1
+            stats["total_ms"] += elapsed_ms
+            stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+            stats["last_route"] = entry["route"]
+            stats["last_seen"] = entry["at"]
+            explain = not executemany and stats["explained"] < self.explain_first_n and _is_select(normalized)
+            if explain:
+                if self._pending_explains >= 2 * max(1, self.explain_first_n):
+                    explain = False
+                    self.explains_dropped += 1
+                else:
+                    stats["explained"] += 1
+                    self._pending_explains += 1
+        if explain:
+            self._explain_pool().submit(self._explain_and_publish, engine, statement, parameters, entry)
+        else:
+            self._publish(entry)
+
+    def _explain_pool(self) -> ThreadPoolExecutor:
+        if self._explainer is None:
+            with self._lock:
+                if self._explainer is None:
+                    self._explainer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="slow-query-explain")
+        return self._explainer
+
+    def _explain_and_publish(self, engine, statement: str, parameters: Any, entry: Dict[str, Any]) -> None:
+        try:
+            entry["explain"] = explain(engine, statement, parameters)
+        except Exception as exc:
+            self.explain_failures += 1
+            entry["explain_error"] = f"{type(exc).__name__}: {exc}"[:500]
+        finally:
+            with self._lock:
+                self._pending_explains -= 1
+        self._publish(entry)
+
+    def _publish(self, entry: Dict[str, Any]) -> None:
+        with self._lock:
+            self._recent.append(entry)
+        file_logger = self._json_logger()
+        if file_logger is not None:
+            file_logger.info(json.dumps(entry, default=str))
+
+    def _json_logger(self) -> Optional[logging.Logger]:
+        if not self.log_path:
+            return None
+        if self._file_logger is None:
+            with self._lock:
+                if self._file_logger is None:
+                    directory = os.path.dirname(self.log_path)
+                    if directory:
+                        os.makedirs(directory, exist_ok=True)
+                    handler = logging.handlers.RotatingFileHandler(
+                        self.log_path, maxBytes=self.log_max_bytes, backupCount=self.log_backups, encoding="utf-8",
+                    )
+                    handler.setFormatter(logging.Formatter("%(message)s"))
+                    file_logger = logging.getLogger("inventrack.slow_queries.file")
+                    file_logger.setLevel(logging.INFO)
+                    file_logger.propagate = False
+                    file_logger.addHandler(handler)
+                    self._file_logger = file_logger
+        return self._file_logger
+
+    # --- Reporting ---
+
+    def snapshot(self, limit: int = 100) -> Dict[str, Any]:
+        with self._lock:
+            recent = list(self._recent)[-limit:][::-1] if limit > 0 else []
+            top = sorted(self._by_fingerprint.values(), key=lambda s: s["total_ms"], reverse=True)[:limit]
+            return {
+                "enabled": True,
+                "threshold_ms": self.threshold_ms,
+                "recorded": self.recorded,
+                "explain_failures": self.explain_failures,
+                "explains_dropped": self.explains_dropped,
+                "fingerprints": [
+                    {**s, "total_ms": round(s["total_ms"], 2), "max_ms": round(s["max_ms"], 2),
+                     "avg_ms": round(s["total_ms"] / s["count"], 2)}
+                    for s in top
+                ],
+                "recent": recent,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._recent.clear()
+            self._by_fingerprint.clear()
+
+
+# --- 4. EXPLAIN ---
+
+def _is_select(normalized: str) -> bool:
+    head = normalized.lstrip("( ").split(" ", 1)[0].upper()
+    return head in ("SELECT", "WITH")
+
+
+def explain(engine, statement: str, parameters: Any) -> List[Any]:
+    """Plan rows for one statement, on its own pooled connection (never executes the statement)."""
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    with engine.connect() as conn:
+        result = conn.execution_options(slow_query_skip=True).exec_driver_sql(prefix + statement, parameters)
+        rows = [list(row) for row in result]
+        conn.rollback()
+    return rows
+
+
+# --- 5. Process-wide instance ---
+
+slow_query_log = SlowQueryLog(
+    threshold_ms=float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200")),
+    explain_first_n=int(os.getenv("SLOW_QUERY_EXPLAIN_FIRST_N", "3")),
+    buffer_size=int(os.getenv("SLOW_QUERY_BUFFER_SIZE", "500")),
+    log_path=os.getenv("SLOW_QUERY_LOG_PATH", "logs/slow_queries.jsonl") or None,
+    log_max_bytes=int(os.getenv("SLOW_QUERY_LOG_MAX_BYTES", str(10 * 1024 * 1024))),
+    log_backups=int(os.getenv("SLOW_QUERY_LOG_BACKUPS", "5")),
+)
+
+
+def attach_if_enabled(engine) -> None:
+    """Called by database._build_engine for the primary and every replica."""
+    if enabled():
+        slow_query_log.attach(engine)
@@ -0,0 +1,263 @@
+# File: inventrack/stock_ledger.py
+
+"""
+Append-only stock movement ledger with periodic per-store snapshots.
+
+Every write path that changes Inventory.stock_quantity appends one
+StockMovement per change, in the same transaction: the source (see below),
+the signed delta, the quantity after the change and the bill or upload it
+came from. Movements are never updated or deleted.
+
+`manage.py snapshot-stock` (run nightly, like rollup-sales) copies each
+store's Inventory into StockSnapshot / StockSnapshotItem. Point-in-time
+stock and movement reports then start from the newest snapshot taken
+before the requested time and replay only the ledger rows after it:
+
+- Quantity_After is absolute, so replaying a movement the snapshot already
+  reflects is harmless. Replay starts SNAPSHOT_OVERLAP_SECONDS before the
+  snapshot, which covers transactions that wrote their movement before the
+  snapshot read Inventory but committed after it.
+- Without an earlier snapshot the store's whole ledger up to that time is
+  replayed (correct, just slower).
+
+`manage.py reconcile-stock` compares each product's ledger total with
+Inventory; with --fix it appends "reconcile" movements for the difference
+("opening" for stock that predates the ledger), so drift stays visible in
+the history instead of being overwritten.
+"""
+
+import os
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+from inventrack import models
+
+# Movement sources
+SALE = "sale"              # POST /sales/process_bill
+SYNC = "sync"              # POST /sales/sync (offline POS bills)
+ADJUST = "adjust"          # PATCH /inventory/{store_id}/{product_id} with stock_quantity
+UPLOAD = "upload"          # POST /inventory/{store_id}/upload_csv
+CREATE = "create"          # POST /products (initial stock)
+OPENING = "opening"        # reconcile-stock --fix: stock that predates the ledger
+RECONCILE = "reconcile"    # reconcile-stock --fix: correction of a drift
+
+SNAPSHOT_OVERLAP_SECONDS = int(os.getenv("STOCK_SNAPSHOT_OVERLAP_SECONDS", "300"))
+
+
+def new_upload_id() -> str:
+    return "U" + uuid.uuid4().hex.upper()
+
+
+# --- 1. Writing (inside the caller's transaction) ---
+
+def movement(store_id: str, product_id: str, source: str, delta: int, quantity_after: int,
+             reference: Optional[str] = None, at: Optional[datetime] = None) -> Dict[str, Any]:
+    return {
+        "store_id": store_id,
+        "product_id": product_id,
+        "created_at": at or datetime.now(),
+        "source": source,
+        "delta": delta,
+        "quantity_after": quantity_after,
+        "reference": reference,
+    }
+
+
+def record(db: Session, movements: Sequence[Dict[str, Any]]) -> int:
+    """Appends movements (as built by `movement`). Does not commit."""
+    movements = [m for m in movements if m["delta"] != 0]
+    if movements:
+        db.execute(insert(models.StockMovement), movements)
+    return len(movements)
+
+
+# --- 2. Snapshots ---
+
+def take_snapshot(db: Session, store_id: str) -> Dict[str, Any]:
+    """Copies one store's current Inventory into a new snapshot and commits."""
+    taken_at = datetime.now()
+    quantities = db.execute(
+        select(models.Inventory.product_id, func.sum(models.Inventory.stock_quantity))
+        .where(models.Inventory.store_id == store_id)
+        .group_by(models.Inventory.product_id)
+    ).all()
+    try:
+        snapshot = models.StockSnapshot(store_id=store_id, taken_at=taken_at, product_count=len(quantities))
+        db.add(snapshot)
+        db.flush()
+        if quantities:
+            db.execute(insert(models.StockSnapshotItem), [
+                {"snapshot_id": snapshot.snapshot_id, "product_id": pid, "quantity": int(qty)}
+                for pid, qty in quantities
+            ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return {"snapshot_id": snapshot.snapshot_id, "store_id": store_id, "taken_at": taken_at,
+            "products": len(quantities)}
+
+
+def _snapshot_before(db: Session, store_id: str, at: datetime) -> Optional[models.StockSnapshot]:
+    return db.execute(
+        select(models.StockSnapshot)
+        .where(models.StockSnapshot.store_id == store_id, models.StockSnapshot.taken_at <= at)
+        .order_by(models.StockSnapshot.taken_at.desc(), models.StockSnapshot.snapshot_id.desc())
+        .limit(1)
+    ).scalar_one_or_none()
+
+
+# --- 3. Point-in-time stock and movement reports ---
+
+def _movements(db: Session, store_id: str, after: Optional[datetime], through: datetime,
+               product_id: Optional[str] = None):
+    query = select(
+        models.StockMovement.movement_id, models.StockMovement.product_id, models.StockMovement.created_at,
+        models.StockMovement.source, models.StockMovement.delta, models.StockMovement.quantity_after,
+        models.StockMovement.reference,
+    ).where(models.StockMovement.store_id == store_id, models.StockMovement.created_at <= through)
+    if after is not None:
+        query = query.where(models.StockMovement.created_at > after)
+    if product_id is not None:
+        query = query.where(models.StockMovement.product_id == product_id)
+    return db.execute(
+        query.order_by(models.StockMovement.created_at, models.StockMovement.movement_id),
+        execution_options={"yield_per": 10_000},
+    )
+
+
+def stock_at(db: Session, store_id: str, at: datetime, product_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    {product_id: quantity} of a store as of `at`, from the newest snapshot
+    taken at or before `at` plus the ledger rows after it.
+    """
+    snapshot = _snapshot_before(db, store_id, at)
+    quantities: Dict[str, int] = {}
+    replay_from = None
+    if snapshot is not None:
+        items = select(models.StockSnapshotItem.product_id, models.StockSnapshotItem.quantity).where(
+            models.StockSnapshotItem.snapshot_id == snapshot.snapshot_id
+        )
+        if product_id is not None:
+            items = items.where(models.StockSnapshotItem.product_id == product_id)
+        quantities.update(db.execute(items).all())
+        replay_from = snapshot.taken_at - timedelta(seconds=SNAPSHOT_OVERLAP_SECONDS)
+
+    replayed = 0
+    for row in _movements(db, store_id, replay_from, at, product_id):
+        quantities[row.product_id] = row.quantity_after
+        replayed += 1
+
+    return {
+        "quantities": quantities,
+        "snapshot_id": snapshot.snapshot_id if snapshot is not None else None,
+        "snapshot_taken_at": snapshot.taken_at if snapshot is not None else None,
+        "movements_replayed": replayed,
+    }
+
+
+def movement_report(db: Session, store_id: str, since: datetime, until: datetime,
+                    product_id: Optional[str] = None, limit: int = 500) -> Dict[str, Any]:
+    """
+    Movements of a store in (since, until] with, per product that moved,
+    the opening and closing quantity and the totals by source. The opening
+    quantities come from `stock_at(since)`, so only the snapshot and the
+    ledger after it are read, never the full history.
+    """
+    opening = stock_at(db, store_id, since, product_id)
+    summary: Dict[str, Dict[str, Any]] = {}
+    movements: List[Dict[str, Any]] = []
+    total = 0
+    for row in _movements(db, store_id, since, until, product_id):
+        total += 1
+        entry = summary.get(row.product_id)
+        if entry is None:
+            entry = summary[row.product_id] = {
+                "product_id": row.product_id,
+                "opening": opening["quantities"].get(row.product_id),
+                "received": 0,
+                "removed": 0,
+                "by_source": defaultdict(int),
+                "closing": None,
+            }
+        if row.delta > 0:
+            entry["received"] += row.delta
+        else:
+            entry["removed"] -= row.delta
+        entry["by_source"][row.source] += row.delta
+        entry["closing"] = row.quantity_after
+        if len(movements) < limit:
+            movements.append({
+                "movement_id": row.movement_id,
+                "product_id": row.product_id,
+                "at": row.created_at,
+                "source": row.source,
+                "delta": row.delta,
+                "quantity_after": row.quantity_after,
+                "reference": row.reference,
+            })
+
+    return {
+        "snapshot_id": opening["snapshot_id"],
+        "snapshot_taken_at": opening["snapshot_taken_at"],
+        "movements_total": total,
+        "products": [{**entry, "by_source": dict(entry["by_source"])} for entry in summary.values()],
+        "movements": movements,
+    }
+
+
+# --- 4. Reconciliation ---
+
+def reconcile(db: Session, store_id: str, fix: bool = False) -> List[Dict[str, Any]]:
+    """
+    Products of one store whose ledger total differs from Inventory. With
+    `fix`, the store's Inventory rows are locked while checking and a
+    correcting movement is appended for each difference (then committed).
+    """
+    inventory = select(models.Inventory.product_id, models.Inventory.stock_quantity).where(
+        models.Inventory.store_id == store_id
+    )
+    if fix:
+        inventory = inventory.with_for_update()
+    try:
+        stock: Dict[str, int] = defaultdict(int)
+        for pid, qty in db.execute(inventory):
+            stock[pid] += qty
+        ledger = {
+            pid: (int(total), count)
+            for pid, total, count in db.execute(
+                select(models.StockMovement.product_id, func.sum(models.StockMovement.delta),
+                       func.count(models.StockMovement.movement_id))
+                .where(models.StockMovement.store_id == store_id)
+                .group_by(models.StockMovement.product_id)
+            )
+        }
+
+        drift = []
+        for pid in sorted(set(stock) | set(ledger)):
+            inventory_qty = stock.get(pid, 0)
+            ledger_qty, count = ledger.get(pid, (0, 0))
+            if inventory_qty != ledger_qty:
+                drift.append({"store_id": store_id, "product_id": pid, "inventory": inventory_qty,
+                              "ledger": ledger_qty, "difference": inventory_qty - ledger_qty, "movements": count})
+
+        if fix and drift:
+            record(db, [
+                movement(store_id, d["product_id"], OPENING if d["movements"] == 0 else RECONCILE,
+                         d["difference"], d["inventory"], reference="reconcile-stock")
+                for d in drift
+            ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return drift
+
+
+def store_ids(db: Session) -> List[str]:
+    return list(db.execute(select(models.Shop.store_id).order_by(models.Shop.store_id)).scalars())
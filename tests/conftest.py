@@ -0,0 +1,49 @@
+# File: tests/conftest.py
+
+"""
+Tests run against a throw-away SQLite file: DATABASE_URL is set here, before
+any test module imports `inventrack` (the engine is created lazily on first use).
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+if str(REPO_ROOT) not in sys.path:
+    sys.path.insert(0, str(REPO_ROOT))
+
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(tempfile.mkdtemp(prefix='inventrack-tests-')) / 'test.db'}"
+os.environ.pop("SQLALCHEMY_CONNECT_ARGS", None)
+
+
+@pytest.fixture
+def make_store():
+    """Creates the schema and returns make(store_id, n_products, stock) -> product IDs (one owner per shop)."""
+    from inventrack import database, models
+
+    database.create_schema()
+
+    def make(store_id: str, n_products: int = 3, stock: int = 100):
+        db = database.SessionLocal()
+        try:
+            owner = models.User(full_name="Test Owner", email=f"{store_id.lower()}@tests.local",
+                                phone=store_id[-10:], password="x", role="Shopkeeper")
+            db.add(owner)
+            db.flush()
+            db.add(models.Shop(store_id=store_id, shop_name=f"Shop {store_id}", address="1 Test Rd",
+                               city="Pune", owner_id=owner.id))
+            product_ids = [f"{store_id}-P{i}" for i in range(n_products)]
+            for i, pid in enumerate(product_ids):
+                db.add(models.Product(id=pid, product_name=f"{store_id} Product {i}", category="Cat",
+                                      subcategory="Sub", mrp=100 + i, msp=90 + i))
+                db.add(models.Inventory(store_id=store_id, product_id=pid, stock_quantity=stock))
+            db.commit()
+            return product_ids
+        finally:
+            db.close()
+
+    return make
@@ -0,0 +1,47 @@
+# File: tests/test_admission.py
+
+import asyncio
+
+from inventrack.admission import BILLING, LISTING, AdmissionController
+
+
+def _controller() -> AdmissionController:
+    return AdmissionController(max_in_flight=1, per_store_limit=1, max_queue=4, queue_timeout=5.0, retry_after=1)
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        controller = _controller()
+        assert await controller.acquire(BILLING, "S1") is None
+
+        queued = asyncio.create_task(controller.acquire(LISTING, "S1"))
+        await asyncio.sleep(0)
+        assert controller.stats()["queue_depth"] == 1
+        queued.cancel()  # the client went away
+        await asyncio.gather(queued, return_exceptions=True)
+
+        assert controller.stats()["queue_depth"] == 0
+        controller.release("S1")
+        assert controller.in_flight == 0
+        assert await controller.acquire(BILLING, "S1") is None
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_after_grant_gives_the_slot_back():
+    async def scenario():
+        controller = _controller()
+        assert await controller.acquire(BILLING, "S1") is None
+
+        queued = asyncio.create_task(controller.acquire(LISTING, "S1"))
+        await asyncio.sleep(0)
+        controller.release("S1")  # grants the slot to the waiter...
+        queued.cancel()           # ...which is cancelled before it resumes
+        outcome = (await asyncio.gather(queued, return_exceptions=True))[0]
+        if outcome is None:
+            controller.release("S1")  # admitted after all: the caller owns the slot
+
+        assert controller.in_flight == 0
+        assert controller.stats()["queue_depth"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,28 @@
+# File: tests/test_analytics.py
+
+from datetime import date, timedelta
+
+from fastapi.testclient import TestClient
+
+from inventrack import database, models, sales_partitions
+from inventrack.main import app
+
+
+def test_trend_points_carry_revenue_date_and_the_legacy_date_key(make_store):
+    product_id = make_store("AN1")[0]
+    yesterday = date.today() - timedelta(days=1)
+    db = database.SessionLocal()
+    try:
+        sales_partitions.insert_sales_rows(db, [{"date": yesterday, "store_id": "AN1", "product_id": product_id,
+                                                 "units_sold": 2, "price": 90, "discount": 0}])
+        db.commit()
+        owner_id = db.query(models.Shop.owner_id).filter(models.Shop.store_id == "AN1").scalar()
+    finally:
+        db.close()
+    client = TestClient(app)
+    expected = [{"revenue_date": yesterday.isoformat(), "date": yesterday.isoformat(), "total_revenue_inr": 180.0}]
+
+    assert client.get("/analytics/AN1").json()["sales_trend_data"] == expected
+    owner = client.get(f"/analytics/owner/{owner_id}").json()
+    assert owner["stores"][0]["sales_trend_data"] == expected
+    assert owner["combined"]["sales_trend_data"] == expected
@@ -0,0 +1,70 @@
+# File: tests/test_availability_index.py
+
+import threading
+import time
+
+from inventrack import database
+from inventrack.availability_index import AvailabilityIndex
+from inventrack.inventory_cache import InventoryListingCache
+
+
+def _qty(index: AvailabilityIndex, product_id: str, store_id: str) -> int:
+    rows = index.lookup(database.SessionLocal, product_id, "Pune")
+    return next((row["qty"] for row in rows if row["store_id"] == store_id), 0)
+
+
+def test_out_of_order_updates_keep_the_latest_write(make_store):
+    product_id = make_store("AV1")[0]
+    index = AvailabilityIndex(refresh_seconds=300)
+    assert _qty(index, product_id, "AV1") == 100  # builds the index
+    versions = InventoryListingCache(max_bytes=1 << 20, ttl_seconds=60)
+
+    first = versions.begin_write("AV1")   # commits 99
+    second = versions.begin_write("AV1")  # commits 98 after the first released the row lock
+    index.update_stock("AV1", {product_id: 98}, second)
+    index.update_stock("AV1", {product_id: 99}, first)
+
+    assert _qty(index, product_id, "AV1") == 98
+    assert index.stats()["stale_updates"] == 1
+
+
+def test_updates_during_a_rebuild_are_replayed_in_version_order(make_store):
+    product_id = make_store("AV2")[0]
+    index = AvailabilityIndex(refresh_seconds=300)
+    index.update_stock("AV2", {product_id: 7}, 5)
+    index.update_stock("AV2", {product_id: 8}, 4)  # stale: never reaches the pending list
+
+    db = database.SessionLocal()
+    try:
+        index.rebuild(db)  # reads 100 from the DB
+    finally:
+        db.close()
+    index.update_stock("AV2", {product_id: 6}, 3)  # stale after the rebuild as well
+
+    assert _qty(index, product_id, "AV2") == 100
+    assert index.stats()["stale_updates"] == 2
+
+
+def test_cold_index_is_built_once_for_concurrent_requests(make_store):
+    product_id = make_store("AV3")[0]
+    index = AvailabilityIndex(refresh_seconds=300)
+    sessions = []
+
+    def slow_session():
+        sessions.append(1)
+        time.sleep(0.05)  # every request arrives while the first build is running
+        return database.SessionLocal()
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(index.lookup(slow_session, product_id, "Pune")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+
+    assert len(sessions) == 1
+    assert index.stats()["rebuilds"] == 1
+    assert all(rows and rows[0]["qty"] == 100 for rows in results)
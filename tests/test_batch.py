@@ -0,0 +1,69 @@
+# File: tests/test_batch.py
+
+import asyncio
+
+from fastapi import FastAPI, Header
+from fastapi.testclient import TestClient
+
+from inventrack.routes import batch
+
+app = FastAPI()
+app.include_router(batch.router)
+items = []
+arrivals = []
+
+
+@app.get("/items")
+def list_items(x_terminal: str = Header(None)):
+    return {"items": list(items), "terminal": x_terminal}
+
+
+@app.post("/items", status_code=201)
+def add_item(item: dict):
+    items.append(item["name"])
+    return {"count": len(items)}
+
+
+@app.get("/rendezvous/{name}")
+async def rendezvous(name: str):
+    """Returns True only if both rendezvous GETs were in flight at the same time."""
+    arrivals.append(name)
+    for _ in range(200):
+        if len(arrivals) >= 2:
+            return True
+        await asyncio.sleep(0.01)
+    return False
+
+
+def test_batch_runs_reads_together_and_writes_in_order():
+    items.clear()
+    arrivals.clear()
+    response = TestClient(app).post("/batch", headers={"X-Terminal": "T1"}, json={"requests": [
+        {"id": "a", "path": "/rendezvous/a"},
+        {"id": "b", "path": "/rendezvous/b"},
+        {"id": "before", "path": "/items"},
+        {"id": "write", "method": "POST", "path": "/items", "body": {"name": "milk"}},
+        {"id": "after", "path": "/items"},
+        {"id": "override", "path": "/items", "headers": {"X-Terminal": "T2"}},
+        {"id": "missing", "path": "/nope"},
+        {"id": "method", "method": "TRACE", "path": "/items"},
+        {"id": "nested", "method": "POST", "path": "/batch", "body": {"requests": []}},
+    ]})
+
+    assert response.status_code == 200
+    by_id = {sub["id"]: sub for sub in response.json()["responses"]}
+    assert [sub["id"] for sub in response.json()["responses"]] == [
+        "a", "b", "before", "write", "after", "override", "missing", "method", "nested"]
+    assert by_id["a"]["body"] is True and by_id["b"]["body"] is True
+    assert by_id["before"]["body"] == {"items": [], "terminal": "T1"}
+    assert (by_id["write"]["status"], by_id["write"]["body"]) == (201, {"count": 1})
+    assert by_id["after"]["body"] == {"items": ["milk"], "terminal": "T1"}
+    assert by_id["override"]["body"]["terminal"] == "T2"
+    assert [by_id[key]["status"] for key in ("missing", "method", "nested")] == [404, 405, 400]
+
+
+def test_batch_limits():
+    client = TestClient(app)
+    assert client.post("/batch", json={"requests": []}).status_code == 400
+    too_many = [{"path": "/items"}] * (batch.BATCH_MAX_REQUESTS + 1)
+    assert client.post("/batch", json={"requests": too_many}).status_code == 400
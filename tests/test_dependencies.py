@@ -0,0 +1,69 @@
+# File: tests/test_dependencies.py
+
+import threading
+from typing import Annotated
+
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from inventrack import database, models
+from inventrack.dependencies import ValidStore, get_db, get_read_db
+from inventrack.shop_registry import shop_registry
+
+app = FastAPI()
+DBDependency = Annotated[Session, Depends(get_db)]
+ReadDBDependency = Annotated[Session, Depends(get_read_db)]
+entered, release = threading.Event(), threading.Event()
+
+
+@app.get("/slow/{store_id}")
+def slow_read(store_id: str, db: ReadDBDependency, shop: ValidStore):
+    db.execute(select(models.Inventory.product_id).where(models.Inventory.store_id == store_id)).all()
+    entered.set()
+    release.wait(10)
+    return {"store_id": shop.store_id}
+
+
+@app.post("/bill")
+def bill(payload: dict, db: DBDependency, shop: ValidStore):
+    row = db.query(models.Inventory).filter(models.Inventory.store_id == shop.store_id).first()
+    row.stock_quantity -= 1
+    db.commit()
+    return {"qty": row.stock_quantity}
+
+
+def test_registry_miss_on_a_read_route_does_not_hold_the_writer(make_store):
+    assert database.sqlite_mode()  # tuned SQLite file: one writer connection, BEGIN IMMEDIATE
+    make_store("DEP1")
+    make_store("DEP2")
+    shop_registry.invalidate()
+    client = TestClient(app)
+
+    slow = threading.Thread(target=client.get, args=("/slow/DEP1",))
+    slow.start()
+    try:
+        assert entered.wait(5)
+        results = []
+        writer = threading.Thread(target=lambda: results.append(client.post("/bill", json={"store_id": "DEP2"})))
+        writer.start()
+        writer.join(5)
+        assert not writer.is_alive(), "the bill waited for the read request's writer connection"
+        assert results[0].status_code == 200
+    finally:
+        release.set()
+        slow.join(10)
+
+
+
+
+
+def test_unknown_store_is_404_and_store_id_comes_from_the_body(make_store):
+    make_store("DEP3")
+    client = TestClient(app)
+
+    assert client.get("/slow/NOPE").status_code == 404
+    assert client.post("/bill", json={"store_id": "NOPE"}).status_code == 404
+    assert client.post("/bill", json={}).status_code == 400
+    assert client.post("/bill", json={"store_id": "DEP3"}).json() == {"qty": 99}
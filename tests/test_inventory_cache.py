@@ -0,0 +1,86 @@
+# File: tests/test_inventory_cache.py
+
+import json
+import random
+import threading
+import time
+
+from inventrack.inventory_cache import InventoryListingCache
+
+
+def _cached_qty(cache: InventoryListingCache, store_id: str, loader) -> dict:
+    return {row["id"]: row["qty"] for row in json.loads(cache.get_listing(store_id, loader))}
+
+
+def test_out_of_order_patches_keep_the_latest_write():
+    cache = InventoryListingCache(max_bytes=1 << 20, ttl_seconds=60)
+    cache.get_listing("S1", lambda: [{"id": "P1", "qty": 10}])
+
+    first = cache.begin_write("S1")   # commits 9
+    second = cache.begin_write("S1")  # commits 8 after the first released the row lock
+    cache.patch_stock("S1", {"P1": 8}, second)
+    cache.patch_stock("S1", {"P1": 9}, first)
+
+    assert _cached_qty(cache, "S1", lambda: []) == {"P1": 8}
+    assert cache.stats()["stale_patches"] == 1
+
+
+def test_listing_loaded_during_a_write_is_not_cached():
+    cache = InventoryListingCache(max_bytes=1 << 20, ttl_seconds=60)
+    version = cache.begin_write("S1")
+    cache.get_listing("S1", lambda: [{"id": "P1", "qty": 10}])  # may or may not see the write
+    cache.patch_stock("S1", {"P1": 7}, version)
+
+    assert _cached_qty(cache, "S1", lambda: [{"id": "P1", "qty": 7}]) == {"P1": 7}
+
+
+def test_concurrent_writes_and_reads_converge_to_the_database():
+    """
+    Billing threads decrement products under per-row locks (as FOR UPDATE
+    does) and patch the cache after "commit" with random delays, while
+    reader threads keep loading and serving the listing. After each burst
+    of writes the cached listing must equal the database.
+    """
+    products = ["P0", "P1"]  # few products: writes to each follow closely
+    db = {pid: 10_000 for pid in products}
+    row_locks = {pid: threading.Lock() for pid in products}
+    db_lock = threading.Lock()
+    cache = InventoryListingCache(max_bytes=1 << 20, ttl_seconds=60)
+
+    def loader():
+        with db_lock:
+            rows = [{"id": pid, "qty": qty} for pid, qty in db.items()]
+        time.sleep(random.random() * 0.002)  # the load races the writes
+        return rows
+
+    def writer(seed: int):
+        rng = random.Random(seed)
+        for _ in range(15):
+            pid = rng.choice(products)
+            with row_locks[pid]:
+                with db_lock:
+                    db[pid] -= 1
+                    qty = db[pid]
+                version = cache.begin_write("S1")
+            time.sleep(rng.random() * 0.003)  # commit-to-patch gap, reorders patches
+            cache.patch_stock("S1", {pid: qty}, version)
+
+    def reader(stop: threading.Event):
+        while not stop.is_set():
+            listing = _cached_qty(cache, "S1", loader)
+            assert all(0 <= qty <= 10_000 for qty in listing.values())
+
+    for burst in range(15):
+        stop = threading.Event()
+        writers = [threading.Thread(target=writer, args=(burst * 100 + i,)) for i in range(8)]
+        readers = [threading.Thread(target=reader, args=(stop,)) for _ in range(2)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        stop.set()
+        for thread in readers:
+            thread.join()
+        assert _cached_qty(cache, "S1", loader) == db, f"stale listing after burst {burst}"
+
+    assert sum(db.values()) == 2 * 10_000 - 15 * 8 * 15
@@ -0,0 +1,38 @@
+# File: tests/test_inventory_upload.py
+
+from fastapi.testclient import TestClient
+
+from inventrack import database, models, sales_sync
+from inventrack.main import app
+
+
+def test_csv_upload_locks_only_the_products_in_the_file(make_store, monkeypatch):
+    product_ids = make_store("UP1", n_products=5, stock=10)
+    locked = []
+    lock_inventory = sales_sync.lock_inventory
+
+    def spy(db, store_id, ids):
+        locked.append((store_id, set(ids)))
+        return lock_inventory(db, store_id, ids)
+
+    monkeypatch.setattr(sales_sync, "lock_inventory", spy)
+    csv = (
+        "product_name,category,subcategory,mrp,msp,stock_quantity\n"
+        "UP1 Product 1,Cat,Sub,101,91,5\n"
+        "UP1 Product 3,Cat,Sub,103,93,7\n"
+        "UP1 Brand New,Cat,Sub,50,45,4\n"
+    )
+    response = TestClient(app).post("/inventory/UP1/upload_csv", files={"file": ("stock.csv", csv.encode())})
+
+    assert response.status_code == 200
+    assert (response.json()["existing_products_updated"], response.json()["new_products_created"]) == (2, 1)
+    assert locked == [("UP1", {product_ids[1], product_ids[3]})]
+
+    db = database.SessionLocal()
+    try:
+        stock = dict(db.query(models.Inventory.product_id, models.Inventory.stock_quantity)
+                     .filter(models.Inventory.store_id == "UP1", models.Inventory.product_id.in_(product_ids)))
+    finally:
+        db.close()
+    assert stock == {product_ids[0]: 10, product_ids[1]: 15, product_ids[2]: 10, product_ids[3]: 17,
+                     product_ids[4]: 10}
@@ -0,0 +1,49 @@
+# File: tests/test_product_catalog.py
+
+"""The catalog cache is up to a refresh interval behind other workers' edits; these paths must not be."""
+
+from decimal import Decimal
+
+from fastapi.testclient import TestClient
+from sqlalchemy import update
+
+from inventrack import database, models
+from inventrack.main import app
+from inventrack.product_catalog import product_catalog
+
+
+def _edit_elsewhere(product_id: str, **values) -> None:
+    """A product edit committed by another worker: this process's catalog does not see it."""
+    db = database.SessionLocal()
+    try:
+        product_catalog.load(db)
+        db.execute(update(models.Product).where(models.Product.id == product_id).values(**values))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_create_product_checks_names_against_the_db(make_store):
+    product_id = make_store("PC1")[0]
+    _edit_elsewhere(product_id, product_name="PC1 Renamed")
+    client = TestClient(app)
+    new_product = {"category": "Cat", "subcategory": "Sub", "mrp": 10, "msp": 9, "stock_quantity": 5}
+
+    assert client.post("/products/PC1/", json={**new_product, "product_name": "PC1 Product 0"}).status_code == 201
+    assert client.post("/products/PC1/", json={**new_product, "product_name": "PC1 Renamed"}).status_code == 409
+
+
+def test_bill_records_the_current_msp(make_store):
+    product_id = make_store("PC2")[0]
+    _edit_elsewhere(product_id, msp=Decimal("42"))
+    bill = {"store_id": "PC2", "user_id": 1, "total_amount": 84,
+            "items": [{"product_id": product_id, "product_name": "PC2 Product 0", "quantity_sold": 2}]}
+
+    assert TestClient(app).post("/sales/process_bill", json=bill).status_code == 200
+
+    db = database.SessionLocal()
+    try:
+        prices = db.query(models.SalesData.price).filter(models.SalesData.store_id == "PC2").all()
+    finally:
+        db.close()
+    assert [price for price, in prices] == [Decimal("42")]
@@ -0,0 +1,41 @@
+# File: tests/test_product_search.py
+
+from decimal import Decimal
+
+from inventrack.inventory_cache import InventoryListingCache
+from inventrack.product_catalog import CatalogProduct
+from inventrack.product_search import ProductSearchIndex
+
+
+def _product(product_id: str, name: str) -> CatalogProduct:
+    return CatalogProduct(product_id, name, "Grocery", "Staples", Decimal("60"), Decimal("55"))
+
+
+def test_store_filter_applies_before_the_all_tokens_intersection():
+    index = ProductSearchIndex()
+    index.rebuild([
+        _product("P1", "Amul Gold Milk 1L"),    # matches both tokens, not stocked by the store
+        _product("P2", "Amul Butter 500g"),     # matches "amul" only, stocked
+        _product("P3", "Nandini Toned Milk"),   # matches "milk" only, stocked
+    ])
+
+    hits = index.search("amul milk", allowed_ids={"P2": 4, "P3": 9}.keys())
+
+    assert {product.id for product, _ in hits} == {"P2", "P3"}
+    assert [product.id for product, _ in index.search("amul milk")][0] == "P1"
+
+
+def test_store_stock_comes_from_the_cached_listing():
+    cache = InventoryListingCache(max_bytes=1 << 20, ttl_seconds=60)
+    loads = []
+
+    def loader():
+        loads.append(1)
+        return [{"id": "P1", "qty": 10}, {"id": "P2", "qty": 0}]
+
+    assert cache.get_stock("S1", loader) == {"P1": 10, "P2": 0}
+    cache.get_listing("S1", loader)
+    cache.patch_stock("S1", {"P1": 7}, cache.begin_write("S1"))
+
+    assert cache.get_stock("S1", loader) == {"P1": 7, "P2": 0}
+    assert len(loads) == 1
@@ -0,0 +1,122 @@
+# File: tests/test_range_analytics.py
+
+import json
+import random
+from collections import defaultdict
+from datetime import date, timedelta
+
+import pytest
+
+from inventrack import database, models, range_analytics, sales_partitions
+from inventrack.sales_buffer import SalesWriteBehindBuffer
+
+
+@pytest.fixture
+def monthly_db(monkeypatch):
+    monkeypatch.setattr(sales_partitions, "PARTITIONING", "monthly")
+    database.create_schema()
+    db = database.SessionLocal()
+    db.query(models.RollupState).delete()
+    db.commit()
+    yield db
+    db.close()
+
+
+def _seed(db, store_id: str, days: int):
+    """Rows spread over the `days` days before today, i.e. over several month tables."""
+    rng = random.Random(5)
+    today = date.today()
+    rows = [
+        {"date": today - timedelta(days=rng.randint(1, days)), "store_id": store_id,
+         "product_id": f"P{rng.randint(0, 29)}", "units_sold": rng.randint(1, 4),
+         "price": rng.randint(10, 99), "discount": 0}
+        for _ in range(2000)
+    ]
+    sales_partitions.insert_sales_rows(db, rows)
+    db.commit()
+    return rows
+
+
+def _expected(rows, start: date, end: date):
+    by_day, by_product = defaultdict(float), defaultdict(float)
+    for row in rows:
+        if start <= row["date"] <= end:
+            by_day[row["date"].isoformat()] += row["units_sold"] * row["price"]
+            by_product[row["product_id"]] += row["units_sold"] * row["price"]
+    return by_day, by_product
+
+
+def test_first_rollup_refresh_covers_history_in_month_tables(monthly_db):
+    db = monthly_db
+    rows = _seed(db, "RA1", days=120)
+    assert db.query(models.SalesData).filter(models.SalesData.store_id == "RA1").count() == 0
+
+    since, through = range_analytics.refresh_daily_rollup(db)
+    assert since == min(row["date"] for row in rows)
+    assert through == date.today() - timedelta(days=1)
+
+    # Starts and ends mid-month: whole months from the monthly rollup, edges from the daily one
+    start, end = since + timedelta(days=3), through - timedelta(days=2)
+    result = range_analytics.get_range_analytics(db, "RA1", start, end, "day", top_n=50)
+    by_day, by_product = _expected(rows, start, end)
+
+    assert result["plan"] == "rollup"
+    assert {p["bucket"]: round(p["revenue_inr"], 2) for p in result["series"]} == {
+        day: round(revenue, 2) for day, revenue in by_day.items()
+    }
+    assert {p["product_id"]: round(p["revenue_inr"], 2) for p in result["top_products_by_revenue"]} == {
+        pid: round(revenue, 2) for pid, revenue in by_product.items()
+    }
+
+
+def test_synced_rows_patch_every_rollup(monthly_db):
+    db = monthly_db
+    rows = _seed(db, "RA2", days=60)
+    range_analytics.refresh_daily_rollup(db)
+
+    late = [{"date": date.today() - timedelta(days=10), "store_id": "RA2", "product_id": "P1",
+             "units_sold": 3, "price": 50, "discount": 0}]
+    sales_partitions.insert_sales_rows(db, late)
+    range_analytics.patch_rollups(db, late)
+    db.commit()
+
+    start, end = date.today() - timedelta(days=60), date.today() - timedelta(days=1)
+    result = range_analytics.get_range_analytics(db, "RA2", start, end, "month", top_n=50)
+    _, by_product = _expected(rows + late, start, end)
+    assert result["plan"] == "rollup"
+    assert round(result["totals"]["revenue_inr"], 2) == round(sum(by_product.values()), 2)
+    assert {p["product_id"]: round(p["revenue_inr"], 2) for p in result["top_products_by_revenue"]} == {
+        pid: round(revenue, 2) for pid, revenue in by_product.items()
+    }
+
+
+def test_late_write_behind_flush_patches_the_rollups(monthly_db, tmp_path):
+    db = monthly_db
+    rows = _seed(db, "RA3", days=60)
+    range_analytics.refresh_daily_rollup(db)
+
+    # Held up in the buffer past the refresh lookback; one line has no MSP
+    late_day = date.today() - timedelta(days=10)
+    lines = [{"product_id": "P1", "units_sold": 3, "price": 50, "discount": 0},
+             {"product_id": "P2", "units_sold": 1, "price": None, "discount": 0}]
+    buffer = SalesWriteBehindBuffer(tmp_path, fsync=False)
+    buffer.directory.mkdir(parents=True)
+    (buffer.directory / "segment-00000000000000000001.sealed").write_text(json.dumps({
+        "store_id": "RA3", "date": late_day.isoformat(), "bill_id": "RA3-LATE", "user_id": None,
+        "total_amount": 150, "lines": lines,
+    }) + "\n")
+    assert buffer._flush_sealed() == 2
+    db.expire_all()
+
+    late = [{"date": late_day, "product_id": "P1", "units_sold": 3, "price": 50},
+            {"date": late_day, "product_id": "P2", "units_sold": 1, "price": 0}]
+    start, end = date.today() - timedelta(days=60), date.today() - timedelta(days=1)
+    result = range_analytics.get_range_analytics(db, "RA3", start, end, "day", top_n=50)
+    by_day, by_product = _expected(rows + late, start, end)
+    assert result["plan"] == "rollup"
+    assert {p["bucket"]: round(p["revenue_inr"], 2) for p in result["series"]} == {
+        day: round(revenue, 2) for day, revenue in by_day.items()
+    }
+    assert result["totals"]["units_sold"] == sum(
+        row["units_sold"] for row in rows + late if start <= row["date"] <= end
+    )
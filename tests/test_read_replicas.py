@@ -0,0 +1,50 @@
+# File: tests/test_read_replicas.py
+
+from datetime import date, timedelta
+
+from fastapi.testclient import TestClient
+
+from inventrack import database, models, sales_partitions
+from inventrack.main import app
+
+
+def _sell(session_factory, store_id: str, product_id: str, units: int, price: int) -> None:
+    db = session_factory()
+    try:
+        sales_partitions.insert_sales_rows(db, [{"date": date.today() - timedelta(days=1), "store_id": store_id,
+                                                 "product_id": product_id, "units_sold": units, "price": price,
+                                                 "discount": 0}])
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_reads_go_to_the_replica_until_the_store_writes(make_store, tmp_path, monkeypatch):
+    product_id = make_store("RR1")[0]
+    _sell(database.SessionLocal, "RR1", product_id, units=2, price=90)
+
+    # A second SQLite file as the replica, lagging behind: it has a different sale
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    monkeypatch.setenv("DATABASE_REPLICA_URLS", replica_url)
+    monkeypatch.setattr(database, "_replicas", None)
+    monkeypatch.setattr(database, "_recent_writes", {})
+    # Replicas are bypassed in SQLite mode (one file); route as a server primary would
+    monkeypatch.setattr(database, "_sqlite_primary", False)
+    replica = database.get_replicas()[0]
+    models.Base.metadata.create_all(replica.engine)
+    _sell(lambda: database._session_factory(bind=replica.engine), "RR1", product_id, units=1, price=10)
+
+    client = TestClient(app)
+
+    def trend():
+        return [p["total_revenue_inr"] for p in client.get("/analytics/RR1").json()["sales_trend_data"]]
+
+    assert trend() == [10.0]
+    assert replica.sessions == 1
+
+    database.note_write("RR2")  # another store's write leaves RR1 on the replica
+    assert trend() == [10.0]
+
+    database.note_write("RR1")  # this store's own write: its next read must see it
+    assert trend() == [180.0]
+    assert replica.sessions == 2
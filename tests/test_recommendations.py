@@ -0,0 +1,66 @@
+# File: tests/test_recommendations.py
+
+import threading
+from datetime import datetime, timedelta
+
+from inventrack import recommendations
+from inventrack.recommendations import CooccurrenceModel
+
+
+def _snapshot(baskets, counted_at: datetime) -> dict:
+    """A rebuild snapshot that counted `baskets` (store_id, items) up to `counted_at`."""
+    rebuilt = CooccurrenceModel()
+    for store_id, items in baskets:
+        rebuilt.add_basket(store_id, items)
+    data = rebuilt.to_snapshot()
+    data["counted_at"] = counted_at.isoformat()
+    return data
+
+
+def _together(model: CooccurrenceModel, a: str, b: str) -> int:
+    return next((n["baskets_together"] for n in model.top(a, "S1") if n["product_id"] == b), 0)
+
+
+def test_reload_keeps_baskets_the_snapshot_has_not_counted():
+    counted_at = datetime(2026, 3, 1, 12, 0)
+    stamps = iter([counted_at - timedelta(seconds=1), counted_at + timedelta(microseconds=1),
+                   counted_at + timedelta(seconds=1)])
+    worker = CooccurrenceModel(clock=lambda: next(stamps))
+    worker.add_basket("S1", ["A", "B"])  # counted by the rebuild below
+    worker.add_basket("S1", ["A", "B"])  # committed after the rebuild started
+    worker.add_basket("S1", ["A", "C"])
+
+    worker.load_snapshot(_snapshot([("S1", ["A", "B"]), ("S1", ["A", "B"])], counted_at))
+    worker.compact()
+
+    assert _together(worker, "A", "B") == 3
+    assert _together(worker, "A", "C") == 1
+    assert worker.stats()["baskets"] == 4
+    assert worker.stats()["local_baskets"] == 2
+
+
+def test_changed_snapshot_is_loaded_in_the_background(tmp_path, monkeypatch):
+    path = tmp_path / "cooccurrence.json.gz"
+    model = CooccurrenceModel()
+    model.add_basket("S1", ["A", "B"])
+    recommendations.write_snapshot(model, path)
+
+    worker = CooccurrenceModel()
+    monkeypatch.setattr(recommendations, "SNAPSHOT_PATH", path)
+    monkeypatch.setattr(recommendations, "cooccurrence", worker)
+    monkeypatch.setattr(recommendations, "_last_snapshot_check", 0.0)
+    monkeypatch.setattr(recommendations, "_reloading", False)
+    reloaded = threading.Event()
+    reload = recommendations._reload
+
+    def reload_and_signal():
+        reload()
+        reloaded.set()
+
+    monkeypatch.setattr(recommendations, "_reload", reload_and_signal)
+
+    recommendations.maybe_reload_snapshot()
+    assert reloaded.wait(5)
+
+    assert worker.snapshot_mtime == path.stat().st_mtime
+    assert _together(worker, "A", "B") == 1
@@ -0,0 +1,66 @@
+# File: tests/test_sales_buffer.py
+
+import json
+from datetime import date
+
+import pytest
+
+from inventrack import database, models
+from inventrack.sales_buffer import SalesWriteBehindBuffer
+
+
+def _buffer(tmp_path, **options) -> SalesWriteBehindBuffer:
+    buffer = SalesWriteBehindBuffer(tmp_path, fsync=False, **options)
+    buffer.directory.mkdir(parents=True)
+    return buffer
+
+
+def _write_segment(buffer: SalesWriteBehindBuffer, name: str, *entries) -> None:
+    with open(buffer.directory / name, "w", encoding="utf-8") as f:
+        for entry in entries:
+            f.write((entry if isinstance(entry, str) else json.dumps(entry)) + "\n")
+
+
+def _entry(store_id: str, product_id: str, bill_id: str):
+    return {"store_id": store_id, "date": date.today().isoformat(), "bill_id": bill_id, "user_id": None,
+            "total_amount": 180, "lines": [{"product_id": product_id, "units_sold": 2, "price": 90, "discount": 0}]}
+
+
+def _history_rows(store_id: str) -> int:
+    db = database.SessionLocal()
+    try:
+        return db.query(models.SalesData).filter(models.SalesData.store_id == store_id).count()
+    finally:
+        db.close()
+
+
+def test_replayed_segment_skips_history_of_stored_bills(tmp_path, make_store):
+    product_id = make_store("SB1")[0]
+    buffer = _buffer(tmp_path)
+    segment = "segment-00000000000000000001.sealed"
+
+    _write_segment(buffer, segment, _entry("SB1", product_id, "SB1-BILL-1"))
+    assert buffer._flush_sealed() == 1
+    # Crash after the commit, before the unlink: the same segment comes back
+    _write_segment(buffer, segment, _entry("SB1", product_id, "SB1-BILL-1"), _entry("SB1", product_id, "SB1-BILL-2"))
+    assert buffer._flush_sealed() == 1
+
+    assert _history_rows("SB1") == 2
+
+
+def test_failing_segment_is_dead_lettered_and_unblocks_the_rest(tmp_path, make_store):
+    product_id = make_store("SB2")[0]
+    buffer = _buffer(tmp_path, max_attempts=2)
+    poisoned = dict(_entry("SB2", product_id, "SB2-BILL-1"), date="not-a-date")
+    _write_segment(buffer, "segment-00000000000000000001.sealed", poisoned)
+    _write_segment(buffer, "segment-00000000000000000002.sealed", _entry("SB2", product_id, "SB2-BILL-2"))
+
+    for _ in range(2):
+        with pytest.raises(ValueError):
+            buffer._flush_sealed()
+    assert _history_rows("SB2") == 0
+
+    assert buffer._flush_sealed() == 1
+    assert _history_rows("SB2") == 1
+    assert [path.name for path in buffer.directory.iterdir()] == ["segment-00000000000000000001.2.dead"]
+    assert buffer.dead_segments == 1
@@ -0,0 +1,23 @@
+# File: tests/test_sales_import.py
+
+import pytest
+from fastapi.testclient import TestClient
+
+from inventrack import sales_import
+from inventrack.main import app
+
+
+@pytest.mark.parametrize("job_id", ["../../etc/cron.d/x", "..", "a/b", "a\\b", "IMP.csv", "x" * 65, ""])
+def test_import_rejects_job_ids_that_are_not_plain_names(job_id, tmp_path, monkeypatch):
+    monkeypatch.setattr(sales_import, "IMPORT_DIR", tmp_path / "imports")
+    response = TestClient(app).post(
+        "/sales/import", params={"job_id": job_id}, files={"file": ("sales.csv", b"Date,Store_ID\n")},
+    )
+
+    assert response.status_code == 400
+    assert not (tmp_path / "imports").exists()
+
+
+def test_job_id_pattern_accepts_generated_and_client_ids():
+    assert sales_import.JOB_ID_RE.match("IMP" + "0123456789ABCDEF")
+    assert sales_import.JOB_ID_RE.match("shop-42_2024-backfill")